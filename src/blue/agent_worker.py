@@ -0,0 +1,112 @@
+"""
+Worker persistente del Blue Agent.
+
+Mantiene el proceso vivo entre invocaciones para no pagar en cada fase/repeticion
+la carga del modelo de embeddings, los indices FAISS, los mappers de esquema y los
+clientes MCP (todos viven en los caches de modulo de blue_agent_graph).
+
+Protocolo: una linea JSON por request en stdin, una linea JSON por respuesta en stdout.
+  {"id": 1, "op": "run", "argv": ["--episode-start", "1", ...]}  -> {"id": 1, "ok": true, "run_id": ..., "episodes": N, "duration_ms": ...}
+  {"id": 2, "op": "ping"}                                        -> {"id": 2, "ok": true, "pid": ..., "runs": ...}
+  {"id": 3, "op": "shutdown"}                                    -> {"id": 3, "ok": true}
+Los argv son los mismos de src.blue.run_blue_agent. Al arrancar, el protocolo pasa a un dup
+del stdout original y el fd 1 apunta a stderr: prints del agente, escrituras nativas de
+faiss/torch y lo que se imprima en imports van a stderr y no rompen el protocolo.
+"""
+from __future__ import annotations
+
+import contextlib
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional, TextIO
+
+
+def _parse_run_args(argv: List[str]) -> Any:
+    from src.blue.run_blue_agent import build_arg_parser
+
+    ap = build_arg_parser()
+    args = ap.parse_args([str(a) for a in argv])
+    # Un worker no tiene terminal para el flujo interactivo.
+    args.non_interactive = True
+    return ap, args
+
+
+def handle_request(req: Dict[str, Any], stats: Dict[str, int]) -> Dict[str, Any]:
+    req_id = req.get("id")
+    op = str(req.get("op") or "run")
+    if op == "ping":
+        return {"id": req_id, "ok": True, "pid": os.getpid(), "runs": stats["runs"]}
+    if op == "shutdown":
+        return {"id": req_id, "ok": True, "shutdown": True}
+    if op != "run":
+        return {"id": req_id, "ok": False, "error": f"unknown op: {op}"}
+
+    argv = req.get("argv") or []
+    if not isinstance(argv, list):
+        return {"id": req_id, "ok": False, "error": "argv must be a list"}
+
+    t0 = time.perf_counter()
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            from src.blue.run_blue_agent import run_from_args
+
+            ap, args = _parse_run_args(argv)
+            out = run_from_args(ap, args)
+    except SystemExit as e:
+        # argparse (ap.error) termina con sys.exit(); en el worker solo falla el request.
+        return {"id": req_id, "ok": False, "error": f"SystemExit: {e.code}"}
+    except Exception as e:
+        return {"id": req_id, "ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    stats["runs"] += 1
+    return {
+        "id": req_id,
+        "ok": True,
+        "run_id": out.get("run_id"),
+        "episodes": out.get("episodes"),
+        "run_dir": out.get("run_dir"),
+        "duration_ms": round((time.perf_counter() - t0) * 1000.0, 3),
+    }
+
+
+def serve(stdin: Optional[TextIO] = None, stdout: Optional[TextIO] = None) -> int:
+    stdin = stdin or sys.stdin
+    stdout = stdout or sys.stdout
+    stats = {"runs": 0}
+    for line in stdin:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            req = json.loads(line)
+            if not isinstance(req, dict):
+                raise ValueError("request must be a JSON object")
+        except Exception as e:
+            resp: Dict[str, Any] = {"id": None, "ok": False, "error": f"bad request: {e}"}
+        else:
+            resp = handle_request(req, stats)
+        stdout.write(json.dumps(resp, ensure_ascii=False, default=str) + "\n")
+        stdout.flush()
+        if resp.get("shutdown"):
+            break
+    return stats["runs"]
+
+
+def _protocol_stdout() -> TextIO:
+    """Reserva el stdout original para el protocolo y apunta el fd 1 a stderr."""
+    sys.stdout.flush()
+    proto_fd = os.dup(1)
+    os.dup2(2, 1)
+    return os.fdopen(proto_fd, "w", encoding="utf-8", buffering=1)
+
+
+def main() -> None:
+    # antes de importar el agente: cualquier salida a stdout desde aca va a stderr
+    runs = serve(stdout=_protocol_stdout())
+    print(f"agent_worker: exit after {runs} run(s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
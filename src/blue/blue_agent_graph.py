@@ -1,11 +1,9 @@
 from __future__ import annotations
 
 from datetime import datetime, timezone, timedelta
-import json
 import os
 import re
-import time
-from typing import Any, Dict, List, Optional, TypedDict
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, TypedDict
 
 try:
     from langgraph.graph import StateGraph, END
@@ -20,9 +18,23 @@ from src.backend_b.search_logs import search_logs as search_logs_backend_b
 from src.tools.asset_context import get_asset_context
 from src.tools.enforcement import _iso_now, block_ip
 from src.blue.decision_log import append_decision
-from src.blue.schema_mapper import DynamicSchemaMapper, FALLBACK_ALIASES
-from src.memory.faiss_store import FaissMemory
+from src.blue.schema_mapper import (
+    DEFAULT_BREAKER_COOLDOWN_SEC,
+    DEFAULT_BREAKER_THRESHOLD,
+    DEFAULT_NEGATIVE_TTL_SEC,
+    DEFAULT_SIMILAR_MIN_JACCARD,
+    DynamicSchemaMapper,
+    FALLBACK_ALIASES,
+)
 from src.mcp import LocalMCPClient
+from src.core.evidence_store import compact_evidence, release_blob_tables
+from src.core.ground_truth import load_ground_truth
+from src.core.jsonl_writer import end_episode_jsonl_writers
+from src.core.profiler import get_profiler
+
+if TYPE_CHECKING:
+    # faiss/sentence-transformers/torch se importan recien en get_memory().
+    from src.memory.faiss_store import FaissMemory
 
 
 _MEM_BY_DIR: dict[str, FaissMemory] = {}
@@ -53,19 +65,56 @@ BACKEND_B_ALIASES_MINIMAL: Dict[str, str] = {
 }
 
 
-def get_memory(dir_path: str) -> FaissMemory:
+def get_memory(dir_path: str, options: Optional[Dict[str, Any]] = None) -> FaissMemory:
+    # options (index_type, ann_threshold, ...) solo aplican al abrir la memoria del dir.
     mem = _MEM_BY_DIR.get(dir_path)
     if mem is None:
-        mem = FaissMemory(dir_path=dir_path)
+        from src.memory.faiss_store import FaissMemory
+
+        mem = FaissMemory(dir_path=dir_path, **(options or {}))
         _MEM_BY_DIR[dir_path] = mem
     return mem
 
 
+def checkpoint_memories() -> None:
+    """Baja el WAL de cada memoria abierta a index.faiss (fin de run)."""
+    for mem in _MEM_BY_DIR.values():
+        mem.checkpoint()
+
+
+def release_run_state(run_dir: str) -> None:
+    """Descarta memorias y mappers cacheados bajo run_dir (el disco vuelve a ser la fuente de verdad)."""
+    prefix = os.path.normpath(os.path.abspath(run_dir))
+
+    def _under(path: str) -> bool:
+        p = os.path.normpath(os.path.abspath(path))
+        return p == prefix or p.startswith(prefix + os.sep)
+
+    for dir_path in [d for d in _MEM_BY_DIR if _under(d)]:
+        del _MEM_BY_DIR[dir_path]
+    for mapper_key in [k for k in _MAPPER_BY_CACHE if _under(k.split("|", 1)[0])]:
+        del _MAPPER_BY_CACHE[mapper_key]
+    release_blob_tables(run_dir)
+
+
+def _memory_enabled(state: "BlueState") -> bool:
+    return state.get("memory_enabled") is not False
+
+
+def _memory_options(state: "BlueState") -> Dict[str, Any]:
+    return dict(state.get("memory_options") or {})
+
+
 def _memory_dir_from_state(state: "BlueState") -> str:
     return str(state.get("memory_dir") or os.path.join("data", "memory"))
 
 
 MEMORY_SEARCH_THRESHOLD = 0.62
+# (case_text, pattern_text): el patron tolera un umbral algo menor.
+MEMORY_QUERY_KS = [4, 4]
+MEMORY_QUERY_THRESHOLDS = [MEMORY_SEARCH_THRESHOLD, max(0.56, MEMORY_SEARCH_THRESHOLD - 0.06)]
+# Solo pattern_text se repite entre episodios; case_text (ips, usuario, host) no se cachea.
+MEMORY_QUERY_CACHE = [False, True]
 MEMORY_TP_STRONG_THRESHOLD = 0.82
 MEMORY_FP_STRONG_THRESHOLD = 0.86
 MEMORY_TP_MARGIN = 0.02
@@ -112,9 +161,21 @@ def get_schema_mapper(state: "BlueState") -> DynamicSchemaMapper:
     cache_path = _schema_map_cache_path_from_state(state)
     shared_cache_path = _schema_map_shared_cache_path_from_state(state)
     api_key = str(state.get("gemini_api_key") or os.getenv("GEMINI_API_KEY") or "")
+    profile_mapper = bool(state.get("schema_profile_mapper", True))
+    similar_reuse = bool(state.get("schema_similar_reuse", True))
+    raw_min_jaccard = state.get("schema_similar_min_jaccard")
+    similar_min_jaccard = DEFAULT_SIMILAR_MIN_JACCARD if raw_min_jaccard is None else float(raw_min_jaccard)
+    raw_threshold = state.get("schema_llm_breaker_threshold")
+    breaker_threshold = DEFAULT_BREAKER_THRESHOLD if raw_threshold is None else int(raw_threshold)
+    raw_cooldown = state.get("schema_llm_breaker_cooldown_sec")
+    breaker_cooldown_sec = DEFAULT_BREAKER_COOLDOWN_SEC if raw_cooldown is None else float(raw_cooldown)
+    raw_ttl = state.get("schema_llm_negative_ttl_sec")
+    negative_ttl_sec = DEFAULT_NEGATIVE_TTL_SEC if raw_ttl is None else float(raw_ttl)
     mapper_key = (
         f"{cache_path}|{enabled}|{llm_provider}|{model}|{min_confidence:.3f}|"
-        f"{ollama_url}|{ollama_model}|{llm_timeout_sec:.3f}|{bool(api_key)}|{shared_cache_path}"
+        f"{ollama_url}|{ollama_model}|{llm_timeout_sec:.3f}|{bool(api_key)}|{shared_cache_path}|"
+        f"profile={profile_mapper}|similar={similar_reuse}:{similar_min_jaccard:.3f}|"
+        f"breaker={breaker_threshold}:{breaker_cooldown_sec:.1f}|negative_ttl={negative_ttl_sec:.1f}"
     )
 
     mapper = _MAPPER_BY_CACHE.get(mapper_key)
@@ -130,6 +191,12 @@ def get_schema_mapper(state: "BlueState") -> DynamicSchemaMapper:
             min_confidence=min_confidence,
             llm_timeout_sec=llm_timeout_sec,
             shared_cache_path=shared_cache_path,
+            profile_mapper=profile_mapper,
+            similar_reuse=similar_reuse,
+            similar_min_jaccard=similar_min_jaccard,
+            breaker_threshold=breaker_threshold,
+            breaker_cooldown_sec=breaker_cooldown_sec,
+            negative_ttl_sec=negative_ttl_sec,
         )
         _MAPPER_BY_CACHE[mapper_key] = mapper
     return mapper
@@ -176,6 +243,16 @@ def get_mcp_client(state: "BlueState") -> LocalMCPClient:
 
 
 def _search_logs(state: "BlueState", **kwargs: Any) -> Dict[str, Any]:
+    backend = str(state.get("logs_backend") or "backend_a")
+    mcp_tool = str(state.get("mcp_tool") or "search_logs")
+    with get_profiler().span(mcp_tool, cat="tool", backend=backend, filters=kwargs.get("filters")) as span:
+        out = _search_logs_dispatch(state, **kwargs)
+        span.args["mode"] = (out.get("_tool_meta") or {}).get("mode")
+        span.args["matched"] = out.get("matched")
+        return out
+
+
+def _search_logs_dispatch(state: "BlueState", **kwargs: Any) -> Dict[str, Any]:
     backend = str(state.get("logs_backend") or "backend_a")
     logs_dir = str(state["logs_dir"])
     mcp_enabled = bool(state.get("mcp_enabled", True))
@@ -229,56 +306,41 @@ def _ground_truth_dir_from_state(state: "BlueState") -> str:
 
 
 def _load_ground_truth(gt_dir: str, episode_id: int) -> Optional[Dict[str, Any]]:
-    for path in (
-        os.path.join(gt_dir, f"episode_{episode_id:03d}.json"),
-        os.path.join(gt_dir, f"episode_{episode_id}.json"),
-    ):
-        if os.path.exists(path):
-            with open(path, "r", encoding="utf-8") as f:
-                return json.load(f)
-    return None
-
-
-def _memory_case_exists(mem: FaissMemory, *, text: str, label: str, episode_id: int) -> bool:
-    for case in reversed(mem.cases[-300:]):
-        if (
-            case.get("text") == text
-            and case.get("label") == label
-            and case.get("source", {}).get("episode_id") == episode_id
-        ):
-            return True
-    return False
+    return load_ground_truth(gt_dir, episode_id)
 
 
 def _timing_enter(state: "BlueState", stage: str) -> Dict[str, Any]:
-    timing = dict(state.get("timing") or {})
-    stages = dict(timing.get("stages") or {})
-    data = dict(stages.get(stage) or {})
-    data["started_at"] = _iso_now()
-    data["_t0_perf"] = time.perf_counter()
-    stages[stage] = data
-    timing["stages"] = stages
-    if "_pipeline_t0_perf" not in timing:
-        timing["_pipeline_t0_perf"] = time.perf_counter()
+    # El dict de timing se muta en sitio; los intervalos viven en el profiler.
+    prof = get_profiler()
+    timing = state.get("timing")
+    if timing is None:
+        timing = {"stages": {}}
+    if "pipeline_started_at" not in timing:
+        prof.begin("episode", cat="episode", episode_id=state.get("episode_id"), run_id=state.get("run_id"))
         timing["pipeline_started_at"] = _iso_now()
+    span = prof.begin(stage, cat="stage")
+    data = timing["stages"].setdefault(stage, {})
+    data["started_at"] = prof.wall_iso(span.start_ns)
     return timing
 
 
 def _timing_exit(timing: Dict[str, Any], stage: str) -> Dict[str, Any]:
-    stages = dict(timing.get("stages") or {})
-    data = dict(stages.get(stage) or {})
-    t0 = data.pop("_t0_perf", None)
-    data["finished_at"] = _iso_now()
-    data["duration_ms"] = round((time.perf_counter() - float(t0)) * 1000.0, 3) if t0 is not None else None
-    stages[stage] = data
-    timing["stages"] = stages
+    prof = get_profiler()
+    data = timing["stages"].setdefault(stage, {})
+    span = prof.close(stage, **{k: v for k, v in data.items() if k != "started_at"})
+    if span is None:
+        data["finished_at"] = _iso_now()
+        data["duration_ms"] = None
+        return timing
+    data["finished_at"] = prof.wall_iso(span.end_ns)
+    data["duration_ms"] = span.duration_ms
     return timing
 
 
 def _timing_finalize(timing: Dict[str, Any]) -> Dict[str, Any]:
-    t0 = timing.pop("_pipeline_t0_perf", None)
+    span = get_profiler().close("episode")
     timing["pipeline_finished_at"] = _iso_now()
-    timing["pipeline_duration_ms"] = round((time.perf_counter() - float(t0)) * 1000.0, 3) if t0 is not None else None
+    timing["pipeline_duration_ms"] = span.duration_ms if span is not None else None
     return timing
 
 
@@ -612,6 +674,17 @@ def _memory_summary(hits: List[Dict[str, Any]], *, current_pattern_key: Optional
     return summary
 
 
+def retrieve_memory_many(mem: "FaissMemory", queries: List[Tuple[str, str]], *, k: int = 3) -> List[List[Dict[str, Any]]]:
+    """retrieve_memory para muchos episodios a la vez: (case_text, pattern_text) -> hits mergeados."""
+    grouped = mem.search_episodes(
+        [[case_text, pattern_text] for case_text, pattern_text in queries],
+        ks=MEMORY_QUERY_KS,
+        thresholds=MEMORY_QUERY_THRESHOLDS,
+        cache_queries=MEMORY_QUERY_CACHE,
+    )
+    return [_merge_memory_hits(case_hits, pattern_hits, k=k) for case_hits, pattern_hits in grouped]
+
+
 def _merge_memory_hits(*hit_sets: List[Any], k: int = 3) -> List[Dict[str, Any]]:
     merged: Dict[int, Dict[str, Any]] = {}
     for hit_set in hit_sets:
@@ -682,12 +755,22 @@ class BlueState(TypedDict, total=False):
     decisions_path: Optional[str]
     actions_path: Optional[str]
     memory_dir: Optional[str]
+    memory_enabled: Optional[bool]
+    memory_options: Optional[Dict[str, Any]]
+    compact_evidence: Optional[bool]
+    evidence_blobs_path: Optional[str]
     gt_dir: Optional[str]
     schema_mapper_mode: Optional[str]
     schema_map_min_confidence: Optional[float]
     schema_map_cache_path: Optional[str]
     schema_cache_scope: Optional[str]
     schema_adapt_mode: Optional[str]
+    schema_profile_mapper: Optional[bool]
+    schema_similar_reuse: Optional[bool]
+    schema_similar_min_jaccard: Optional[float]
+    schema_llm_breaker_threshold: Optional[int]
+    schema_llm_breaker_cooldown_sec: Optional[float]
+    schema_llm_negative_ttl_sec: Optional[float]
     backend_b_alias_mode: Optional[str]
     mcp_enabled: Optional[bool]
     mcp_tool: Optional[str]
@@ -778,14 +861,11 @@ def observe(state: BlueState) -> BlueState:
         t_detect_source = None
 
     if calls:
-        stages = dict(timing.get("stages") or {})
-        stage_data = dict(stages.get("observe") or {})
+        stage_data = timing["stages"]["observe"]
         stage_data["tool_mode"] = calls[0].get("mode")
         stage_data["tool_backend"] = calls[0].get("backend")
         stage_data["tool_name"] = calls[0].get("tool_name")
         stage_data["tool_calls"] = len(calls)
-        stages["observe"] = stage_data
-        timing["stages"] = stages
 
     timing = _timing_exit(timing, "observe")
     return {
@@ -832,6 +912,8 @@ def normalize_schema(state: BlueState) -> BlueState:
         mapping_signature = ""
         mapping_cache_hit = True
         mapping_llm_called = False
+        mapping_coalesced = False
+        mapping_negative_cache = False
         mapping_error = ""
     else:
         mapping = dict(mapping_result.mapping if mapping_result is not None else {})
@@ -840,6 +922,8 @@ def normalize_schema(state: BlueState) -> BlueState:
         mapping_signature = mapping_result.signature if mapping_result is not None else ""
         mapping_cache_hit = bool(mapping_result.cache_hit) if mapping_result is not None else False
         mapping_llm_called = bool(mapping_result.llm_called) if mapping_result is not None else False
+        mapping_coalesced = bool(mapping_result.coalesced) if mapping_result is not None else False
+        mapping_negative_cache = bool(mapping_result.negative_cache) if mapping_result is not None else False
         mapping_error = str(mapping_result.error or "") if mapping_result is not None else ""
 
     missing_core = any(
@@ -867,8 +951,7 @@ def normalize_schema(state: BlueState) -> BlueState:
         if not t_detect_source:
             t_detect_source = "normalized_detection_event"
 
-    stages = dict(timing.get("stages") or {})
-    stage_data = dict(stages.get("normalize_schema") or {})
+    stage_data = timing["stages"]["normalize_schema"]
     stage_data["backend"] = backend
     stage_data["mapper_enabled"] = bool(mapper.enabled)
     stage_data["llm_provider"] = str(mapper.provider)
@@ -877,12 +960,14 @@ def normalize_schema(state: BlueState) -> BlueState:
     stage_data["mapping_signature"] = mapping_signature
     stage_data["cache_hit"] = mapping_cache_hit
     stage_data["llm_called"] = mapping_llm_called
+    stage_data["llm_coalesced"] = mapping_coalesced
+    stage_data["negative_cache"] = mapping_negative_cache
+    llm_breaker = mapper.llm_breaker_state()
+    stage_data["llm_breaker_state"] = llm_breaker["state"]
     if mapping_error:
         stage_data["mapping_error"] = mapping_error
     stage_data["adapt_mode"] = adapt_mode
     stage_data["backend_b_alias_mode"] = str(state.get("backend_b_alias_mode") or "full")
-    stages["normalize_schema"] = stage_data
-    timing["stages"] = stages
 
     timing = _timing_exit(timing, "normalize_schema")
     return {
@@ -899,6 +984,9 @@ def normalize_schema(state: BlueState) -> BlueState:
             "signature": mapping_signature,
             "cache_hit": mapping_cache_hit,
             "llm_called": mapping_llm_called,
+            "coalesced": mapping_coalesced,
+            "negative_cache": mapping_negative_cache,
+            "llm_breaker": llm_breaker,
             "error": mapping_error or None,
             "adapt_mode": adapt_mode,
             "backend_b_alias_mode": str(state.get("backend_b_alias_mode") or "full"),
@@ -930,9 +1018,22 @@ def retrieve_memory(state: BlueState) -> BlueState:
     case_text = build_case_text(detection_event, asset_context)
     pattern_text = build_pattern_text(detection_event, asset_context)
     pattern_key = build_pattern_key(detection_event, asset_context)
-    mem = get_memory(_memory_dir_from_state(state))
-    case_hits = mem.search(text=case_text, k=4, threshold=MEMORY_SEARCH_THRESHOLD)
-    pattern_hits = mem.search(text=pattern_text, k=4, threshold=max(0.56, MEMORY_SEARCH_THRESHOLD - 0.06))
+    if not _memory_enabled(state):
+        timing = _timing_exit(timing, "retrieve_memory")
+        return {
+            "memory_hits": [],
+            "case_text": case_text,
+            "pattern_text": pattern_text,
+            "pattern_key": pattern_key,
+            "timing": timing,
+        }
+    mem = get_memory(_memory_dir_from_state(state), _memory_options(state))
+    case_hits, pattern_hits = mem.search_many(
+        [case_text, pattern_text],
+        ks=MEMORY_QUERY_KS,
+        thresholds=MEMORY_QUERY_THRESHOLDS,
+        cache_queries=MEMORY_QUERY_CACHE,
+    )
     hits = _merge_memory_hits(case_hits, pattern_hits, k=3)
     timing = _timing_exit(timing, "retrieve_memory")
     return {
@@ -1306,6 +1407,74 @@ def act(state: BlueState) -> BlueState:
     }
 
 
+def build_memory_case(
+    *,
+    episode_id: int,
+    run_id: Optional[str],
+    detection_event: Dict[str, Any],
+    asset_context: Dict[str, Any],
+    correlation: Dict[str, Any],
+    gating: Dict[str, Any],
+    approved: bool,
+    final_decision: str,
+    confidence: Optional[float],
+    gt: Optional[Dict[str, Any]],
+) -> Optional[Dict[str, Any]]:
+    """
+    Caso que log aprende de un episodio (kwargs de FaissMemory.add_case) o None si no hay
+    feedback (ni ground truth ni gating). src.memory.build lo reusa sobre decisions.jsonl.
+    """
+    signals = int(correlation.get("signals", 1))
+    severity = str(detection_event.get("severity") or "low")
+    tags = list(detection_event.get("tags") or [])
+
+    label: Optional[str] = None
+    learned_decision: Optional[str] = None
+    learned_reason: Optional[str] = None
+    learned_tags: List[str] = []
+
+    if gt is not None:
+        if bool(gt.get("attack_present")):
+            label = "TP"
+            learned_decision = "block_ip" if (severity == "high" or signals >= 2) else "escalate"
+            learned_reason = "ground_truth_attack_present"
+            learned_tags = ["ground_truth_feedback", "attack_present"]
+        else:
+            label = "FP"
+            learned_decision = "no_block" if signals <= 1 else "escalate"
+            learned_reason = "ground_truth_benign"
+            learned_tags = ["ground_truth_feedback", "benign"]
+            if "service_account" in tags or "allowlisted_user" in tags:
+                learned_tags.append("allowlist_pattern")
+            if detection_event.get("user") or detection_event.get("host") or detection_event.get("action"):
+                learned_tags.append("recurrent_pattern")
+
+    if gating.get("prompted") is True and label is None:
+        label = "TP" if approved else "FP"
+        learned_decision = final_decision
+        learned_reason = f"gating_feedback: approved={approved}"
+        learned_tags = ["gating_feedback"]
+
+    if not (label and learned_decision and learned_reason):
+        return None
+    case_text = build_case_text(detection_event, asset_context)
+    pattern_text = build_pattern_text(detection_event, asset_context)
+    return {
+        "text": f"{case_text} {pattern_text}".strip(),
+        "label": label,
+        "decision": learned_decision,
+        "reason": learned_reason,
+        "tags": learned_tags,
+        "confidence": confidence,
+        "source": {
+            "episode_id": episode_id,
+            "run_id": run_id,
+            "pattern_key": build_pattern_key(detection_event, asset_context),
+            "event_type": detection_event.get("event_type"),
+        },
+    }
+
+
 def log(state: BlueState) -> BlueState:
     timing = _timing_enter(state, "log")
     episode_id = state["episode_id"]
@@ -1321,57 +1490,24 @@ def log(state: BlueState) -> BlueState:
     if proposed == "block_ip" and final != "block_ip":
         reason = (reason + " | Bloqueo propuesto pero rechazado por gating.").strip()
 
-    case_text = state.get("case_text")
-    if case_text:
-        gt = _load_ground_truth(_ground_truth_dir_from_state(state), episode_id)
-        attack_present = bool((gt or {}).get("attack_present"))
-        signals = int((state.get("correlation") or {}).get("signals", 1))
-        severity = str(((state.get("detection_event") or {}).get("severity")) or "low")
-        tags = list(((state.get("detection_event") or {}).get("tags")) or [])
-        detection_event = state.get("detection_event") or {}
-        pattern_text = state.get("pattern_text") or build_pattern_text(detection_event, state.get("asset_context") or {})
-        pattern_key = state.get("pattern_key") or build_pattern_key(detection_event, state.get("asset_context") or {})
-
-        label: Optional[str] = None
-        learned_decision: Optional[str] = None
-        learned_reason: Optional[str] = None
-        learned_tags: List[str] = []
-
-        if gt is not None:
-            if attack_present:
-                label = "TP"
-                learned_decision = "block_ip" if (severity == "high" or signals >= 2) else "escalate"
-                learned_reason = "ground_truth_attack_present"
-                learned_tags = ["ground_truth_feedback", "attack_present"]
-            else:
-                label = "FP"
-                learned_decision = "no_block" if signals <= 1 else "escalate"
-                learned_reason = "ground_truth_benign"
-                learned_tags = ["ground_truth_feedback", "benign"]
-                if "service_account" in tags or "allowlisted_user" in tags:
-                    learned_tags.append("allowlist_pattern")
-                if detection_event.get("user") or detection_event.get("host") or detection_event.get("action"):
-                    learned_tags.append("recurrent_pattern")
-
-        if gating.get("prompted") is True and label is None:
-            label = "TP" if approved else "FP"
-            learned_decision = final
-            learned_reason = f"gating_feedback: approved={approved}"
-            learned_tags = ["gating_feedback"]
-
-        if label and learned_decision and learned_reason:
-            mem = get_memory(_memory_dir_from_state(state))
-            stored_text = f"{case_text} {pattern_text}".strip()
-            if not _memory_case_exists(mem, text=stored_text, label=label, episode_id=episode_id):
-                mem.add_case(
-                    text=stored_text,
-                    label=label,
-                    decision=learned_decision,
-                    reason=learned_reason,
-                    tags=learned_tags,
-                    confidence=state.get("confidence"),
-                    source={"episode_id": episode_id, "run_id": run_id, "pattern_key": pattern_key},
-                )
+    detection_event = state.get("detection_event") or {}
+    if state.get("case_text") and _memory_enabled(state):
+        case = build_memory_case(
+            episode_id=episode_id,
+            run_id=run_id,
+            detection_event=detection_event,
+            asset_context=state.get("asset_context") or {},
+            correlation=state.get("correlation") or {},
+            gating=gating,
+            approved=approved,
+            final_decision=final,
+            confidence=state.get("confidence"),
+            gt=_load_ground_truth(_ground_truth_dir_from_state(state), episode_id),
+        )
+        if case is not None:
+            mem = get_memory(_memory_dir_from_state(state), _memory_options(state))
+            if not mem.has_case(**case):
+                mem.add_case(**case)
 
     timing = _timing_exit(timing, "log")
     timing = _timing_finalize(timing)
@@ -1386,12 +1522,16 @@ def log(state: BlueState) -> BlueState:
         "asset_context": state.get("asset_context"),
         "memory_hits": state.get("memory_hits"),
         "decision_trace": state.get("decision_trace"),
+        "confidence": state.get("confidence"),
         "schema_mapping": state.get("schema_mapping"),
         "search_tool": state.get("search_tool_info"),
         "correlation": state.get("correlation"),
         "action_result": state.get("action_result"),
         "timing": timing,
     }
+    if state.get("compact_evidence"):
+        blobs_path = state.get("evidence_blobs_path") or os.path.join(os.path.dirname(decisions_path), "evidence_blobs.jsonl")
+        evidence = compact_evidence(evidence, blobs_path=blobs_path)
 
     append_decision(
         episode_id=episode_id,
@@ -1403,6 +1543,8 @@ def log(state: BlueState) -> BlueState:
         out_path=decisions_path,
         timestamp=_iso_now(),
     )
+    end_episode_jsonl_writers()
+    get_profiler().flush()
 
     return {"timing": timing}
 
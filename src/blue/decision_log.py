@@ -1,8 +1,10 @@
 from __future__ import annotations
-import json, os
+import os
 from datetime import datetime, timezone
 from typing import Any, Dict, Optional
 
+from src.core.jsonl_writer import get_jsonl_writer
+
 def _iso_now() -> str:
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
@@ -35,6 +37,6 @@ def append_decision(
     }
     os.makedirs(os.path.dirname(out_path), exist_ok=True)
     #path = out_path
-    with open(out_path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+    # El writer decide cuando baja a disco (ver configure_jsonl_writers).
+    get_jsonl_writer(out_path).append(record)
     return {"ok": True, "path": out_path, "record": record}
@@ -1,10 +1,23 @@
 from __future__ import annotations
 import argparse
 import os
-from src.blue.blue_agent_graph import build_blue_graph, run_blue_episode
+from typing import Dict, List, Optional
+
+from src.blue.blue_agent_graph import build_blue_graph, checkpoint_memories, release_run_state, run_blue_episode
+from src.blue.schema_mapper import (
+    DEFAULT_BREAKER_COOLDOWN_SEC,
+    DEFAULT_BREAKER_THRESHOLD,
+    DEFAULT_NEGATIVE_TTL_SEC,
+    DEFAULT_SIMILAR_MIN_JACCARD,
+)
+from src.core.jsonl_writer import FLUSH_POLICIES, configure_jsonl_writers, flush_jsonl_writers
+from src.core.profiler import configure_profiler, get_profiler
 from src.core.run_manager import new_run_id, prepare_run
+from src.memory.ann_index import DEFAULT_ANN_THRESHOLD, INDEX_TYPES, STORAGE_TYPES
+from src.memory.compaction import EVICTION_POLICIES
+from src.memory.embedders import parse_embedder_spec
 
-def main():
+def build_arg_parser() -> argparse.ArgumentParser:
     ap = argparse.ArgumentParser()
     ap.add_argument("--episode-id", type=int, default=None)
     ap.add_argument("--episode-start", type=int, default=None)
@@ -20,6 +33,18 @@ def main():
     ap.add_argument("--schema-map-cache-path", type=str, default=None)
     ap.add_argument("--schema-cache-scope", type=str, default="run", choices=["run", "persistent"])
     ap.add_argument("--schema-adapt-mode", type=str, default="contract_first", choices=["contract_first", "llm_first"])
+    # Mapper local por forma de valores antes del LLM; solo escala si no llega a --schema-map-min-confidence.
+    ap.add_argument("--schema-profile-mapper", dest="schema_profile_mapper", action="store_true")
+    ap.add_argument("--no-schema-profile-mapper", dest="schema_profile_mapper", action="store_false")
+    # Firma nueva con claves casi iguales (Jaccard) a una cacheada: reusa ese mapping si valida en la muestra.
+    ap.add_argument("--schema-similar-reuse", dest="schema_similar_reuse", action="store_true")
+    ap.add_argument("--no-schema-similar-reuse", dest="schema_similar_reuse", action="store_false")
+    ap.add_argument("--schema-similar-min-jaccard", type=float, default=DEFAULT_SIMILAR_MIN_JACCARD)
+    # Provider caido: el breaker abre tras N timeouts/errores de transporte seguidos (0 = sin breaker) y
+    # prueba de nuevo pasado el cooldown; un error por firma no se reintenta hasta el TTL (0 = sin cache negativo).
+    ap.add_argument("--schema-llm-breaker-threshold", type=int, default=DEFAULT_BREAKER_THRESHOLD)
+    ap.add_argument("--schema-llm-breaker-cooldown-sec", type=float, default=DEFAULT_BREAKER_COOLDOWN_SEC)
+    ap.add_argument("--schema-llm-negative-ttl-sec", type=float, default=DEFAULT_NEGATIVE_TTL_SEC)
     ap.add_argument("--backend-b-alias-mode", type=str, default="full", choices=["full", "minimal"])
     ap.add_argument("--mcp-enabled", dest="mcp_enabled", action="store_true")
     ap.add_argument("--no-mcp", dest="mcp_enabled", action="store_false")
@@ -31,9 +56,52 @@ def main():
     ap.add_argument("--ollama-model", type=str, default="qwen3:8b")
     ap.add_argument("--llm-timeout-sec", type=float, default=8.0)
     ap.add_argument("--non-interactive", action="store_true")
+    ap.add_argument("--trace", dest="trace", action="store_true")
+    ap.add_argument("--no-trace", dest="trace", action="store_false")
+    # --no-memory: sin retrieve/learn FAISS; el proceso no importa faiss ni sentence-transformers.
+    ap.add_argument("--memory", dest="memory_enabled", action="store_true")
+    ap.add_argument("--no-memory", dest="memory_enabled", action="store_false")
+    # Backend ANN de la memoria: flat exacto hasta --memory-ann-threshold casos, despues este indice.
+    ap.add_argument("--memory-index", type=str, default="hnsw", choices=list(INDEX_TYPES))
+    ap.add_argument("--memory-ann-threshold", type=int, default=DEFAULT_ANN_THRESHOLD)
+    # fp16/sq8: vectores con scalar quantization (index.faiss 2x/4x mas chico, scores aproximados).
+    ap.add_argument("--memory-storage", type=str, default="float32", choices=list(STORAGE_TYPES))
+    # minilm (sentence-transformers) o hashing[:n_features] (scikit-learn, sin torch).
+    ap.add_argument("--memory-embedder", type=parse_embedder_spec, default="minilm")
+    # minilm en CPU: int8 dinamico, hilos intra-op fijos, tope de secuencia y micro-batching.
+    ap.add_argument("--memory-embed-cpu", dest="memory_embed_cpu", action="store_true")
+    ap.add_argument("--no-memory-embed-cpu", dest="memory_embed_cpu", action="store_false")
+    ap.add_argument("--memory-embed-threads", type=int, default=None)
+    ap.add_argument("--memory-embed-max-seq-len", type=int, default=None)
+    # Socket de src.memory.embed_server; sin servidor vivo se carga el modelo en el proceso.
+    ap.add_argument("--memory-embed-server", type=str, default=None)
+    # Capacidad de la memoria: tope de casos, expiracion por inactividad y consolidacion de casi-duplicados.
+    ap.add_argument("--memory-max-cases", type=int, default=None)
+    ap.add_argument("--memory-max-age-days", type=float, default=None)
+    ap.add_argument("--memory-eviction", type=str, default="lru", choices=list(EVICTION_POLICIES))
+    ap.add_argument("--memory-merge-threshold", type=float, default=None)
+    # Memoria semilla compartida: se abre read-only (mmap) y los casos nuevos van a la memoria del run.
+    ap.add_argument("--memory-seed-dir", type=str, default=None)
+    # Durabilidad de decisions.jsonl / enforcement_actions.jsonl.
+    ap.add_argument("--log-flush", type=str, default="episode", choices=list(FLUSH_POLICIES))
+    ap.add_argument("--log-flush-every", type=int, default=20)
+    ap.add_argument("--log-fsync", dest="log_fsync", action="store_true")
+    ap.add_argument("--no-log-fsync", dest="log_fsync", action="store_false")
+    # Evidencia compacta: bloques repetidos en evidence_blobs.jsonl, referenciados por hash.
+    ap.add_argument("--compact-evidence", dest="compact_evidence", action="store_true")
+    ap.add_argument("--no-compact-evidence", dest="compact_evidence", action="store_false")
     ap.set_defaults(mcp_enabled=True)
-    args = ap.parse_args()
+    ap.set_defaults(schema_profile_mapper=True)
+    ap.set_defaults(schema_similar_reuse=True)
+    ap.set_defaults(trace=True)
+    ap.set_defaults(compact_evidence=False)
+    ap.set_defaults(log_fsync=False)
+    ap.set_defaults(memory_enabled=True)
+    ap.set_defaults(memory_embed_cpu=False)
+    return ap
+
 
+def run_from_args(ap: argparse.ArgumentParser, args: argparse.Namespace) -> Dict[str, object]:
     if args.episode_id is not None:
         episode_ids = [int(args.episode_id)]
     else:
@@ -46,6 +114,11 @@ def main():
     run_id = args.run_id or new_run_id("blue")
     paths = prepare_run(run_id, clean=args.clean_run, meta={"component": "blue_agent"})
     memory_dir = os.path.join(paths["base"], "memory")
+    # En un proceso persistente (agent_worker) el run dir pudo reescribirse entre invocaciones.
+    release_run_state(paths["base"])
+    # Trace Chrome (chrome://tracing / Perfetto) por run; fase1/fase2 agregan al mismo archivo.
+    configure_profiler(trace_path=paths["trace"] if args.trace else None)
+    configure_jsonl_writers(policy=args.log_flush, flush_every=args.log_flush_every, fsync=args.log_fsync)
 
     base_state = {
         "logs_dir": args.logs_dir,
@@ -58,6 +131,12 @@ def main():
         "schema_map_cache_path": args.schema_map_cache_path,
         "schema_cache_scope": args.schema_cache_scope,
         "schema_adapt_mode": args.schema_adapt_mode,
+        "schema_profile_mapper": args.schema_profile_mapper,
+        "schema_similar_reuse": args.schema_similar_reuse,
+        "schema_similar_min_jaccard": args.schema_similar_min_jaccard,
+        "schema_llm_breaker_threshold": args.schema_llm_breaker_threshold,
+        "schema_llm_breaker_cooldown_sec": args.schema_llm_breaker_cooldown_sec,
+        "schema_llm_negative_ttl_sec": args.schema_llm_negative_ttl_sec,
         "backend_b_alias_mode": args.backend_b_alias_mode,
         "mcp_enabled": args.mcp_enabled,
         "mcp_tool": args.mcp_tool,
@@ -71,17 +150,51 @@ def main():
         "decisions_path": paths["decisions"],
         "actions_path": paths["actions"],
         "memory_dir": memory_dir,
+        "memory_enabled": args.memory_enabled,
+        "memory_options": {
+            "index_type": args.memory_index,
+            "ann_threshold": args.memory_ann_threshold,
+            "storage": args.memory_storage,
+            "embedder": args.memory_embedder,
+            "embed_cpu": args.memory_embed_cpu,
+            "embed_threads": args.memory_embed_threads,
+            "embed_max_seq_length": args.memory_embed_max_seq_len,
+            "embed_server": args.memory_embed_server,
+            "max_cases": args.memory_max_cases,
+            "max_age_days": args.memory_max_age_days,
+            "eviction": args.memory_eviction,
+            "merge_threshold": args.memory_merge_threshold,
+            "seed_dir": args.memory_seed_dir,
+        },
+        "compact_evidence": args.compact_evidence,
+        "evidence_blobs_path": paths["evidence_blobs"],
     }
 
     try:
-        app = build_blue_graph()
-        for episode_id in episode_ids:
-            out = app.invoke({"episode_id": episode_id, **base_state})
-            print(f"Blue Agent finished. run_id={run_id} episode={episode_id}. Final state keys: {list(out.keys())}")
-    except RuntimeError:
-        for episode_id in episode_ids:
-            out = run_blue_episode({"episode_id": episode_id, **base_state})
-            print(f"Blue Agent finished. run_id={run_id} episode={episode_id}. Final state keys: {list(out.keys())}")
+        try:
+            app = build_blue_graph()
+            for episode_id in episode_ids:
+                out = app.invoke({"episode_id": episode_id, **base_state})
+                print(f"Blue Agent finished. run_id={run_id} episode={episode_id}. Final state keys: {list(out.keys())}")
+        except RuntimeError:
+            for episode_id in episode_ids:
+                out = run_blue_episode({"episode_id": episode_id, **base_state})
+                print(f"Blue Agent finished. run_id={run_id} episode={episode_id}. Final state keys: {list(out.keys())}")
+    finally:
+        # El run queda completo en disco antes de devolver (CLI, agent_worker o judge posterior).
+        flush_jsonl_writers()
+        checkpoint_memories()
+        # Worker persistente: suelta memorias, mappers y tablas de blobs del run; solo queda
+        # caliente el estado de proceso (embedder, cache compartido de mappings).
+        release_run_state(paths["base"])
+        get_profiler().flush()
+    return {"run_id": run_id, "episodes": len(episode_ids), "run_dir": paths["base"]}
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    ap = build_arg_parser()
+    args = ap.parse_args(argv)
+    run_from_args(ap, args)
 
 if __name__ == "__main__":
     main()
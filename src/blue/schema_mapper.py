@@ -4,11 +4,17 @@ import hashlib
 import json
 import os
 import re
-from dataclasses import dataclass
+import threading
+import time
+from dataclasses import asdict, dataclass, replace
 from typing import Any, Dict, List, Optional
 from urllib import error as url_error
 from urllib import parse, request
 
+from src.core.file_lock import exclusive_lock
+from src.core.journal_store import JournalStore
+from src.core.profiler import get_profiler
+
 
 CANONICAL_FIELDS: List[str] = [
     "timestamp",
@@ -51,6 +57,45 @@ USEFUL_PARTIAL_REQUIRED_FIELDS = {
 USEFUL_PARTIAL_MIN_COVERAGE = 0.75
 
 
+# Mapper por perfil de valores (build_profile_mapping): tokens del nombre que apoyan cada campo.
+# Hints de 4+ letras tambien matchean como substring (tstamp -> stamp, labels_v2 -> labels).
+PROFILE_NAME_HINTS: Dict[str, List[str]] = {
+    "timestamp": ["timestamp", "ts", "time", "stamp", "when", "date", "epoch"],
+    "episode_id": ["episode", "ep", "case", "incident"],
+    "seed": ["seed", "rnd", "rand", "random"],
+    "event_type": ["event", "evt", "kind", "cat", "category", "type"],
+    "host": ["host", "asset", "node", "hostname", "endpoint", "machine", "device"],
+    "user": ["user", "usr", "actor", "principal", "account", "owner"],
+    "src_ip": ["src", "source", "origin", "from", "client"],
+    "dst_ip": ["dst", "dest", "destination", "target", "to", "server"],
+    "action": ["action", "op", "operation", "verb", "activity"],
+    "outcome": ["outcome", "result", "status", "state", "ok", "success"],
+    "severity": ["severity", "sev", "risk", "priority", "prio", "level", "crit"],
+    "process_name": ["process", "proc", "image", "exe", "binary", "cmd"],
+    "tags": ["tags", "tag", "tagset", "labels", "label"],
+}
+
+# Campos cuyos valores no se distinguen solos (un entero, un identificador): sin hint de nombre no se asignan.
+PROFILE_NAME_REQUIRED = {"episode_id", "seed", "user", "process_name"}
+
+PROFILE_VALUE_WEIGHT = 0.75
+PROFILE_MIN_SCORE = 0.6
+PROFILE_AMBIGUITY_MARGIN = 0.1
+
+
+# Reuso por firma cercana: Jaccard minimo entre claves observadas y cuantas entradas se validan.
+DEFAULT_SIMILAR_MIN_JACCARD = 0.8
+SIMILAR_MAX_CANDIDATES = 4
+# score de forma minimo (_value_shape_score) para que un campo reusado siga valiendo en la muestra nueva
+SIMILAR_MIN_VALUE_SCORE = 0.5
+
+
+# Circuit breaker por provider (timeouts/errores de transporte seguidos) y cache negativo por firma.
+DEFAULT_BREAKER_THRESHOLD = 3
+DEFAULT_BREAKER_COOLDOWN_SEC = 60.0
+DEFAULT_NEGATIVE_TTL_SEC = 300.0
+
+
 FALLBACK_ALIASES: Dict[str, List[str]] = {
     # Keep fallback strict so dynamic mode actually needs LLM under schema drift.
     "timestamp": ["timestamp"],
@@ -78,6 +123,138 @@ class MappingResult:
     error: Optional[str] = None
     cache_hit: bool = False
     llm_called: bool = False
+    # resultado de la llamada al LLM de otro hilo/proceso para la misma firma (single-flight)
+    coalesced: bool = False
+    # error de LLM reciente para la misma firma, todavia dentro del TTL (no se reintenta)
+    negative_cache: bool = False
+
+
+@dataclass
+class ProfileMapping:
+    mapping: Dict[str, str]
+    confidence: float
+    # score por campo canonico (1.0 para los resueltos por hints)
+    scores: Dict[str, float]
+
+
+class _KeySetIndex:
+    """Indice invertido clave observada -> entradas del cache, para Jaccard sin recorrer todo."""
+
+    def __init__(self) -> None:
+        self._keys: Dict[str, frozenset[str]] = {}
+        self._postings: Dict[str, set[str]] = {}
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, entry_id: str, keys: List[str]) -> None:
+        if entry_id in self._keys:
+            return
+        key_set = frozenset(keys)
+        self._keys[entry_id] = key_set
+        for key in key_set:
+            self._postings.setdefault(key, set()).add(entry_id)
+
+    def nearest(self, keys: List[str], *, backend: str, min_jaccard: float) -> List[tuple[float, str]]:
+        """(jaccard, entry_id) de las entradas de backend con jaccard >= min_jaccard, mejor primero."""
+        key_set = set(keys)
+        if not key_set:
+            return []
+        shared: Dict[str, int] = {}
+        for key in key_set:
+            for entry_id in self._postings.get(key, ()):
+                shared[entry_id] = shared.get(entry_id, 0) + 1
+        prefix = f"{backend}:"
+        out: List[tuple[float, str]] = []
+        for entry_id, inter in shared.items():
+            if not entry_id.partition("|")[2].startswith(prefix):
+                continue
+            jaccard = inter / float(len(key_set) + len(self._keys[entry_id]) - inter)
+            if jaccard >= min_jaccard:
+                out.append((jaccard, entry_id))
+        out.sort(key=lambda item: (-item[0], item[1]))
+        return out
+
+
+class _CircuitBreaker:
+    """
+    closed -> open tras `threshold` timeouts/errores de transporte seguidos; open -> half_open
+    pasado `cooldown_sec`, donde una sola llamada de prueba decide si vuelve a closed o a open.
+    """
+
+    def __init__(self, *, threshold: int, cooldown_sec: float) -> None:
+        self.threshold = threshold
+        self.cooldown_sec = cooldown_sec
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.short_circuited = 0
+        self._probe_started: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.threshold <= 0 or self.state == "closed":
+                return True
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.cooldown_sec:
+                self.state = "half_open"
+            # una prueba que nunca registro resultado (ej. termino coalescida) no bloquea para siempre
+            probe_stuck = self._probe_started is not None and time.monotonic() - self._probe_started >= self.cooldown_sec
+            if self.state == "half_open" and (self._probe_started is None or probe_stuck):
+                self._probe_started = time.monotonic()
+                return True
+            self.short_circuited += 1
+            return False
+
+    def record(self, *, failed: bool) -> None:
+        with self._lock:
+            self._probe_started = None
+            if not failed:
+                self.state = "closed"
+                self.failures = 0
+                return
+            self.failures += 1
+            if self.threshold > 0 and (self.state == "half_open" or self.failures >= self.threshold):
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {
+                "state": self.state,
+                "consecutive_failures": self.failures,
+                "short_circuited": self.short_circuited,
+            }
+            if self.state == "open":
+                out["retry_in_sec"] = round(max(0.0, self.cooldown_sec - (time.monotonic() - self.opened_at)), 3)
+            return out
+
+
+# un breaker por provider+endpoint, compartido por todos los mappers del proceso
+_BREAKERS: Dict[str, _CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def _get_breaker(key: str, *, threshold: int, cooldown_sec: float) -> _CircuitBreaker:
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(key)
+        if breaker is None:
+            breaker = _CircuitBreaker(threshold=threshold, cooldown_sec=cooldown_sec)
+            _BREAKERS[key] = breaker
+        breaker.threshold = threshold
+        breaker.cooldown_sec = cooldown_sec
+        return breaker
+
+
+class _Flight:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.result: Optional[MappingResult] = None
+
+
+# llamadas al LLM en curso en este proceso: "{provider}|{model}|{backend}:{signature}" -> _Flight
+_INFLIGHT: Dict[str, _Flight] = {}
+_INFLIGHT_LOCK = threading.Lock()
 
 
 class DynamicSchemaMapper:
@@ -94,6 +271,12 @@ class DynamicSchemaMapper:
         min_confidence: float = 0.75,
         llm_timeout_sec: float = 8.0,
         shared_cache_path: Optional[str] = None,
+        profile_mapper: bool = True,
+        similar_reuse: bool = True,
+        similar_min_jaccard: float = DEFAULT_SIMILAR_MIN_JACCARD,
+        breaker_threshold: int = DEFAULT_BREAKER_THRESHOLD,
+        breaker_cooldown_sec: float = DEFAULT_BREAKER_COOLDOWN_SEC,
+        negative_ttl_sec: float = DEFAULT_NEGATIVE_TTL_SEC,
     ) -> None:
         self.enabled = enabled
         self.cache_path = cache_path
@@ -105,8 +288,21 @@ class DynamicSchemaMapper:
         self.ollama_model = ollama_model
         self.min_confidence = min_confidence
         self.llm_timeout_sec = max(1.0, float(llm_timeout_sec))
-        self._cache: Dict[str, Any] = self._load_cache()
-        self._shared_cache: Dict[str, Any] = self._load_shared_cache()
+        self.profile_mapper = bool(profile_mapper)
+        self.similar_reuse = bool(similar_reuse)
+        self.similar_min_jaccard = max(0.0, min(1.0, float(similar_min_jaccard)))
+        # threshold 0 desactiva el breaker; ttl 0 desactiva el cache negativo
+        self.breaker_threshold = max(0, int(breaker_threshold))
+        self.breaker_cooldown_sec = max(0.0, float(breaker_cooldown_sec))
+        self.negative_ttl_sec = max(0.0, float(negative_ttl_sec))
+        # Snapshot JSON + journal append-only (ver journal_store.py): set() es O(1) y runs en
+        # paralelo sobre el mismo archivo ven los mappings de los demas.
+        self._cache = JournalStore(cache_path) if cache_path else None
+        self._shared_cache = JournalStore(self.shared_cache_path) if self.shared_cache_path else None
+        self._similar_index = _KeySetIndex()
+        # largo de cada store la ultima vez que se indexo (los journals crecen con otros procesos)
+        self._similar_synced: Dict[str, int] = {}
+        self._similar_lock = threading.Lock()
 
     def _cache_set(
         self,
@@ -116,17 +312,23 @@ class DynamicSchemaMapper:
         source: str,
         *,
         write_shared: bool = False,
+        keys: Optional[List[str]] = None,
     ) -> None:
-        payload = {
+        payload: Dict[str, Any] = {
             "mapping": dict(mapping),
             "confidence": float(confidence),
             "source": str(source),
         }
-        self._cache[cache_key] = payload
-        self._save_cache()
-        if write_shared and self.shared_cache_path:
-            self._shared_cache[cache_key] = payload
-            self._save_shared_cache()
+        if keys is not None:
+            # claves observadas de la muestra: las usa el indice de firmas cercanas
+            payload["keys"] = list(keys)
+        if _should_retry_cached_source(str(source)) and self.negative_ttl_sec > 0:
+            # cache negativo: el error se respeta hasta expires_at y despues se reintenta
+            payload["expires_at"] = round(time.time() + self.negative_ttl_sec, 3)
+        if self._cache is not None:
+            self._cache.set(cache_key, payload)
+        if write_shared and self._shared_cache is not None:
+            self._shared_cache.set(cache_key, payload)
 
     def infer_mapping(
         self,
@@ -140,6 +342,7 @@ class DynamicSchemaMapper:
         key_signature = self._schema_signature(sample_events, contract_hints=None)
         if not sample_events:
             return MappingResult(mapping={}, confidence=0.0, source="empty", signature=signature)
+        observed_keys = sorted(_collect_keys(sample_events[:8]))
 
         cache_key = f"{backend}:{signature}"
         relaxed_cache_key = f"{backend}:{key_signature}"
@@ -167,6 +370,7 @@ class DynamicSchemaMapper:
                 mapping=result.mapping,
                 confidence=result.confidence,
                 source=result.source,
+                keys=observed_keys,
             )
             return result
 
@@ -185,9 +389,58 @@ class DynamicSchemaMapper:
                 mapping=result.mapping,
                 confidence=result.confidence,
                 source=result.source,
+                keys=observed_keys,
             )
             return result
 
+        if self.similar_reuse:
+            # Una firma nueva que solo agrega/saca claves opcionales (v4_sparse: usr_ref,
+            # proc_meta) reusa el mapping de la firma cacheada mas cercana, validado contra la muestra.
+            similar = self._similar_lookup(
+                backend=backend,
+                observed_keys=observed_keys,
+                sample_events=sample_events,
+                base_mapping=base_mapping,
+                signature=signature,
+            )
+            if similar is not None:
+                self._cache_store_variants(
+                    cache_key=cache_key,
+                    relaxed_cache_key=relaxed_cache_key,
+                    mapping=similar.mapping,
+                    confidence=similar.confidence,
+                    source=similar.source,
+                    keys=observed_keys,
+                )
+                return similar
+
+        if self.profile_mapper:
+            # Drift comun (renombres, epoch ms, P1/P2, ok bool, tags "a,b") se resuelve por la
+            # forma de los valores; el LLM solo si la cobertura no llega a min_confidence.
+            with get_profiler().span("value_profile", cat="schema", signature=signature) as span:
+                profiled = build_profile_mapping(sample_events, hints=base_mapping)
+                span.args["confidence"] = round(profiled.confidence, 3)
+            if profiled.confidence >= self.min_confidence:
+                mapping = dict(base_mapping)
+                mapping.update(profiled.mapping)
+                result = MappingResult(
+                    mapping=mapping,
+                    confidence=profiled.confidence,
+                    source="value_profile",
+                    signature=signature,
+                    cache_hit=False,
+                    llm_called=False,
+                )
+                self._cache_store_variants(
+                    cache_key=cache_key,
+                    relaxed_cache_key=relaxed_cache_key,
+                    mapping=result.mapping,
+                    confidence=result.confidence,
+                    source=result.source,
+                    keys=observed_keys,
+                )
+                return result
+
         llm_result: Optional[MappingResult]
         if self.provider == "gemini":
             if not self.api_key:
@@ -205,16 +458,17 @@ class DynamicSchemaMapper:
                     mapping=result.mapping,
                     confidence=result.confidence,
                     source=result.source,
+                    keys=observed_keys,
                 )
                 return result
-            llm_result = self._infer_with_gemini(
+            llm_result = self._request_llm(
                 backend=backend,
                 sample_events=sample_events,
                 signature=signature,
                 contract_hints=contract_hints,
             )
         elif self.provider == "ollama":
-            llm_result = self._infer_with_ollama(
+            llm_result = self._request_llm(
                 backend=backend,
                 sample_events=sample_events,
                 signature=signature,
@@ -235,6 +489,7 @@ class DynamicSchemaMapper:
                 mapping=result.mapping,
                 confidence=result.confidence,
                 source=result.source,
+                keys=observed_keys,
             )
             return result
         if llm_result is None:
@@ -253,6 +508,7 @@ class DynamicSchemaMapper:
                 mapping=result.mapping,
                 confidence=result.confidence,
                 source=result.source,
+                keys=observed_keys,
             )
             return result
 
@@ -264,14 +520,19 @@ class DynamicSchemaMapper:
                 signature=signature,
                 error=llm_result.error,
                 cache_hit=False,
-                llm_called=True,
+                llm_called=llm_result.llm_called,
+                coalesced=llm_result.coalesced,
             )
+            if result.source == "fallback_llm_circuit_open":
+                # sin llamada no hay nada que recordar para la firma: vuelve a probar cuando cierre
+                return result
             self._cache_store_variants(
                 cache_key=cache_key,
                 relaxed_cache_key=relaxed_cache_key,
                 mapping=result.mapping,
                 confidence=result.confidence,
                 source=result.source,
+                keys=observed_keys,
             )
             return result
 
@@ -286,7 +547,8 @@ class DynamicSchemaMapper:
                     source=self.provider,
                     signature=signature,
                     cache_hit=False,
-                    llm_called=True,
+                    llm_called=llm_result.llm_called,
+                    coalesced=llm_result.coalesced,
                 )
                 self._cache_store_variants(
                     cache_key=cache_key,
@@ -294,6 +556,7 @@ class DynamicSchemaMapper:
                     mapping=result.mapping,
                     confidence=result.confidence,
                     source=result.source,
+                    keys=observed_keys,
                 )
                 return result
             result = MappingResult(
@@ -302,7 +565,8 @@ class DynamicSchemaMapper:
                 source="fallback_low_confidence",
                 signature=signature,
                 cache_hit=False,
-                llm_called=True,
+                llm_called=llm_result.llm_called,
+                coalesced=llm_result.coalesced,
             )
             self._cache_store_variants(
                 cache_key=cache_key,
@@ -310,6 +574,7 @@ class DynamicSchemaMapper:
                 mapping=result.mapping,
                 confidence=result.confidence,
                 source=result.source,
+                keys=observed_keys,
             )
             return result
 
@@ -319,7 +584,8 @@ class DynamicSchemaMapper:
             source=self.provider,
             signature=signature,
             cache_hit=False,
-            llm_called=True,
+            llm_called=llm_result.llm_called,
+            coalesced=llm_result.coalesced,
         )
         self._cache_store_variants(
             cache_key=cache_key,
@@ -327,9 +593,126 @@ class DynamicSchemaMapper:
             mapping=result.mapping,
             confidence=result.confidence,
             source=result.source,
+            keys=observed_keys,
         )
         return result
 
+    def _request_llm(
+        self,
+        *,
+        backend: str,
+        sample_events: List[Dict[str, Any]],
+        signature: str,
+        contract_hints: Dict[str, str],
+    ) -> Optional[MappingResult]:
+        """
+        Single-flight por {backend}:{signature}: en el proceso, los hilos que piden la misma
+        firma esperan la llamada en curso; entre procesos, un lock por firma junto al cache
+        compartido serializa la llamada y el resultado queda en un archivo para los que
+        esperaban. Los que reusan el resultado lo reciben con llm_called=False, coalesced=True.
+        """
+        breaker = self._breaker()
+        if not breaker.allow():
+            return MappingResult(
+                mapping={},
+                confidence=0.0,
+                source="llm_circuit_open",
+                signature=signature,
+                error=f"circuit_open: {self.provider} fallo {breaker.failures} veces seguidas",
+                cache_hit=False,
+                llm_called=False,
+            )
+        flight_key = f"{self.provider}|{self._llm_model()}|{backend}:{signature}"
+        with _INFLIGHT_LOCK:
+            flight = _INFLIGHT.get(flight_key)
+            leader = flight is None
+            if leader:
+                flight = _Flight()
+                _INFLIGHT[flight_key] = flight
+        if not leader:
+            with get_profiler().span("llm_coalesced_wait", cat="llm", signature=signature, scope="thread"):
+                flight.done.wait()
+            return _coalesced_result(flight.result)
+        try:
+            flight.result = self._request_llm_across_processes(
+                backend=backend,
+                sample_events=sample_events,
+                signature=signature,
+                contract_hints=contract_hints,
+            )
+            return flight.result
+        finally:
+            with _INFLIGHT_LOCK:
+                _INFLIGHT.pop(flight_key, None)
+            flight.done.set()
+
+    def _request_llm_across_processes(
+        self,
+        *,
+        backend: str,
+        sample_events: List[Dict[str, Any]],
+        signature: str,
+        contract_hints: Dict[str, str],
+    ) -> Optional[MappingResult]:
+        anchor = self.shared_cache_path or self.cache_path
+        if not anchor:
+            return self._call_llm(backend=backend, sample_events=sample_events, signature=signature, contract_hints=contract_hints)
+        flight_dir = os.path.join(os.path.dirname(anchor) or ".", "_inflight")
+        stem = os.path.join(flight_dir, f"{os.path.basename(anchor)}.{_slug(backend)}_{signature}")
+        os.makedirs(flight_dir, exist_ok=True)
+        waited_from = time.time_ns()
+        fd = os.open(f"{stem}.lock", os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            with get_profiler().span("llm_singleflight", cat="llm", signature=signature, scope="process"):
+                with exclusive_lock(fd):
+                    # otro proceso termino la llamada mientras se esperaba el lock
+                    shared = _read_flight_result(f"{stem}.json", since_ns=waited_from)
+                    if shared is not None:
+                        return _coalesced_result(shared)
+                    result = self._call_llm(
+                        backend=backend,
+                        sample_events=sample_events,
+                        signature=signature,
+                        contract_hints=contract_hints,
+                    )
+                    if result is not None:
+                        _write_flight_result(f"{stem}.json", result)
+                    return result
+        finally:
+            os.close(fd)
+
+    def _call_llm(
+        self,
+        *,
+        backend: str,
+        sample_events: List[Dict[str, Any]],
+        signature: str,
+        contract_hints: Dict[str, str],
+    ) -> Optional[MappingResult]:
+        infer = self._infer_with_gemini if self.provider == "gemini" else self._infer_with_ollama
+        result = infer(backend=backend, sample_events=sample_events, signature=signature, contract_hints=contract_hints)
+        # un parse error es un provider vivo; solo timeouts y transporte abren el breaker
+        failed = result is None or _is_provider_down_source(result.source)
+        self._breaker().record(failed=failed)
+        return result
+
+    def _breaker(self) -> _CircuitBreaker:
+        endpoint = self.model if self.provider == "gemini" else self.ollama_url
+        return _get_breaker(
+            f"{self.provider}|{endpoint}",
+            threshold=self.breaker_threshold,
+            cooldown_sec=self.breaker_cooldown_sec,
+        )
+
+    def llm_breaker_state(self) -> Dict[str, Any]:
+        """Estado del circuit breaker del provider (para la evidencia de schema_mapping)."""
+        if not self.enabled or self.provider not in {"gemini", "ollama"}:
+            return {"state": "disabled"}
+        return self._breaker().snapshot()
+
+    def _llm_model(self) -> str:
+        return self.model if self.provider == "gemini" else self.ollama_model
+
     def _cache_lookup(
         self,
         *,
@@ -337,19 +720,23 @@ class DynamicSchemaMapper:
         relaxed_cache_key: str,
         signature: str,
     ) -> Optional[MappingResult]:
+        # un error reciente (cache negativo) solo se devuelve si no hay ningun mapping bueno
+        negative: Optional[MappingResult] = None
         for key, lookup_type in (
             (cache_key, "exact"),
             (relaxed_cache_key, "relaxed"),
         ):
-            cached = self._cache.get(key)
+            cached = self._cache.get(key) if self._cache is not None else None
             result = self._mapping_result_from_cache(cached, signature=signature, lookup_type=lookup_type)
-            if result is not None:
+            if result is not None and not result.negative_cache:
                 return result
-            shared = self._shared_cache.get(key)
+            negative = negative or result
+            shared = self._shared_cache.get(key) if self._shared_cache is not None else None
             result = self._mapping_result_from_cache(shared, signature=signature, lookup_type=f"shared_{lookup_type}")
-            if result is not None:
+            if result is not None and not result.negative_cache:
                 return result
-        return None
+            negative = negative or result
+        return negative
 
     def _mapping_result_from_cache(
         self,
@@ -358,23 +745,102 @@ class DynamicSchemaMapper:
         signature: str,
         lookup_type: str,
     ) -> Optional[MappingResult]:
-        if (
-            not isinstance(cached, dict)
-            or not isinstance(cached.get("mapping"), dict)
-            or _should_retry_cached_source(str(cached.get("source") or ""))
-        ):
+        if not isinstance(cached, dict) or not isinstance(cached.get("mapping"), dict):
+            return None
+        negative = _should_retry_cached_source(str(cached.get("source") or ""))
+        if negative and time.time() >= float(cached.get("expires_at") or 0.0):
             return None
         cached_source = str(cached.get("source") or "cache")
         source = cached_source if lookup_type == "exact" else f"{cached_source}_cache_{lookup_type}"
         return MappingResult(
             mapping={str(k): str(v) for k, v in (cached.get("mapping") or {}).items()},
-            confidence=float(cached.get("confidence") or 1.0),
+            confidence=float(cached.get("confidence") or (0.0 if negative else 1.0)),
             source=source,
             signature=signature,
+            error=f"negative_cache: {cached_source}" if negative else None,
             cache_hit=True,
             llm_called=False,
+            negative_cache=negative,
         )
 
+    def _similar_lookup(
+        self,
+        *,
+        backend: str,
+        observed_keys: List[str],
+        sample_events: List[Dict[str, Any]],
+        base_mapping: Dict[str, str],
+        signature: str,
+    ) -> Optional[MappingResult]:
+        with get_profiler().span("similar_signature", cat="schema", signature=signature) as span:
+            with self._similar_lock:
+                self._sync_similar_index()
+                candidates = self._similar_index.nearest(
+                    observed_keys,
+                    backend=backend,
+                    min_jaccard=self.similar_min_jaccard,
+                )
+            span.args["candidates"] = len(candidates)
+            for jaccard, entry_id in candidates[:SIMILAR_MAX_CANDIDATES]:
+                cached = self._similar_entry(entry_id)
+                if cached is None:
+                    continue
+                mapping = {str(k): str(v) for k, v in cached["mapping"].items()}
+                validated = _validate_mapping_on_samples(mapping, sample_events)
+                dropped = [field for field in CRITICAL_FIELDS if field in mapping and field not in validated]
+                if dropped:
+                    continue
+                merged = dict(base_mapping)
+                merged.update(validated)
+                # claves que la firma cacheada no tenia (ej. usr_ref): se completan por perfil de valores
+                known = set(cached.get("keys") or [])
+                profiled = build_profile_mapping(sample_events, hints=merged)
+                for field, path in profiled.mapping.items():
+                    if field not in merged and path not in known:
+                        merged[field] = path
+                confidence = min(float(cached.get("confidence") or 0.0), _critical_coverage(merged))
+                cached_source = str(cached.get("source") or "cache")
+                if not _is_relaxed_reusable_source(cached_source, merged, confidence, self.min_confidence):
+                    continue
+                span.args["jaccard"] = round(jaccard, 3)
+                return MappingResult(
+                    mapping=merged,
+                    confidence=confidence,
+                    source=f"{cached_source}_cache_similar",
+                    signature=signature,
+                    cache_hit=True,
+                    llm_called=False,
+                )
+        return None
+
+    def _sync_similar_index(self) -> None:
+        # con _similar_lock tomado
+        for scope, store in (("run", self._cache), ("shared", self._shared_cache)):
+            if store is None or self._similar_synced.get(scope) == len(store):
+                continue
+            for key, payload in store.items():
+                if (
+                    isinstance(payload, dict)
+                    and isinstance(payload.get("keys"), list)
+                    and isinstance(payload.get("mapping"), dict)
+                    and _is_relaxed_reusable_source(
+                        str(payload.get("source") or ""),
+                        payload["mapping"],
+                        float(payload.get("confidence") or 0.0),
+                        self.min_confidence,
+                    )
+                ):
+                    self._similar_index.add(f"{scope}|{key}", [str(k) for k in payload["keys"]])
+            self._similar_synced[scope] = len(store)
+
+    def _similar_entry(self, entry_id: str) -> Optional[Dict[str, Any]]:
+        scope, _, key = entry_id.partition("|")
+        store = self._cache if scope == "run" else self._shared_cache
+        cached = store.get(key) if store is not None else None
+        if not isinstance(cached, dict) or not isinstance(cached.get("mapping"), dict):
+            return None
+        return cached
+
     def _cache_store_variants(
         self,
         *,
@@ -383,11 +849,12 @@ class DynamicSchemaMapper:
         mapping: Dict[str, str],
         confidence: float,
         source: str,
+        keys: Optional[List[str]] = None,
     ) -> None:
         write_shared = _is_shared_reusable_source(source, mapping, confidence, self.min_confidence)
-        self._cache_set(cache_key, mapping, confidence, source, write_shared=write_shared)
+        self._cache_set(cache_key, mapping, confidence, source, write_shared=write_shared, keys=keys)
         if _is_relaxed_reusable_source(source, mapping, confidence, self.min_confidence):
-            self._cache_set(relaxed_cache_key, mapping, confidence, source, write_shared=write_shared)
+            self._cache_set(relaxed_cache_key, mapping, confidence, source, write_shared=write_shared, keys=keys)
 
     def _infer_with_gemini(
         self,
@@ -417,8 +884,9 @@ class DynamicSchemaMapper:
                 headers={"Content-Type": "application/json"},
                 method="POST",
             )
-            with request.urlopen(req, timeout=self.llm_timeout_sec) as resp:
-                body = resp.read().decode("utf-8")
+            with get_profiler().span("llm_request", cat="llm", provider="gemini", signature=signature):
+                with request.urlopen(req, timeout=self.llm_timeout_sec) as resp:
+                    body = resp.read().decode("utf-8")
         except TimeoutError as exc:
             return MappingResult(
                 mapping={},
@@ -525,8 +993,9 @@ class DynamicSchemaMapper:
                 headers={"Content-Type": "application/json"},
                 method="POST",
             )
-            with request.urlopen(req, timeout=self.llm_timeout_sec) as resp:
-                body = resp.read().decode("utf-8")
+            with get_profiler().span("llm_request", cat="llm", provider="ollama", signature=signature):
+                with request.urlopen(req, timeout=self.llm_timeout_sec) as resp:
+                    body = resp.read().decode("utf-8")
         except TimeoutError as exc:
             return MappingResult(
                 mapping={},
@@ -610,48 +1079,6 @@ class DynamicSchemaMapper:
         raw = "|".join(keys + ["#"] + hint_bits)
         return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
 
-    def _load_cache(self) -> Dict[str, Any]:
-        if not self.cache_path:
-            return {}
-        if not os.path.exists(self.cache_path):
-            return {}
-        try:
-            with open(self.cache_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                return data if isinstance(data, dict) else {}
-        except (OSError, ValueError):
-            return {}
-
-    def _load_shared_cache(self) -> Dict[str, Any]:
-        if not self.shared_cache_path:
-            return {}
-        if not os.path.exists(self.shared_cache_path):
-            return {}
-        try:
-            with open(self.shared_cache_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                return data if isinstance(data, dict) else {}
-        except (OSError, ValueError):
-            return {}
-
-    def _save_cache(self) -> None:
-        if not self.cache_path:
-            return
-        cache_dir = os.path.dirname(self.cache_path)
-        if cache_dir:
-            os.makedirs(cache_dir, exist_ok=True)
-        with open(self.cache_path, "w", encoding="utf-8") as f:
-            json.dump(self._cache, f, ensure_ascii=False, indent=2)
-
-    def _save_shared_cache(self) -> None:
-        if not self.shared_cache_path:
-            return
-        cache_dir = os.path.dirname(self.shared_cache_path)
-        if cache_dir:
-            os.makedirs(cache_dir, exist_ok=True)
-        with open(self.shared_cache_path, "w", encoding="utf-8") as f:
-            json.dump(self._shared_cache, f, ensure_ascii=False, indent=2)
-
 
 def build_fallback_mapping(sample_events: List[Dict[str, Any]]) -> Dict[str, str]:
     keys = _collect_keys(sample_events[:8])
@@ -664,6 +1091,92 @@ def build_fallback_mapping(sample_events: List[Dict[str, Any]]) -> Dict[str, str
     return mapping
 
 
+def build_profile_mapping(
+    sample_events: List[Dict[str, Any]],
+    *,
+    hints: Optional[Dict[str, str]] = None,
+) -> ProfileMapping:
+    """
+    Mapping deterministico por la forma de los valores observados (_collect_field_profiles):
+    epoch ms / ISO -> timestamp, IPv4 -> src/dst_ip, P1..P4 / low..critical -> severity,
+    bool / ok / FAIL -> outcome, listas o "a,b" -> tags, etc. El nombre del campo solo
+    desempata (src vs dst, sev_level vs case_num). Los hints (canonico -> "a|b|c") con algun
+    alias presente en los eventos quedan resueltos y sus campos no se reasignan.
+
+    confidence = cobertura de CRITICAL_FIELDS * peor score entre los criticos asignados; un
+    campo con otro candidato a menos de PROFILE_AMBIGUITY_MARGIN cuenta la mitad.
+    """
+    profiles: Dict[str, Dict[str, Any]] = {}
+    for event in sample_events[:8]:
+        _collect_field_profiles(event, prefix="", depth=0, out=profiles)
+
+    mapping: Dict[str, str] = {}
+    scores: Dict[str, float] = {}
+    claimed: set[str] = set()
+    for canonical, spec in (hints or {}).items():
+        aliases = [part.strip() for part in str(spec).split("|") if part.strip()]
+        observed = [alias for alias in aliases if alias in profiles]
+        if canonical in CANONICAL_FIELDS and observed:
+            mapping[canonical] = str(spec)
+            scores[canonical] = 1.0
+            claimed.update(observed)
+
+    candidates: List[tuple[float, str, str]] = []
+    for canonical in CANONICAL_FIELDS:
+        if canonical in mapping:
+            continue
+        for path, profile in profiles.items():
+            if path in claimed or not profile["values"]:
+                continue
+            score = _profile_score(canonical, path, profile["values"])
+            if score >= PROFILE_MIN_SCORE:
+                candidates.append((score, canonical, path))
+
+    candidates.sort(key=lambda item: (-item[0], CANONICAL_FIELDS.index(item[1]), item[2]))
+    for score, canonical, path in candidates:
+        if canonical in mapping or path in claimed:
+            continue
+        mapping[canonical] = path
+        scores[canonical] = score
+        claimed.add(path)
+
+    # ambiguedad: otro campo observado, libre, casi tan compatible como el elegido
+    runner_up: Dict[str, float] = {}
+    for score, canonical, path in candidates:
+        if path not in claimed and canonical not in runner_up:
+            runner_up[canonical] = score
+    for canonical, score in runner_up.items():
+        if canonical in scores and scores[canonical] - score < PROFILE_AMBIGUITY_MARGIN:
+            scores[canonical] *= 0.5
+
+    critical = [scores[field] for field in CRITICAL_FIELDS if field in scores]
+    confidence = _critical_coverage(mapping) * min(critical) if critical else 0.0
+    return ProfileMapping(
+        mapping=mapping,
+        confidence=round(confidence, 4),
+        scores={field: round(score, 4) for field, score in scores.items()},
+    )
+
+
+def _validate_mapping_on_samples(mapping: Dict[str, str], sample_events: List[Dict[str, Any]]) -> Dict[str, str]:
+    """Campos del mapping con algun alias presente en la muestra y valores de la forma esperada."""
+    profiles: Dict[str, Dict[str, Any]] = {}
+    for event in sample_events[:8]:
+        _collect_field_profiles(event, prefix="", depth=0, out=profiles)
+    valid: Dict[str, str] = {}
+    for canonical, spec in mapping.items():
+        observed = [part.strip() for part in str(spec).split("|") if part.strip() in profiles]
+        if canonical not in CANONICAL_FIELDS or not observed:
+            continue
+        values = [v for alias in observed for v in profiles[alias]["values"] if v is not None]
+        if values:
+            score = sum(_value_shape_score(canonical, v) for v in values) / float(len(values))
+            if score < SIMILAR_MIN_VALUE_SCORE:
+                continue
+        valid[canonical] = spec
+    return valid
+
+
 def _sanitize_mapping(mapping: Dict[str, Any], sample_events: List[Dict[str, Any]]) -> Dict[str, str]:
     keys = _collect_keys(sample_events[:8])
     cleaned: Dict[str, str] = {}
@@ -718,6 +1231,34 @@ def _is_useful_partial_mapping(mapping: Dict[str, str]) -> bool:
     return _critical_coverage(mapping) >= USEFUL_PARTIAL_MIN_COVERAGE
 
 
+def _coalesced_result(result: Optional[MappingResult]) -> Optional[MappingResult]:
+    if result is None:
+        return None
+    return replace(result, mapping=dict(result.mapping), llm_called=False, coalesced=True)
+
+
+def _read_flight_result(path: str, *, since_ns: int) -> Optional[MappingResult]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if int(data.pop("written_ns", 0)) < since_ns:
+            return None  # de una llamada anterior, no de la que se estaba esperando
+        return MappingResult(**data)
+    except (OSError, ValueError, TypeError):
+        return None
+
+
+def _write_flight_result(path: str, result: MappingResult) -> None:
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({**asdict(result), "written_ns": time.time_ns()}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def _slug(value: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", value).strip("._-") or "default"
+
+
 def _should_retry_cached_source(source: str) -> bool:
     return source.startswith("fallback_llm_error")
 
@@ -730,7 +1271,7 @@ def _is_relaxed_reusable_source(
 ) -> bool:
     if source == "fallback_full_alias":
         return True
-    if source in {"gemini", "ollama"}:
+    if source in {"gemini", "ollama", "value_profile"}:
         return bool(mapping) and (confidence >= min_confidence or _is_useful_partial_mapping(mapping))
     return False
 
@@ -743,12 +1284,18 @@ def _is_shared_reusable_source(
 ) -> bool:
     if source == "fallback_full_alias":
         return True
-    if source in {"gemini", "ollama"}:
+    if source in {"gemini", "ollama", "value_profile"}:
         return bool(mapping) and (confidence >= min_confidence or _is_useful_partial_mapping(mapping))
     return False
 
 
+def _is_provider_down_source(source: str) -> bool:
+    return any(source.startswith(f"{provider}_error_{kind}") for provider in ("ollama", "gemini") for kind in ("timeout", "transport"))
+
+
 def _fallback_error_source(source: str) -> str:
+    if source.startswith("llm_circuit_open"):
+        return "fallback_llm_circuit_open"
     if source.startswith("ollama_error_timeout") or source.startswith("gemini_error_timeout"):
         return "fallback_llm_error_timeout"
     if source.startswith("ollama_error_transport") or source.startswith("gemini_error_transport"):
@@ -870,13 +1417,15 @@ def _collect_field_profiles(
     for key, sub in value.items():
         key_s = str(key)
         path = f"{prefix}.{key_s}" if prefix else key_s
-        profile = out.setdefault(path, {"types": set(), "examples": []})
+        profile = out.setdefault(path, {"types": set(), "examples": [], "values": []})
         profile["types"].add(_value_type_name(sub))
         example = _format_value_example(sub)
         if example and example not in profile["examples"] and len(profile["examples"]) < 2:
             profile["examples"].append(example)
         if isinstance(sub, dict):
             _collect_field_profiles(sub, prefix=path, depth=depth + 1, out=out)
+        else:
+            profile["values"].append(sub)
 
 
 def _value_type_name(value: Any) -> str:
@@ -908,3 +1457,141 @@ def _format_value_example(value: Any) -> str:
     if len(text) > 48:
         text = text[:45] + "..."
     return text
+
+
+_ISO_TS_RE = re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}")
+_IPV4_RE = re.compile(r"^(25[0-5]|2[0-4]\d|1?\d?\d)(\.(25[0-5]|2[0-4]\d|1?\d?\d)){3}$")
+_HOSTNAME_RE = re.compile(r"^[a-z][a-z0-9-]*-\d+$|^[a-z0-9-]+(\.[a-z0-9-]+)+$", re.IGNORECASE)
+_PRIORITY_RE = re.compile(r"^p[0-4]$", re.IGNORECASE)
+_IDENT_RE = re.compile(r"^[A-Za-z_][\w.@\\$-]*$")
+
+_EVENT_TYPE_VALUES = {"auth", "authentication", "network", "netflow", "process", "proc_event", "dns", "file", "registry"}
+_OUTCOME_VALUES = {
+    "success", "succeeded", "fail", "failed", "failure", "ok", "error",
+    "true", "false", "allowed", "allow", "denied", "deny", "blocked",
+}
+_SEVERITY_VALUES = {"info", "informational", "low", "medium", "med", "high", "critical"}
+_ACTION_TOKENS = {
+    "login", "logout", "logon", "auth", "connect", "process", "proc", "start", "end", "spawn",
+    "exit", "dns", "query", "lookup", "attempt", "remote", "service", "net", "file", "exec",
+    "open", "read", "write", "delete", "create", "kill",
+}
+_PROCESS_SUFFIXES = (".exe", ".dll", ".bin", ".sh", ".py", ".ps1")
+_KNOWN_PROCESS_NAMES = {
+    "python", "python3", "sshd", "bash", "sh", "powershell", "cmd", "chrome", "svchost",
+    "explorer", "java", "node", "nginx", "curl", "wget",
+}
+
+
+def _profile_score(canonical: str, path: str, values: List[Any]) -> float:
+    name = _profile_name_score(canonical, path)
+    if canonical in PROFILE_NAME_REQUIRED and not name:
+        return 0.0
+    present = [v for v in values if v is not None]
+    if present:
+        value = sum(_value_shape_score(canonical, v) for v in present) / float(len(present))
+        if value <= 0.0:
+            return 0.0
+    else:
+        value = 0.5  # siempre null en la muestra: solo el nombre puede decidir
+    return PROFILE_VALUE_WEIGHT * value + (1.0 - PROFILE_VALUE_WEIGHT) * name
+
+
+def _profile_name_score(canonical: str, path: str) -> float:
+    lowered = path.lower()
+    tokens = set(re.split(r"[._\-\s]+", lowered))
+    for hint in PROFILE_NAME_HINTS.get(canonical, []):
+        if hint in tokens or (len(hint) >= 4 and hint in lowered):
+            return 1.0
+    return 0.0
+
+
+def _value_shape_score(canonical: str, value: Any) -> float:
+    if canonical == "timestamp":
+        return 1.0 if _looks_like_timestamp(value) else 0.0
+    if canonical in {"episode_id", "seed"}:
+        if isinstance(value, bool):
+            return 0.0
+        return 1.0 if isinstance(value, int) or (isinstance(value, str) and value.isdigit()) else 0.0
+    if canonical in {"src_ip", "dst_ip"}:
+        return 1.0 if isinstance(value, str) and _IPV4_RE.match(value.strip()) else 0.0
+    if canonical == "host":
+        return 1.0 if _looks_like_hostname(value) else 0.0
+    if canonical == "event_type":
+        return 1.0 if isinstance(value, str) and value.strip().lower() in _EVENT_TYPE_VALUES else 0.0
+    if canonical == "action":
+        return 1.0 if _looks_like_action(value) else 0.0
+    if canonical == "outcome":
+        if isinstance(value, bool):
+            return 1.0
+        if isinstance(value, int):
+            return 0.5 if value in (0, 1) else 0.0
+        return 1.0 if isinstance(value, str) and value.strip().lower() in _OUTCOME_VALUES else 0.0
+    if canonical == "severity":
+        if isinstance(value, bool):
+            return 0.0
+        if isinstance(value, int):
+            return 1.0 if 0 <= value <= 5 else 0.0
+        if not isinstance(value, str):
+            return 0.0
+        s = value.strip().lower()
+        if s in _SEVERITY_VALUES or _PRIORITY_RE.match(s):
+            return 1.0
+        return 0.5 if s.isdigit() and int(s) <= 5 else 0.0
+    if canonical == "tags":
+        if isinstance(value, list):
+            return 1.0 if all(isinstance(v, str) for v in value) else 0.0
+        if not isinstance(value, str):
+            return 0.0
+        if ("," in value or "|" in value) and all(_IDENT_RE.match(p.strip()) for p in re.split(r"[,|]", value) if p.strip()):
+            return 1.0
+        return 0.5 if _IDENT_RE.match(value.strip()) else 0.0
+    if canonical == "user":
+        if not isinstance(value, str) or not _IDENT_RE.match(value.strip()):
+            return 0.0
+        s = value.strip().lower()
+        if _looks_like_hostname(s) or s in _EVENT_TYPE_VALUES or s in _OUTCOME_VALUES or s in _SEVERITY_VALUES:
+            return 0.0
+        return 1.0
+    if canonical == "process_name":
+        if not isinstance(value, str) or not value.strip():
+            return 0.0
+        s = value.strip().lower()
+        if s.endswith(_PROCESS_SUFFIXES) or "/" in s or "\\" in s or s in _KNOWN_PROCESS_NAMES:
+            return 1.0
+        return 0.5 if _IDENT_RE.match(s) else 0.0
+    return 0.0
+
+
+def _looks_like_timestamp(value: Any) -> bool:
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, str):
+        s = value.strip()
+        if _ISO_TS_RE.match(s):
+            return True
+        if not s.isdigit():
+            return False
+        value = int(s)
+    if isinstance(value, (int, float)):
+        # epoch en segundos o milisegundos
+        return 1e9 <= value < 1e10 or 1e12 <= value < 1e13
+    return False
+
+
+def _looks_like_hostname(value: Any) -> bool:
+    if not isinstance(value, str):
+        return False
+    s = value.strip().lower()
+    if not _HOSTNAME_RE.match(s) or _IPV4_RE.match(s) or s.endswith(_PROCESS_SUFFIXES):
+        return False
+    return any(c.isalpha() for c in s)
+
+
+def _looks_like_action(value: Any) -> bool:
+    if not isinstance(value, str):
+        return False
+    s = value.strip().lower()
+    if s in _EVENT_TYPE_VALUES or s in _OUTCOME_VALUES:
+        return False
+    return bool(set(re.split(r"[_\-\s]+", s)) & _ACTION_TOKENS)
@@ -0,0 +1,183 @@
+"""
+Evidencia compacta para decisions.jsonl.
+
+Con compact evidence, los bloques que se repiten entre episodios (schema_mapping,
+asset_context, search_tool) se guardan una sola vez en evidence_blobs.jsonl del run y
+la decision solo lleva {"$ref": <hash>}. Los memory_hits quedan como case_id + case_hash + score
+y el caso completo se guarda una vez por hash de contenido en la misma tabla (un caso
+consolidado por compact() cambia de contenido con el mismo case_id).
+read_decisions() expande todo de forma transparente, asi los lectores no cambian.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+
+from src.core.jsonl_writer import get_jsonl_writer
+
+EVIDENCE_BLOBS_FILENAME = "evidence_blobs.jsonl"
+COMPACT_ENCODING = "compact_v1"
+# timing no se compacta: lleva timestamps por episodio y nunca se repite.
+COMPACT_EVIDENCE_KEYS = ("schema_mapping", "asset_context", "search_tool")
+
+
+def _blob_hash(value: Any) -> str:
+    raw = json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:20]
+
+
+def _read_jsonl(path: str) -> List[Dict[str, Any]]:
+    if not os.path.exists(path):
+        return []
+    out: List[Dict[str, Any]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                out.append(json.loads(line))
+    return out
+
+
+class EvidenceBlobTable:
+    """Tabla lateral por run (append-only). Recuerda que hashes de blobs y casos ya escribio."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._blobs: Set[str] = set()
+        self._cases: Set[str] = set()
+        # Fase2 de un swap o un worker reutilizan el run: no reescribir lo que ya esta.
+        for row in _read_jsonl(path):
+            if row.get("kind") == "memory_case":
+                if row.get("hash"):
+                    self._cases.add(str(row["hash"]))
+            elif row.get("hash"):
+                self._blobs.add(str(row["hash"]))
+
+    def put_blob(self, key: str, value: Any) -> str:
+        h = _blob_hash(value)
+        if h not in self._blobs:
+            get_jsonl_writer(self.path).append({"kind": "blob", "key": key, "hash": h, "value": value})
+            self._blobs.add(h)
+        return h
+
+    def put_case(self, case: Dict[str, Any]) -> Optional[str]:
+        raw_id = case.get("case_id")
+        if raw_id is None:
+            return None
+        h = _blob_hash(case)
+        if h not in self._cases:
+            get_jsonl_writer(self.path).append({"kind": "memory_case", "case_id": int(raw_id), "hash": h, "value": case})
+            self._cases.add(h)
+        return h
+
+
+_TABLES: Dict[str, EvidenceBlobTable] = {}
+
+
+def get_blob_table(path: str) -> EvidenceBlobTable:
+    key = os.path.abspath(path)
+    table = _TABLES.get(key)
+    if table is None:
+        table = EvidenceBlobTable(path)
+        _TABLES[key] = table
+    return table
+
+
+def release_blob_tables(run_dir: str) -> None:
+    prefix = os.path.normpath(os.path.abspath(run_dir))
+    for key in [k for k in _TABLES if k == prefix or k.startswith(prefix + os.sep)]:
+        del _TABLES[key]
+
+
+def compact_evidence(evidence: Dict[str, Any], *, blobs_path: str) -> Dict[str, Any]:
+    table = get_blob_table(blobs_path)
+    out = dict(evidence)
+    for key in COMPACT_EVIDENCE_KEYS:
+        value = out.get(key)
+        if isinstance(value, (dict, list)):
+            out[key] = {"$ref": table.put_blob(key, value)}
+    hits: List[Dict[str, Any]] = []
+    for hit in list(out.get("memory_hits") or []):
+        case = hit.get("case") if isinstance(hit, dict) else None
+        case_hash = table.put_case(case) if isinstance(case, dict) else None
+        if case_hash is None:
+            hits.append(hit)
+        else:
+            hits.append({"case_id": int(case["case_id"]), "case_hash": case_hash, "score": hit.get("score")})
+    if "memory_hits" in out:
+        out["memory_hits"] = hits
+    out["encoding"] = COMPACT_ENCODING
+    return out
+
+
+def load_blob_table(path: str) -> Tuple[Dict[str, Any], Dict[Union[int, str], Dict[str, Any]]]:
+    """cases por hash de contenido; filas viejas sin hash quedan por case_id."""
+    blobs: Dict[str, Any] = {}
+    cases: Dict[Union[int, str], Dict[str, Any]] = {}
+    for row in _read_jsonl(path):
+        if row.get("kind") == "memory_case":
+            key = str(row["hash"]) if row.get("hash") else int(row.get("case_id") or 0)
+            cases[key] = row.get("value") or {}
+        elif row.get("hash"):
+            blobs[str(row["hash"])] = row.get("value")
+    return blobs, cases
+
+
+def expand_evidence(
+    evidence: Dict[str, Any],
+    *,
+    blobs: Dict[str, Any],
+    cases: Dict[Union[int, str], Dict[str, Any]],
+) -> Dict[str, Any]:
+    if evidence.get("encoding") != COMPACT_ENCODING:
+        return evidence
+    out = dict(evidence)
+    out.pop("encoding", None)
+    for key in COMPACT_EVIDENCE_KEYS:
+        value = out.get(key)
+        if isinstance(value, dict) and "$ref" in value and value["$ref"] in blobs:
+            # Compartido entre decisiones del run: los lectores lo tratan como solo lectura.
+            out[key] = blobs[value["$ref"]]
+    hits: List[Dict[str, Any]] = []
+    for hit in list(out.get("memory_hits") or []):
+        if isinstance(hit, dict) and "case" not in hit and "case_id" in hit:
+            case = cases.get(str(hit["case_hash"])) if hit.get("case_hash") else cases.get(int(hit["case_id"]))
+            hits.append({"score": hit.get("score"), "case": case or {"case_id": hit["case_id"]}})
+        else:
+            hits.append(hit)
+    if "memory_hits" in out:
+        out["memory_hits"] = hits
+    return out
+
+
+_DECISIONS_CACHE: Dict[str, Tuple[Tuple[int, int, int, int], List[Dict[str, Any]]]] = {}
+
+
+def read_decisions(path: str) -> List[Dict[str, Any]]:
+    """
+    Lee decisions.jsonl expandiendo evidencia compacta (si la hay).
+    Cachea por (mtime, size) del archivo y de la tabla lateral: aggregate_results
+    relee el mismo run varias veces.
+    """
+    if not os.path.exists(path):
+        return []
+    blobs_path = os.path.join(os.path.dirname(path), EVIDENCE_BLOBS_FILENAME)
+    st = os.stat(path)
+    bst = os.stat(blobs_path) if os.path.exists(blobs_path) else None
+    stamp = (st.st_mtime_ns, st.st_size, bst.st_mtime_ns if bst else 0, bst.st_size if bst else 0)
+    key = os.path.abspath(path)
+    cached = _DECISIONS_CACHE.get(key)
+    if cached is not None and cached[0] == stamp:
+        return list(cached[1])
+
+    rows = _read_jsonl(path)
+    if any(((r.get("evidence") or {}).get("encoding") == COMPACT_ENCODING) for r in rows):
+        blobs, cases = load_blob_table(blobs_path)
+        for r in rows:
+            evidence = r.get("evidence")
+            if isinstance(evidence, dict):
+                r["evidence"] = expand_evidence(evidence, blobs=blobs, cases=cases)
+    _DECISIONS_CACHE[key] = (stamp, rows)
+    return list(rows)
@@ -0,0 +1,148 @@
+"""
+Indice de ground truth por dataset.
+
+generate_episodes escribe ground_truth/ground_truth_index.json con todos los episodios;
+los lectores (agente, judges, analizadores) lo cargan una vez por proceso. Para datasets
+viejos sin indice se escanean los episode_XXX.json una sola vez y se cachea igual. Los
+episode_XXX.json que el indice no tiene (p.ej. de una generacion anterior mas larga en el
+mismo --out) se agregan igual, asi todos los lectores ven los mismos episodios que en disco.
+
+Solo stdlib: generate_episodes lo importa como `core.ground_truth` (se corre como script
+desde src/), el resto como `src.core.ground_truth`.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+GROUND_TRUTH_INDEX_FILENAME = "ground_truth_index.json"
+GROUND_TRUTH_INDEX_VERSION = 1
+
+_EPISODE_FILE_RE = re.compile(r"^episode_(\d+)\.json$")
+
+# abs(gt_dir) -> (stamp, {episode_id: payload})
+_INDEX_CACHE: Dict[str, Tuple[Tuple[str, int, int], Dict[int, Dict[str, Any]]]] = {}
+
+
+def ground_truth_index_path(gt_dir: str) -> str:
+    return os.path.join(gt_dir, GROUND_TRUTH_INDEX_FILENAME)
+
+
+def write_ground_truth_index(gt_dir: str, episodes: Dict[int, Dict[str, Any]]) -> str:
+    path = ground_truth_index_path(gt_dir)
+    payload = {
+        "version": GROUND_TRUTH_INDEX_VERSION,
+        "episodes": {str(int(ep)): gt for ep, gt in sorted(episodes.items())},
+    }
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    _INDEX_CACHE.pop(os.path.abspath(gt_dir), None)
+    return path
+
+
+def _episode_files(gt_dir: str) -> Dict[int, str]:
+    out: Dict[int, str] = {}
+    for name in os.listdir(gt_dir):
+        m = _EPISODE_FILE_RE.match(name)
+        if not m:
+            continue
+        ep = int(m.group(1))
+        # episode_001.json tiene prioridad sobre episode_1.json (mismo orden que antes)
+        if ep in out and name != f"episode_{ep:03d}.json":
+            continue
+        out[ep] = name
+    return out
+
+
+def _scan_episode_files(gt_dir: str, skip: Optional[Dict[int, Any]] = None) -> Dict[int, Dict[str, Any]]:
+    out: Dict[int, Dict[str, Any]] = {}
+    for ep, name in _episode_files(gt_dir).items():
+        if skip is not None and ep in skip:
+            continue
+        with open(os.path.join(gt_dir, name), "r", encoding="utf-8") as f:
+            out[ep] = json.load(f)
+    return out
+
+
+def _stamp(gt_dir: str) -> Optional[Tuple[str, int, int]]:
+    if not os.path.isdir(gt_dir):
+        return None
+    # mtime del directorio: cambia al agregar o borrar episode_XXX.json
+    dir_mtime = os.stat(gt_dir).st_mtime_ns
+    index_path = ground_truth_index_path(gt_dir)
+    if os.path.exists(index_path):
+        return ("index", os.stat(index_path).st_mtime_ns, dir_mtime)
+    return ("scan", 0, dir_mtime)
+
+
+def load_ground_truth_index(gt_dir: str) -> Dict[int, Dict[str, Any]]:
+    """Devuelve {episode_id: gt}. Los payloads son compartidos: tratarlos como solo lectura."""
+    stamp = _stamp(gt_dir)
+    if stamp is None:
+        return {}
+    key = os.path.abspath(gt_dir)
+    cached = _INDEX_CACHE.get(key)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    episodes: Dict[int, Dict[str, Any]] = {}
+    if stamp[0] == "index":
+        try:
+            with open(ground_truth_index_path(gt_dir), "r", encoding="utf-8") as f:
+                raw = json.load(f)
+            if int(raw.get("version") or 0) == GROUND_TRUTH_INDEX_VERSION:
+                episodes = {int(ep): gt for ep, gt in (raw.get("episodes") or {}).items()}
+        except (OSError, ValueError):
+            episodes = {}
+    # archivos que el indice no cubre (o todos, sin indice): solo esos se parsean
+    episodes.update(_scan_episode_files(gt_dir, skip=episodes))
+    _INDEX_CACHE[key] = (stamp, episodes)
+    return episodes
+
+
+def load_ground_truth(gt_dir: str, episode_id: int) -> Optional[Dict[str, Any]]:
+    gt = load_ground_truth_index(gt_dir).get(int(episode_id))
+    if gt is not None:
+        return gt
+    # Fallback: indice incompleto o archivo agregado despues.
+    for path in (
+        os.path.join(gt_dir, f"episode_{episode_id:03d}.json"),
+        os.path.join(gt_dir, f"episode_{episode_id}.json"),
+    ):
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+    return None
+
+
+def is_attack(gt: Optional[Dict[str, Any]]) -> Optional[bool]:
+    """True/False segun el ground truth del episodio; None si no hay gt."""
+    if gt is None:
+        return None
+    if "attack_present" in gt:
+        return bool(gt["attack_present"])
+    # compat: si no existe el campo, asumimos que si hay scenario/techniques hay ataque
+    return (gt.get("scenario_name") not in (None, "", "benign")) and bool(gt.get("technique_ids"))
+
+
+def list_ground_truth_episode_ids(gt_dir: str) -> List[int]:
+    return sorted(load_ground_truth_index(gt_dir).keys())
+
+
+def main() -> None:
+    # Reconstruye el indice de un dataset viejo: python -m src.core.ground_truth --gt-dir ...
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--gt-dir", required=True)
+    args = ap.parse_args()
+    episodes = _scan_episode_files(args.gt_dir)
+    path = write_ground_truth_index(args.gt_dir, episodes)
+    print(f"Wrote {path} ({len(episodes)} episodes)")
+
+
+if __name__ == "__main__":
+    main()
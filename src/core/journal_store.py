@@ -0,0 +1,200 @@
+"""
+Diccionario JSON persistente y compartido entre procesos (cache de mappings de schema).
+
+- <path>          snapshot: el dict completo en JSON (mismo formato que los caches viejos).
+- <path>.journal  una linea JSON {"key", "value"} por set(), append-only.
+- <path>.lock     lock exclusivo (file_lock) para appends y compactacion; nunca se reemplaza.
+
+set() agrega una linea (O(1)) en lugar de reescribir el JSON. get() relee solo lo que otros
+procesos agregaron al journal cuando la clave no esta, asi runs en paralelo ven los mappings
+de los demas. Cada compact_every lineas el journal se vuelca al snapshot (tmp + os.replace) y
+se reemplaza por uno vacio; cada journal empieza con una linea de header aleatoria y los
+lectores detectan el cambio de header y recargan todo. Un corte entre ambos pasos solo deja
+lineas repetidas, que al re-aplicarse no cambian nada.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from src.core.file_lock import exclusive_lock
+from src.core.profiler import get_profiler
+
+DEFAULT_COMPACT_EVERY = 256
+
+
+def _journal_header_line() -> bytes:
+    return (json.dumps({"journal": os.urandom(8).hex()}) + "\n").encode("utf-8")
+
+
+class JournalStore:
+    def __init__(self, path: str, *, compact_every: int = DEFAULT_COMPACT_EVERY) -> None:
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.lock_path = f"{path}.lock"
+        self.compact_every = max(1, int(compact_every))
+        self._data: Dict[str, Any] = {}
+        # header del journal leido, bytes leidos y lineas que tiene
+        self._journal_id: Optional[bytes] = None
+        self._read_bytes = 0
+        self._journal_lines = 0
+        self._reload()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._data
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        return iter(list(self._data.items()))
+
+    def _read_snapshot(self) -> Dict[str, Any]:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError):
+            return {}
+
+    def _journal_header(self) -> Optional[bytes]:
+        try:
+            with open(self.journal_path, "rb") as f:
+                return f.readline(256) or None
+        except OSError:
+            return None
+
+    def _reload(self) -> None:
+        # Sin lock: si el header del journal cambia mientras se lee el snapshot hubo una
+        # compactacion en el medio y se vuelve a leer.
+        while True:
+            before = self._journal_header()
+            self._data = self._read_snapshot()
+            self._journal_id = before
+            self._read_bytes = 0
+            self._journal_lines = 0
+            if self._refresh(reload=False):
+                return
+
+    def _refresh(self, *, reload: bool = True) -> bool:
+        # Lee solo las lineas completas agregadas desde la ultima lectura. False si el
+        # journal fue rotado (con reload=True se recarga todo).
+        try:
+            f = open(self.journal_path, "rb")
+        except OSError:
+            if self._journal_id is None:
+                return True
+            if reload:
+                self._reload()
+            return False
+        with f:
+            header = f.readline(256) or None
+            size = os.fstat(f.fileno()).st_size
+            if (self._journal_id is not None and header != self._journal_id) or size < self._read_bytes:
+                if reload:
+                    self._reload()
+                return False
+            self._journal_id = header
+            if size <= self._read_bytes:
+                return True
+            f.seek(self._read_bytes)
+            raw = f.read(size - self._read_bytes)
+        end = raw.rfind(b"\n") + 1
+        for line in raw[:end].splitlines():
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # linea cortada por un crash
+            if isinstance(row, dict) and "key" in row:
+                self._data[str(row["key"])] = row.get("value")
+                self._journal_lines += 1
+        self._read_bytes += end
+        return True
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key not in self._data:
+            self._refresh()
+        return self._data.get(key, default)
+
+    def set(self, key: str, value: Any) -> None:
+        if key in self._data and self._data[key] == value:
+            return
+        self._data[key] = value
+        line = (json.dumps({"key": key, "value": value}, ensure_ascii=False) + "\n").encode("utf-8")
+        parent = os.path.dirname(self.path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        with get_profiler().span("journal_append", cat="io", file=os.path.basename(self.path)):
+            lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+            try:
+                with exclusive_lock(lock_fd):
+                    fd = os.open(self.journal_path, os.O_RDWR | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+                    try:
+                        size = os.lseek(fd, 0, os.SEEK_END)
+                        if size == 0:
+                            header = _journal_header_line()
+                            line = header + line
+                        else:
+                            os.lseek(fd, size - 1, os.SEEK_SET)
+                            if os.read(fd, 1) != b"\n":
+                                # cola cortada por un crash: la linea nueva empieza limpia
+                                line = b"\n" + line
+                        view = memoryview(line)
+                        while view:
+                            written = os.write(fd, view)
+                            view = view[written:]
+                    finally:
+                        os.close(fd)
+            finally:
+                os.close(lock_fd)
+        if size == 0:
+            self._journal_id, self._read_bytes = header, 0
+        if size == self._read_bytes:
+            # nadie escribio desde la ultima lectura: la linea propia no se vuelve a leer
+            self._read_bytes += len(line)
+        self._journal_lines += 1
+        if self._journal_lines >= self.compact_every:
+            self.compact()
+
+    def compact(self) -> int:
+        """Vuelca snapshot + journal a un snapshot nuevo y deja el journal vacio. Devuelve claves."""
+        parent = os.path.dirname(self.path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        lock_fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            with exclusive_lock(lock_fd):
+                # bajo el lock nadie agrega: se relee todo para no perder lo de otros procesos
+                self._reload()
+                with get_profiler().span("journal_compact", cat="io", file=os.path.basename(self.path), entries=len(self._data)):
+                    tmp_path = f"{self.path}.tmp.{os.getpid()}"
+                    with open(tmp_path, "w", encoding="utf-8") as f:
+                        json.dump(self._data, f, ensure_ascii=False, indent=2)
+                    os.replace(tmp_path, self.path)
+                    header = _journal_header_line()
+                    tmp_journal = f"{self.journal_path}.tmp.{os.getpid()}"
+                    with open(tmp_journal, "wb") as f:
+                        f.write(header)
+                    os.replace(tmp_journal, self.journal_path)
+                self._journal_id = header
+                self._read_bytes = len(header)
+                self._journal_lines = 0
+        finally:
+            os.close(lock_fd)
+        return len(self._data)
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("paths", nargs="+", help="snapshots JSON (ej. schema_map_cache.json)")
+    args = ap.parse_args()
+    for path in args.paths:
+        print(f"{path}: {JournalStore(path).compact()} claves")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import atexit
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from src.core.file_lock import exclusive_lock
+from src.core.profiler import get_profiler
+
+FLUSH_POLICIES = ("record", "episode", "batch", "exit")
+
+
+class JsonlBatchWriter:
+    """
+    Buffer de registros JSONL para un archivo (decisions.jsonl, enforcement_actions.jsonl).
+    - policy="record": escribe cada registro al llegar (comportamiento historico).
+    - policy="episode": escribe al cerrar cada episodio (end_episode).
+    - policy="batch": escribe cada flush_every registros.
+    - policy="exit": escribe solo en flush explicito o al salir del proceso.
+    Cada flush es un unico write en modo append bajo lock exclusivo, asi dos procesos
+    sobre el mismo run nunca intercalan lineas parciales.
+    """
+
+    __slots__ = ("path", "policy", "flush_every", "fsync", "_pending")
+
+    def __init__(self, path: str, *, policy: str = "record", flush_every: int = 1, fsync: bool = False) -> None:
+        self.path = path
+        self.policy = policy
+        self.flush_every = max(1, int(flush_every))
+        self.fsync = bool(fsync)
+        self._pending: List[str] = []
+
+    def append(self, record: Dict[str, Any]) -> None:
+        self._pending.append(json.dumps(record, ensure_ascii=False) + "\n")
+        if self.policy == "record" or (self.policy == "batch" and len(self._pending) >= self.flush_every):
+            self.flush()
+
+    def end_episode(self) -> None:
+        if self.policy == "episode":
+            self.flush()
+
+    def flush(self) -> int:
+        if not self._pending:
+            return 0
+        lines = self._pending
+        self._pending = []
+        data = "".join(lines).encode("utf-8")
+        parent = os.path.dirname(self.path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        with get_profiler().span("flush_jsonl", cat="io", file=os.path.basename(self.path), records=len(lines)):
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+            try:
+                with exclusive_lock(fd):
+                    view = memoryview(data)
+                    while view:
+                        written = os.write(fd, view)
+                        view = view[written:]
+                    if self.fsync:
+                        os.fsync(fd)
+            finally:
+                os.close(fd)
+        return len(lines)
+
+
+_WRITERS: Dict[str, JsonlBatchWriter] = {}
+_POLICY: Dict[str, Any] = {"policy": "record", "flush_every": 1, "fsync": False}
+
+
+def configure_jsonl_writers(*, policy: str = "record", flush_every: int = 1, fsync: bool = False) -> None:
+    if policy not in FLUSH_POLICIES:
+        raise ValueError(f"policy invalida: {policy} (usa {', '.join(FLUSH_POLICIES)})")
+    flush_jsonl_writers()
+    _POLICY.update({"policy": policy, "flush_every": max(1, int(flush_every)), "fsync": bool(fsync)})
+    for writer in _WRITERS.values():
+        writer.policy = policy
+        writer.flush_every = _POLICY["flush_every"]
+        writer.fsync = _POLICY["fsync"]
+
+
+def get_jsonl_writer(path: str) -> JsonlBatchWriter:
+    key = os.path.abspath(path)
+    writer = _WRITERS.get(key)
+    if writer is None:
+        writer = JsonlBatchWriter(path, **_POLICY)
+        _WRITERS[key] = writer
+    return writer
+
+
+def end_episode_jsonl_writers() -> None:
+    for writer in list(_WRITERS.values()):
+        writer.end_episode()
+
+
+def flush_jsonl_writers(path: Optional[str] = None) -> int:
+    if path is not None:
+        writer = _WRITERS.get(os.path.abspath(path))
+        return writer.flush() if writer is not None else 0
+    return sum(writer.flush() for writer in list(_WRITERS.values()))
+
+
+atexit.register(flush_jsonl_writers)
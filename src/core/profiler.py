@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+
+class Span:
+    """Intervalo medido con reloj monotonico (ns). depth=0 es raiz."""
+
+    __slots__ = ("name", "cat", "start_ns", "end_ns", "depth", "tid", "args")
+
+    def __init__(self, name: str, cat: str, start_ns: int, depth: int, tid: int, args: Dict[str, Any]) -> None:
+        self.name = name
+        self.cat = cat
+        self.start_ns = start_ns
+        self.end_ns: Optional[int] = None
+        self.depth = depth
+        self.tid = tid
+        self.args = args
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_ns is None:
+            return None
+        return round((self.end_ns - self.start_ns) / 1e6, 3)
+
+
+class _SpanScope:
+    __slots__ = ("_profiler", "_name", "_cat", "_args", "span")
+
+    def __init__(self, profiler: "Profiler", name: str, cat: str, args: Dict[str, Any]) -> None:
+        self._profiler = profiler
+        self._name = name
+        self._cat = cat
+        self._args = args
+        self.span: Optional[Span] = None
+
+    def __enter__(self) -> Span:
+        self.span = self._profiler.begin(self._name, cat=self._cat, **self._args)
+        return self.span
+
+    def __exit__(self, exc_type: Any, exc: Any, tb: Any) -> bool:
+        span = self.span
+        if span is not None:
+            if exc_type is not None:
+                span.args["error"] = exc_type.__name__
+            self._profiler.end(span)
+        return False
+
+
+class Profiler:
+    """
+    Profiler de spans anidados para el pipeline del agente.
+    - begin/end o `with profiler.span(...)` registran intervalos con perf_counter_ns.
+    - Los timestamps se anclan a epoch una sola vez, asi procesos distintos del mismo
+      run (fase1/fase2 de un swap) quedan alineados en la misma linea de tiempo.
+    - flush() agrega los spans terminados a un trace JSON (Chrome trace-event,
+      formato array sin cerrar) y libera memoria.
+    """
+
+    __slots__ = ("pid", "trace_path", "process_label", "_finished", "_local", "_origin_ns", "_origin_epoch_us", "_meta_written")
+
+    def __init__(self, *, trace_path: Optional[str] = None, process_label: str = "blue_agent") -> None:
+        self.pid = os.getpid()
+        self.trace_path = trace_path
+        self.process_label = process_label
+        self._finished: List[Span] = []
+        self._local = threading.local()
+        self._origin_ns = time.perf_counter_ns()
+        self._origin_epoch_us = time.time_ns() // 1000
+        self._meta_written = False
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = []
+            self._local.stack = stack
+        return stack
+
+    def begin(self, name: str, *, cat: str = "stage", **args: Any) -> Span:
+        stack = self._stack()
+        span = Span(name, cat, time.perf_counter_ns(), len(stack), threading.get_ident(), args)
+        stack.append(span)
+        return span
+
+    def end(self, span: Span, **args: Any) -> Span:
+        span.end_ns = time.perf_counter_ns()
+        if args:
+            span.args.update(args)
+        stack = self._stack()
+        if span in stack:
+            # Cierra tambien hijos que quedaron abiertos (p.ej. por una excepcion).
+            while stack:
+                top = stack.pop()
+                if top is span:
+                    break
+                if top.end_ns is None:
+                    top.end_ns = span.end_ns
+                    top.args["unclosed"] = True
+                    self._finished.append(top)
+        self._finished.append(span)
+        return span
+
+    def close(self, name: str, **args: Any) -> Optional[Span]:
+        for span in reversed(self._stack()):
+            if span.name == name:
+                return self.end(span, **args)
+        return None
+
+    def span(self, name: str, *, cat: str = "stage", **args: Any) -> _SpanScope:
+        return _SpanScope(self, name, cat, args)
+
+    def wall_iso(self, ns: int) -> str:
+        epoch_us = self._origin_epoch_us + (ns - self._origin_ns) // 1000
+        dt = datetime.fromtimestamp(epoch_us / 1e6, tz=timezone.utc)
+        return dt.isoformat().replace("+00:00", "Z")
+
+    def to_trace_events(self, spans: Optional[List[Span]] = None) -> List[Dict[str, Any]]:
+        events: List[Dict[str, Any]] = []
+        for span in (self._finished if spans is None else spans):
+            if span.end_ns is None:
+                continue
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.cat,
+                    "ph": "X",
+                    "ts": self._origin_epoch_us + (span.start_ns - self._origin_ns) / 1000.0,
+                    "dur": (span.end_ns - span.start_ns) / 1000.0,
+                    "pid": self.pid,
+                    "tid": span.tid,
+                    "args": span.args,
+                }
+            )
+        return events
+
+    def flush(self) -> int:
+        spans = self._finished
+        self._finished = []
+        if not self.trace_path or not spans:
+            return 0
+        events = self.to_trace_events(spans)
+        if not self._meta_written:
+            events.insert(
+                0,
+                {
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": self.pid,
+                    "args": {"name": f"{self.process_label} pid={self.pid}"},
+                },
+            )
+            self._meta_written = True
+        trace_dir = os.path.dirname(self.trace_path)
+        if trace_dir:
+            os.makedirs(trace_dir, exist_ok=True)
+        new_file = not os.path.exists(self.trace_path) or os.path.getsize(self.trace_path) == 0
+        with open(self.trace_path, "a", encoding="utf-8") as f:
+            if new_file:
+                f.write("[\n")
+            for ev in events:
+                f.write(json.dumps(ev, ensure_ascii=False, default=str) + ",\n")
+        return len(events)
+
+
+def load_trace_events(path: str) -> List[Dict[str, Any]]:
+    """Lee un trace escrito por Profiler.flush (array JSON sin cerrar)."""
+    if not os.path.exists(path):
+        return []
+    with open(path, "r", encoding="utf-8") as f:
+        raw = f.read().strip()
+    if not raw:
+        return []
+    raw = raw.rstrip(",")
+    if not raw.endswith("]"):
+        raw += "]"
+    data = json.loads(raw)
+    return data if isinstance(data, list) else list(data.get("traceEvents") or [])
+
+
+_PROFILER: Optional[Profiler] = None
+
+
+def get_profiler() -> Profiler:
+    global _PROFILER
+    if _PROFILER is None:
+        _PROFILER = Profiler()
+    return _PROFILER
+
+
+def configure_profiler(*, trace_path: Optional[str], process_label: str = "blue_agent") -> Profiler:
+    prof = get_profiler()
+    if prof.trace_path != trace_path:
+        prof.flush()
+        prof.trace_path = trace_path
+        prof._meta_written = False
+    prof.process_label = process_label
+    return prof
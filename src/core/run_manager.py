@@ -69,6 +69,8 @@ def run_paths(run_id: str) -> Dict[str, str]:
         "decisions": os.path.join(base, "decisions.jsonl"),
         "actions": os.path.join(base, "enforcement_actions.jsonl"),
         "meta": os.path.join(base, "run_meta.json"),
+        "trace": os.path.join(base, "trace.json"),
+        "evidence_blobs": os.path.join(base, "evidence_blobs.jsonl"),
     }
 
 
@@ -7,24 +7,14 @@ import os
 from statistics import mean, stdev
 from typing import Any, Dict, Iterable, List, Optional
 
+from src.core.evidence_store import read_decisions
+
 
 def _read_csv(path: str) -> List[Dict[str, str]]:
     with open(path, "r", encoding="utf-8", newline="") as f:
         return list(csv.DictReader(f))
 
 
-def _read_jsonl(path: str) -> List[Dict[str, Any]]:
-    out: List[Dict[str, Any]] = []
-    if not os.path.exists(path):
-        return out
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                out.append(json.loads(line))
-    return out
-
-
 def _to_float(value: str) -> Optional[float]:
     if value in ("", None):
         return None
@@ -134,6 +124,9 @@ def _schema_mapping_meta(decision_item: Dict[str, Any]) -> Dict[str, Any]:
         "source": str(schema_mapping.get("source") or "none"),
         "cache_hit": bool(schema_mapping.get("cache_hit", False)),
         "llm_called": bool(schema_mapping.get("llm_called", False)),
+        "coalesced": bool(schema_mapping.get("coalesced", False)),
+        "negative_cache": bool(schema_mapping.get("negative_cache", False)),
+        "error": str(schema_mapping.get("error") or ""),
     }
 
 
@@ -161,7 +154,7 @@ def _phase_mean(values: List[float]) -> Optional[float]:
 def _summarize_swap_phase_per_run(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
     for rec in records:
-        decisions = _read_jsonl(os.path.join(rec["blue_dir"], "decisions.jsonl"))
+        decisions = read_decisions(os.path.join(rec["blue_dir"], "decisions.jsonl"))
         cont_rows = _read_csv(rec["blue_confusion_containment"])
         det_rows = _read_csv(rec["blue_confusion_detection"])
         phase_rows = _read_csv(rec["blue_phase2"])
@@ -319,7 +312,7 @@ def _counts_and_metrics(rows: List[Dict[str, str]]) -> Dict[str, Any]:
 def _summarize_schema_fallback_per_run(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
     for rec in records:
-        decisions = _read_jsonl(os.path.join(rec["blue_dir"], "decisions.jsonl"))
+        decisions = read_decisions(os.path.join(rec["blue_dir"], "decisions.jsonl"))
         cont_rows = _read_csv(rec["blue_confusion_containment"])
 
         source_by_episode: Dict[int, str] = {}
@@ -404,7 +397,7 @@ def _summarize_schema_fallback_summary(per_run_rows: List[Dict[str, Any]]) -> Di
 def _summarize_memory_coverage_per_run(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
     for rec in records:
-        decisions = _read_jsonl(os.path.join(rec["blue_dir"], "decisions.jsonl"))
+        decisions = read_decisions(os.path.join(rec["blue_dir"], "decisions.jsonl"))
         cont_rows = _read_csv(rec["blue_confusion_containment"])
         conf_by_ep: Dict[int, str] = {}
         for row in cont_rows:
@@ -523,12 +516,17 @@ def _summarize_memory_coverage_summary(per_run_rows: List[Dict[str, Any]]) -> Di
 def _summarize_schema_mapper_usage_per_run(records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     out: List[Dict[str, Any]] = []
     for rec in records:
-        decisions = _read_jsonl(os.path.join(rec["blue_dir"], "decisions.jsonl"))
+        decisions = read_decisions(os.path.join(rec["blue_dir"], "decisions.jsonl"))
         total = len(decisions)
         llm_called = 0
         cache_hits = 0
+        coalesced = 0
         gemini_source = 0
         ollama_source = 0
+        profile_source = 0
+        similar_source = 0
+        negative_cache = 0
+        circuit_open = 0
         fallback_source = 0
         none_source = 0
         for item in decisions:
@@ -538,10 +536,20 @@ def _summarize_schema_mapper_usage_per_run(records: List[Dict[str, Any]]) -> Lis
                 llm_called += 1
             if meta["cache_hit"]:
                 cache_hits += 1
+            if meta["coalesced"]:
+                coalesced += 1
+            if source.endswith("_cache_similar"):
+                similar_source += 1
+            if meta["negative_cache"]:
+                negative_cache += 1
+            if meta["error"].startswith("circuit_open"):
+                circuit_open += 1
             if source == "gemini":
                 gemini_source += 1
             elif source == "ollama":
                 ollama_source += 1
+            elif source.startswith("value_profile"):
+                profile_source += 1
             elif source.startswith("fallback"):
                 fallback_source += 1
             elif source == "none":
@@ -555,10 +563,20 @@ def _summarize_schema_mapper_usage_per_run(records: List[Dict[str, Any]]) -> Lis
                 "llm_call_rate": _fmt(_safe_div(float(llm_called), float(total))),
                 "cache_hit_episodes": cache_hits,
                 "cache_hit_rate": _fmt(_safe_div(float(cache_hits), float(total))),
+                "coalesced_episodes": coalesced,
+                "coalesced_rate": _fmt(_safe_div(float(coalesced), float(total))),
                 "gemini_source_episodes": gemini_source,
                 "gemini_source_rate": _fmt(_safe_div(float(gemini_source), float(total))),
                 "ollama_source_episodes": ollama_source,
                 "ollama_source_rate": _fmt(_safe_div(float(ollama_source), float(total))),
+                "profile_source_episodes": profile_source,
+                "profile_source_rate": _fmt(_safe_div(float(profile_source), float(total))),
+                "similar_reuse_episodes": similar_source,
+                "similar_reuse_rate": _fmt(_safe_div(float(similar_source), float(total))),
+                "negative_cache_episodes": negative_cache,
+                "negative_cache_rate": _fmt(_safe_div(float(negative_cache), float(total))),
+                "circuit_open_episodes": circuit_open,
+                "circuit_open_rate": _fmt(_safe_div(float(circuit_open), float(total))),
                 "fallback_source_episodes": fallback_source,
                 "fallback_source_rate": _fmt(_safe_div(float(fallback_source), float(total))),
                 "none_source_episodes": none_source,
@@ -583,10 +601,20 @@ def _summarize_schema_mapper_usage_summary(per_run_rows: List[Dict[str, Any]]) -
         "llm_call_rate_std": _fmt(_std(vals("llm_call_rate"))),
         "cache_hit_rate_mean": _fmt(_avg(vals("cache_hit_rate"))),
         "cache_hit_rate_std": _fmt(_std(vals("cache_hit_rate"))),
+        "coalesced_rate_mean": _fmt(_avg(vals("coalesced_rate"))),
+        "coalesced_rate_std": _fmt(_std(vals("coalesced_rate"))),
         "gemini_source_rate_mean": _fmt(_avg(vals("gemini_source_rate"))),
         "gemini_source_rate_std": _fmt(_std(vals("gemini_source_rate"))),
         "ollama_source_rate_mean": _fmt(_avg(vals("ollama_source_rate"))),
         "ollama_source_rate_std": _fmt(_std(vals("ollama_source_rate"))),
+        "profile_source_rate_mean": _fmt(_avg(vals("profile_source_rate"))),
+        "profile_source_rate_std": _fmt(_std(vals("profile_source_rate"))),
+        "similar_reuse_rate_mean": _fmt(_avg(vals("similar_reuse_rate"))),
+        "similar_reuse_rate_std": _fmt(_std(vals("similar_reuse_rate"))),
+        "negative_cache_rate_mean": _fmt(_avg(vals("negative_cache_rate"))),
+        "negative_cache_rate_std": _fmt(_std(vals("negative_cache_rate"))),
+        "circuit_open_rate_mean": _fmt(_avg(vals("circuit_open_rate"))),
+        "circuit_open_rate_std": _fmt(_std(vals("circuit_open_rate"))),
         "fallback_source_rate_mean": _fmt(_avg(vals("fallback_source_rate"))),
         "fallback_source_rate_std": _fmt(_std(vals("fallback_source_rate"))),
         "none_source_rate_mean": _fmt(_avg(vals("none_source_rate"))),
@@ -784,7 +812,7 @@ def _summarize_latency_breakdown(records: List[Dict[str, Any]], system_key: str)
 
     for rec in records:
         decisions_path = os.path.join(rec[f"{system_key}_dir"], "decisions.jsonl")
-        decisions = _read_jsonl(decisions_path)
+        decisions = read_decisions(decisions_path)
 
         pipeline_vals: List[float] = []
         per_stage_vals: Dict[str, List[float]] = {stage: [] for stage in stages}
@@ -837,7 +865,7 @@ def _summarize_memory_diagnosis(records: List[Dict[str, Any]]) -> Dict[str, Any]
 
     for rec in records:
         rows = _read_csv(rec["blue_confusion_containment"])
-        decisions = _read_jsonl(os.path.join(rec["blue_dir"], "decisions.jsonl"))
+        decisions = read_decisions(os.path.join(rec["blue_dir"], "decisions.jsonl"))
         decisions_by_ep = {int(item["episode_id"]): item for item in decisions}
 
         attack_rows = [row for row in rows if row.get("attack_present") == "True"]
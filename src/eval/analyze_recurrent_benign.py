@@ -6,6 +6,9 @@ import json
 import os
 from typing import Any, Dict, List, Optional, Tuple
 
+from src.core.evidence_store import read_decisions
+from src.core.ground_truth import load_ground_truth_index
+
 
 def _read_json(path: str) -> Optional[Dict[str, Any]]:
     if not os.path.exists(path):
@@ -14,18 +17,6 @@ def _read_json(path: str) -> Optional[Dict[str, Any]]:
         return json.load(f)
 
 
-def _read_jsonl(path: str) -> List[Dict[str, Any]]:
-    if not os.path.exists(path):
-        return []
-    rows: List[Dict[str, Any]] = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                rows.append(json.loads(line))
-    return rows
-
-
 def _latest_by_episode(records: List[Dict[str, Any]]) -> Dict[int, Dict[str, Any]]:
     latest: Dict[int, Dict[str, Any]] = {}
     for row in records:
@@ -67,13 +58,10 @@ def _fmt_float(value: Optional[float]) -> str:
 
 
 def _analyze_run(gt_dir: str, decisions_path: str) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
-    decisions = _latest_by_episode(_read_jsonl(decisions_path))
+    decisions = _latest_by_episode(read_decisions(decisions_path))
     per_episode_rows: List[Dict[str, Any]] = []
 
-    for name in sorted(os.listdir(gt_dir)):
-        if not name.startswith("episode_") or not name.endswith(".json"):
-            continue
-        gt = _read_json(os.path.join(gt_dir, name))
+    for _, gt in sorted(load_ground_truth_index(gt_dir).items()):
         if not gt:
             continue
         attack_present = bool(gt.get("attack_present"))
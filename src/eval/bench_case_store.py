@@ -0,0 +1,144 @@
+"""
+Benchmark de apertura de cases.jsonl (src/memory/case_store.py) contra la carga eager anterior:
+- eager: json.loads de todas las lineas a una lista de dicts (lo que hacia FaissMemory._load).
+- lazy_cold: CaseStore sin cases.idx.npz (parsea todo una vez y solo guarda offsets/metadata).
+- lazy_warm: CaseStore con cases.idx.npz al dia (no parsea ninguna linea).
+Cada modo corre en un proceso aparte: open_ms y rss_mb (delta de VmRSS tras abrir).
+Los modos lazy reportan ademas get_us (store[pos] al azar, sin LRU caliente) y
+filter_ms (positions por label y por tags).
+
+    python -m src.eval.bench_case_store --n 100000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.memory.faiss_store import DEFAULT_DEDUP_KEY
+
+MODES = ("eager", "lazy_cold", "lazy_warm")
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024.0
+    return 0.0
+
+
+def _write_cases(path: str, n: int, *, seed: int) -> None:
+    # Casos con el tamano tipico de build_case_text + reason/source del Blue Agent (~1 KB).
+    rng = np.random.default_rng(seed)
+    labels = ["TP", "FP", "UNCERTAIN"]
+    decisions = ["block_ip", "no_block", "escalate"]
+    tags = ["bruteforce", "scan", "exfil", "recurrent_benign", "backend_b", "mcp", "llm"]
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n):
+            ip = f"10.{rng.integers(0, 255)}.{rng.integers(0, 255)}.{rng.integers(0, 255)}"
+            text = " ".join(
+                [f"event_type={rng.choice(['auth', 'network', 'process', 'dns'])}", f"src_ip={ip}"]
+                + [f"k{j}=v{rng.integers(0, 10000)}" for j in range(40)]
+            )
+            case = {
+                "case_id": i + 1,
+                "created_at": "2026-01-01T00:00:00Z",
+                "text": text,
+                "label": labels[i % 3],
+                "decision": decisions[i % 3],
+                "reason": "reason " * 40,
+                "tags": [str(t) for t in rng.choice(tags, size=2, replace=False)],
+                "confidence": round(float(rng.uniform(0.5, 1.0)), 4),
+                "source": {"episode_id": i + 1, "pattern_key": f"p{i % 97}", "backend": "backend_a"},
+            }
+            f.write(json.dumps(case, ensure_ascii=False) + "\n")
+
+
+def _open_store(path: str) -> Any:
+    import hashlib
+
+    from src.memory.case_store import CaseStore, _case_field
+
+    def case_hash(case: Dict[str, Any]) -> bytes:
+        raw = json.dumps([_case_field(case, f) for f in DEFAULT_DEDUP_KEY], ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).digest()
+
+    return CaseStore(path, case_hash=case_hash, dedup_key=DEFAULT_DEDUP_KEY)
+
+
+def _child(mode: str, path: str, seed: int) -> Dict[str, Any]:
+    rss0 = _rss_mb()
+    t0 = time.perf_counter()
+    if mode == "eager":
+        with open(path, "r", encoding="utf-8") as f:
+            cases: Any = [json.loads(line) for line in f if line.strip()]
+    else:
+        cases = _open_store(path)
+    open_ms = (time.perf_counter() - t0) * 1000.0
+    out: Dict[str, Any] = {"mode": mode, "n": len(cases), "open_ms": round(open_ms, 1), "rss_mb": round(_rss_mb() - rss0, 1)}
+    if mode != "eager":
+        rng = np.random.default_rng(seed)
+        get_us: List[float] = []
+        for pos in rng.integers(0, len(cases), size=2000):
+            t0 = time.perf_counter()
+            cases[int(pos)]
+            get_us.append((time.perf_counter() - t0) * 1e6)
+        out["get_us_p50"] = round(statistics.median(get_us), 1)
+        for field, keys in (("label", ["TP"]), ("tags", ["scan", "exfil"])):
+            t0 = time.perf_counter()
+            hits = cases.positions(field, keys)
+            out[f"filter_ms_{field}"] = round((time.perf_counter() - t0) * 1000.0, 3)
+            out[f"filter_hits_{field}"] = int(len(hits))
+        cases.save_index()
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--n", type=int, default=100000)
+    ap.add_argument("--cases-path", type=str, default=None, help="cases.jsonl existente (no se genera).")
+    ap.add_argument("--seed", type=int, default=1337)
+    ap.add_argument("--child", type=str, default=None, choices=list(MODES))
+    ap.add_argument("--out-json", type=str, default=None)
+    args = ap.parse_args()
+
+    if args.child:
+        print(json.dumps(_child(args.child, args.cases_path, args.seed)))
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = args.cases_path
+        if not path:
+            path = os.path.join(tmp, "cases.jsonl")
+            _write_cases(path, args.n, seed=args.seed)
+        else:
+            # la copia deja intacto el cases.idx.npz de la memoria original
+            src = path
+            path = os.path.join(tmp, "cases.jsonl")
+            with open(src, "rb") as fi, open(path, "wb") as fo:
+                fo.write(fi.read())
+        report: Dict[str, Any] = {"cases_bytes": os.path.getsize(path), "modes": {}}
+        for mode in MODES:
+            # lazy_cold deja escrito cases.idx.npz, que usa lazy_warm
+            cmd = [sys.executable, "-m", "src.eval.bench_case_store", "--child", mode, "--cases-path", path, "--seed", str(args.seed)]
+            row = json.loads(subprocess.run(cmd, check=True, capture_output=True, text=True).stdout)
+            report["modes"][mode] = row
+            print(f"[bench_case_store] {row}", file=sys.stderr)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.out_json:
+        os.makedirs(os.path.dirname(args.out_json) or ".", exist_ok=True)
+        with open(args.out_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Benchmark del modo CPU del embedder minilm (embedders.get_embedder(cpu=True)) contra el float:
+- latencia: p50/p99 de encode con 1 texto y con 8 (lo que hacen retrieve_memory/log) y
+  textos/s con batches de 64 (rebuilds);
+- drift: 1 - coseno entre el vector float y el int8 del mismo texto (media/p99/max),
+  acuerdo del vecino top-1 y pares (texto, texto) que cruzan los umbrales de retrieve/decide;
+- tokens: largo en wordpieces de los textos y fraccion truncada por max_seq_length;
+- micro-batching: --clients hilos pidiendo 1 texto a la vez, con y sin MicroBatcher.
+Textos de una memoria existente (--memory-dir) o sinteticos con build_case_text.
+
+    python -m src.eval.bench_embedder_cpu --memory-dir data/runs/<run>/memory
+    python -m src.eval.bench_embedder_cpu --n 512 --threads 4
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import threading
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.eval.bench_faiss_storage import DEFAULT_THRESHOLDS
+from src.memory.embedders import (
+    DEFAULT_CPU_MAX_SEQ_LENGTH,
+    DEFAULT_CPU_THREADS,
+    DEFAULT_MODEL_NAME,
+    Embedder,
+    MicroBatcher,
+    SentenceTransformerEmbedder,
+    set_torch_threads,
+)
+
+
+def _synthetic_texts(n: int, *, seed: int) -> List[str]:
+    from src.blue.blue_agent_graph import build_case_text
+
+    rng = np.random.default_rng(seed)
+    out: List[str] = []
+    for _ in range(n):
+        event_type = str(rng.choice(["auth", "network", "process", "dns"]))
+        ev = {
+            "event_type": event_type,
+            "action": str(rng.choice(["login_failure", "login_success", "connect", "exec", "query"])),
+            "outcome": str(rng.choice(["success", "failure"])),
+            "severity": str(rng.choice(["low", "medium", "high"])),
+            "user": str(rng.choice(["alice", "bob", "svc_backup", "root", "carol"])),
+            "src_ip": f"10.0.{rng.integers(0, 255)}.{rng.integers(1, 255)}",
+            "host": f"{rng.choice(['web', 'db', 'app'])}-0{rng.integers(1, 4)}",
+            "tags": [str(t) for t in rng.choice(["suspicious", "bruteforce", "scan", "auth", "recurrent"], size=2, replace=False)],
+            "timestamp": f"2026-01-01T{rng.integers(0, 24):02d}:00:00Z",
+        }
+        asset = {"asset": {"role": str(rng.choice(["web", "db", "app"])), "criticality": str(rng.choice(["low", "medium", "high"]))}}
+        out.append(build_case_text(ev, asset))
+    return out
+
+
+def _memory_texts(memory_dir: str, n: int) -> List[str]:
+    texts: List[str] = []
+    with open(os.path.join(memory_dir, "cases.jsonl"), "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                texts.append(json.loads(line)["text"])
+            except (json.JSONDecodeError, KeyError):
+                continue
+    return texts[:n] if n else texts
+
+
+def _pct(values: List[float], q: float) -> float:
+    return round(float(np.percentile(np.asarray(values), q)), 3)
+
+
+def _latency(embedder: Embedder, texts: List[str], *, repeats: int) -> Dict[str, Any]:
+    embedder.encode(texts[:8])  # warmup
+    out: Dict[str, Any] = {}
+    for batch in (1, 8):
+        ms: List[float] = []
+        for i in range(repeats):
+            chunk = [texts[(i * batch + j) % len(texts)] for j in range(batch)]
+            t0 = time.perf_counter()
+            embedder.encode(chunk)
+            ms.append((time.perf_counter() - t0) * 1000.0)
+        out[f"batch{batch}_p50_ms"] = _pct(ms, 50)
+        out[f"batch{batch}_p99_ms"] = _pct(ms, 99)
+    t0 = time.perf_counter()
+    for start in range(0, len(texts), 64):
+        embedder.encode(texts[start : start + 64])
+    out["batch64_texts_per_s"] = round(len(texts) / (time.perf_counter() - t0), 1)
+    return out
+
+
+def _normalize(v: np.ndarray) -> np.ndarray:
+    return v / (np.linalg.norm(v, axis=1, keepdims=True) + 1e-12)
+
+
+def _drift(ref: np.ndarray, other: np.ndarray, thresholds: List[float]) -> Dict[str, Any]:
+    ref, other = _normalize(ref), _normalize(other)
+    drift = 1.0 - np.sum(ref * other, axis=1)
+    sim_ref = ref @ ref.T
+    sim_other = other @ other.T
+    np.fill_diagonal(sim_ref, -np.inf)
+    np.fill_diagonal(sim_other, -np.inf)
+    upper = np.triu_indices(len(ref), k=1)
+    a, b = sim_ref[upper], sim_other[upper]
+    return {
+        "cosine_drift_mean": round(float(drift.mean()), 6),
+        "cosine_drift_p99": round(float(np.percentile(drift, 99)), 6),
+        "cosine_drift_max": round(float(drift.max()), 6),
+        "pair_score_drift_max": round(float(np.abs(a - b).max()), 6) if len(a) else None,
+        "top1_agreement": round(float(np.mean(sim_ref.argmax(axis=1) == sim_other.argmax(axis=1))), 4),
+        "threshold_flips": {
+            f"{t:.2f}": {"pairs_above_float": int((a >= t).sum()), "lost": int(((a >= t) & (b < t)).sum()), "gained": int(((a < t) & (b >= t)).sum())}
+            for t in thresholds
+        },
+    }
+
+
+def _tokens(embedder: SentenceTransformerEmbedder, texts: List[str], cap: int) -> Dict[str, Any]:
+    lengths = [len(ids) for ids in embedder.model.tokenizer(texts, add_special_tokens=True)["input_ids"]]
+    return {
+        "tokens_p50": int(statistics.median(lengths)),
+        "tokens_p99": int(np.percentile(lengths, 99)),
+        "tokens_max": int(max(lengths)),
+        "max_seq_length": cap,
+        "truncated_fraction": round(sum(1 for n in lengths if n > cap) / len(lengths), 4),
+    }
+
+
+def _concurrent(embedder: Embedder, texts: List[str], *, clients: int, per_client: int) -> Dict[str, Any]:
+    def worker(k: int) -> None:
+        for i in range(per_client):
+            embedder.encode([texts[(k * per_client + i) % len(texts)]])
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(clients)]
+    t0 = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    wall = time.perf_counter() - t0
+    out: Dict[str, Any] = {"clients": clients, "requests": clients * per_client, "wall_s": round(wall, 3)}
+    if isinstance(embedder, MicroBatcher):
+        stats = embedder.stats
+        out["batches"] = stats["batches"]
+        out["mean_batch_texts"] = round(stats["texts"] / max(1, stats["batches"]), 2)
+    return out
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--model-name", type=str, default=DEFAULT_MODEL_NAME)
+    ap.add_argument("--memory-dir", type=str, default=None)
+    ap.add_argument("--n", type=int, default=256)
+    ap.add_argument("--threads", type=int, default=DEFAULT_CPU_THREADS)
+    ap.add_argument("--max-seq-length", type=int, default=DEFAULT_CPU_MAX_SEQ_LENGTH)
+    ap.add_argument("--repeats", type=int, default=50)
+    ap.add_argument("--clients", type=int, default=8)
+    ap.add_argument("--per-client", type=int, default=8)
+    ap.add_argument("--thresholds", type=str, default=DEFAULT_THRESHOLDS)
+    ap.add_argument("--seed", type=int, default=1337)
+    ap.add_argument("--out-json", type=str, default=None)
+    args = ap.parse_args()
+
+    texts = _memory_texts(args.memory_dir, args.n) if args.memory_dir else _synthetic_texts(args.n, seed=args.seed)
+    if len(texts) < 2:
+        ap.error("se necesitan al menos 2 textos")
+    thresholds = [float(x) for x in args.thresholds.split(",") if x.strip()]
+    set_torch_threads(args.threads)
+
+    variants = {
+        "float": SentenceTransformerEmbedder(args.model_name),
+        "float_seq": SentenceTransformerEmbedder(args.model_name, max_seq_length=args.max_seq_length),
+        "int8_seq": SentenceTransformerEmbedder(args.model_name, quantize=True, max_seq_length=args.max_seq_length),
+    }
+    report: Dict[str, Any] = {
+        "model_name": args.model_name,
+        "source": args.memory_dir or "synthetic",
+        "n_texts": len(texts),
+        "threads": args.threads,
+        "tokens": _tokens(variants["float"], texts, args.max_seq_length),
+        "variants": {},
+    }
+    ref = variants["float"].encode(texts)
+    for name, embedder in variants.items():
+        row = _latency(embedder, texts, repeats=args.repeats)
+        if name != "float":
+            row.update(_drift(ref, embedder.encode(texts), thresholds))
+        report["variants"][name] = row
+        print(f"[bench_embedder_cpu] {name}: {row}", file=sys.stderr)
+
+    int8 = variants["int8_seq"]
+    report["micro_batching"] = {
+        "direct": _concurrent(int8, texts, clients=args.clients, per_client=args.per_client),
+        "batcher": _concurrent(MicroBatcher(int8), texts, clients=args.clients, per_client=args.per_client),
+    }
+    print(f"[bench_embedder_cpu] micro_batching: {report['micro_batching']}", file=sys.stderr)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.out_json:
+        os.makedirs(os.path.dirname(args.out_json) or ".", exist_ok=True)
+        with open(args.out_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark de backends de indice de la memoria (src/memory/ann_index.py) sobre vectores
+sinteticos normalizados (clusters + ruido, parecido a embeddings de casos repetidos):
+- build_ms: crear + entrenar + agregar.
+- recall_at_k: interseccion top-k contra el flat exacto (IndexFlatIP).
+- p50_ms / p99_ms: latencia de una consulta individual (como retrieve_memory).
+Con --min-recall sale con codigo 1 si algun backend ANN queda por debajo, para usarlo
+como gate antes de bajar ann_threshold o cambiar ef_search/nprobe.
+
+    python -m src.eval.bench_faiss_ann --sizes 10000,100000,1000000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.memory.ann_index import INDEX_TYPES, build_index, ivf_min_train, ivf_nlist_for, set_search_params
+
+
+def _synthetic(n: int, dim: int, *, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    n_centers = max(8, min(2048, n // 200))
+    centers = rng.standard_normal((n_centers, dim)).astype("float32")
+    vecs = centers[rng.integers(0, n_centers, size=n)] + 0.35 * rng.standard_normal((n, dim)).astype("float32")
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12
+    return vecs
+
+
+def _queries(base: np.ndarray, nq: int, *, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    q = base[rng.integers(0, len(base), size=nq)] + 0.05 * rng.standard_normal((nq, base.shape[1])).astype("float32")
+    q /= np.linalg.norm(q, axis=1, keepdims=True) + 1e-12
+    return np.ascontiguousarray(q, dtype="float32")
+
+
+def _bench_kind(
+    kind: str,
+    base: np.ndarray,
+    queries: np.ndarray,
+    truth: np.ndarray,
+    *,
+    k: int,
+    ef_search: int,
+    nprobe: int,
+) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    index = build_index(kind, base.shape[1], base)
+    build_ms = (time.perf_counter() - t0) * 1000.0
+    set_search_params(index, ef_search=ef_search, nprobe=nprobe)
+
+    lat: List[float] = []
+    found = np.empty((len(queries), k), dtype="int64")
+    for i in range(len(queries)):
+        t = time.perf_counter()
+        _, idx = index.search(queries[i : i + 1], k)
+        lat.append((time.perf_counter() - t) * 1000.0)
+        found[i] = idx[0]
+    recall = float(np.mean([len(set(found[i]) & set(truth[i])) / k for i in range(len(queries))]))
+    return {
+        "build_ms": round(build_ms, 1),
+        "recall_at_k": round(recall, 4),
+        "p50_ms": round(float(np.percentile(lat, 50)), 4),
+        "p99_ms": round(float(np.percentile(lat, 99)), 4),
+    }
+
+
+def run_benchmark(
+    *,
+    sizes: List[int],
+    kinds: List[str],
+    dim: int,
+    nq: int,
+    k: int,
+    ef_search: int,
+    nprobe: int,
+    seed: int,
+) -> Dict[str, Any]:
+    import faiss
+
+    report: Dict[str, Any] = {"dim": dim, "nq": nq, "k": k, "ef_search": ef_search, "nprobe": nprobe, "sizes": {}}
+    for n in sizes:
+        base = _synthetic(n, dim, seed=seed)
+        queries = _queries(base, nq, seed=seed)
+        flat = faiss.IndexFlatIP(dim)
+        flat.add(base)
+        _, truth = flat.search(queries, k)
+        del flat
+
+        row: Dict[str, Any] = {}
+        for kind in kinds:
+            if kind in ("ivf_flat", "ivf_pq") and n < ivf_min_train(kind, ivf_nlist_for(n)):
+                row[kind] = {"skipped": f"n={n} < min_train={ivf_min_train(kind, ivf_nlist_for(n))}"}
+                continue
+            row[kind] = _bench_kind(kind, base, queries, truth, k=k, ef_search=ef_search, nprobe=nprobe)
+            print(f"[bench_faiss_ann] n={n} {kind}: {row[kind]}", file=sys.stderr)
+        report["sizes"][str(n)] = row
+    return report
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--sizes", type=str, default="10000,100000,1000000")
+    ap.add_argument("--kinds", type=str, default=",".join(INDEX_TYPES))
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--nq", type=int, default=200)
+    ap.add_argument("--k", type=int, default=10)
+    ap.add_argument("--ef-search", type=int, default=64)
+    ap.add_argument("--nprobe", type=int, default=16)
+    ap.add_argument("--seed", type=int, default=1337)
+    ap.add_argument("--min-recall", type=float, default=None)
+    ap.add_argument("--out-json", type=str, default=None)
+    args = ap.parse_args()
+
+    kinds = [x.strip() for x in args.kinds.split(",") if x.strip()]
+    bad = [x for x in kinds if x not in INDEX_TYPES]
+    if bad:
+        ap.error(f"--kinds invalido: {bad} (usa {', '.join(INDEX_TYPES)})")
+
+    report = run_benchmark(
+        sizes=[int(x) for x in args.sizes.split(",") if x.strip()],
+        kinds=kinds,
+        dim=args.dim,
+        nq=args.nq,
+        k=args.k,
+        ef_search=args.ef_search,
+        nprobe=args.nprobe,
+        seed=args.seed,
+    )
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.out_json:
+        os.makedirs(os.path.dirname(args.out_json) or ".", exist_ok=True)
+        with open(args.out_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    if args.min_recall is not None:
+        failures = [
+            f"n={n} {kind} recall_at_k={res['recall_at_k']} < {args.min_recall}"
+            for n, row in report["sizes"].items()
+            for kind, res in row.items()
+            if kind != "flat" and "recall_at_k" in res and res["recall_at_k"] < args.min_recall
+        ]
+        for msg in failures:
+            print("BENCH FAIL:", msg, file=sys.stderr)
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
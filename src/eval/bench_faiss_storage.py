@@ -0,0 +1,149 @@
+"""
+Benchmark de storage de la memoria (float32 vs fp16 vs sq8, ver ann_index.STORAGE_TYPES):
+- index_bytes: tamano de index.faiss escrito con faiss.write_index.
+- load_ms: mediana de faiss.read_index (lo que paga cada run al abrir la memoria).
+- score drift: |score_q - score_f32| sobre los top-k vecinos float32 de cada consulta.
+- threshold flips: pares (consulta, caso) que cruzan un umbral de retrieve/decide
+  (0.56 y 0.62 de MEMORY_QUERY_THRESHOLDS, 0.75, ...) al cambiar el storage.
+- topk_overlap: interseccion del top-k cuantizado con el top-k float32.
+
+Vectores sinteticos por defecto; con --memory-dir usa los embeddings de una memoria
+existente (index.faiss float32 flat/hnsw).
+
+    python -m src.eval.bench_faiss_storage --n 20000
+    python -m src.eval.bench_faiss_storage --memory-dir data/runs/<run>/memory
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List
+
+import numpy as np
+
+from src.memory.ann_index import STORAGE_TYPES, build_index, index_kind, index_storage
+
+DEFAULT_THRESHOLDS = "0.56,0.62,0.68,0.74,0.75,0.78,0.82,0.86,0.94"
+
+
+def _synthetic(n: int, dim: int, *, seed: int) -> np.ndarray:
+    # Ruido variable por vector: scores repartidos entre ~0.4 y 1.0, como casos reales.
+    rng = np.random.default_rng(seed)
+    n_centers = max(8, min(2048, n // 50))
+    centers = rng.standard_normal((n_centers, dim)).astype("float32")
+    noise = rng.uniform(0.3, 1.2, size=(n, 1)).astype("float32")
+    vecs = centers[rng.integers(0, n_centers, size=n)] + noise * rng.standard_normal((n, dim)).astype("float32")
+    vecs /= np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-12
+    return vecs
+
+
+def _memory_vectors(memory_dir: str) -> np.ndarray:
+    import faiss
+
+    index = faiss.read_index(os.path.join(memory_dir, "index.faiss"))
+    if index_kind(index) not in ("flat", "hnsw") or index_storage(index) != "float32":
+        raise SystemExit(f"{memory_dir}: se necesita un index.faiss float32 flat/hnsw como referencia")
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def run_benchmark(
+    base: np.ndarray,
+    *,
+    nq: int,
+    k: int,
+    thresholds: List[float],
+    load_repeats: int,
+    seed: int,
+) -> Dict[str, Any]:
+    import faiss
+
+    n, dim = base.shape
+    rng = np.random.default_rng(seed + 1)
+    # Consultas = casos existentes con ruido (un episodio nuevo parecido a uno aprendido).
+    queries = base[rng.integers(0, n, size=nq)] + 0.3 * rng.standard_normal((nq, dim)).astype("float32") / np.sqrt(dim)
+    queries = np.ascontiguousarray(queries / (np.linalg.norm(queries, axis=1, keepdims=True) + 1e-12), dtype="float32")
+
+    report: Dict[str, Any] = {"n": n, "dim": dim, "nq": nq, "k": k, "thresholds": thresholds, "storage": {}}
+    ref_scores = ref_ids = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for storage in STORAGE_TYPES:
+            index = build_index("flat", dim, base, storage=storage)
+            path = os.path.join(tmp, f"{storage}.faiss")
+            faiss.write_index(index, path)
+            load_ms: List[float] = []
+            for _ in range(max(1, load_repeats)):
+                t0 = time.perf_counter()
+                faiss.read_index(path)
+                load_ms.append((time.perf_counter() - t0) * 1000.0)
+
+            scores, ids = index.search(queries, k)
+            row: Dict[str, Any] = {
+                "index_bytes": os.path.getsize(path),
+                "bytes_per_vector": round(os.path.getsize(path) / max(1, n), 1),
+                "load_ms": round(statistics.median(load_ms), 3),
+            }
+            if ref_scores is None:
+                ref_scores, ref_ids = scores, ids
+            else:
+                # Score cuantizado de los mismos pares (consulta, caso) que devolvio float32.
+                decoded = index.reconstruct_n(0, n)
+                q_scores = np.einsum("qd,qkd->qk", queries, decoded[ref_ids])
+                drift = np.abs(q_scores - ref_scores)
+                row["score_drift_mean"] = round(float(drift.mean()), 6)
+                row["score_drift_p99"] = round(float(np.percentile(drift, 99)), 6)
+                row["score_drift_max"] = round(float(drift.max()), 6)
+                row["threshold_flips"] = {
+                    f"{t:.2f}": {
+                        "pairs_above_f32": int((ref_scores >= t).sum()),
+                        "lost": int(((ref_scores >= t) & (q_scores < t)).sum()),
+                        "gained": int(((ref_scores < t) & (q_scores >= t)).sum()),
+                    }
+                    for t in thresholds
+                }
+                row["topk_overlap"] = round(
+                    float(np.mean([len(set(ids[i]) & set(ref_ids[i])) / k for i in range(nq)])), 4
+                )
+            report["storage"][storage] = row
+            print(f"[bench_faiss_storage] {storage}: {row}", file=sys.stderr)
+    return report
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--memory-dir", type=str, default=None)
+    ap.add_argument("--n", type=int, default=20000)
+    ap.add_argument("--dim", type=int, default=384)
+    ap.add_argument("--nq", type=int, default=500)
+    ap.add_argument("--k", type=int, default=8)
+    ap.add_argument("--thresholds", type=str, default=DEFAULT_THRESHOLDS)
+    ap.add_argument("--load-repeats", type=int, default=5)
+    ap.add_argument("--seed", type=int, default=1337)
+    ap.add_argument("--out-json", type=str, default=None)
+    args = ap.parse_args()
+
+    base = _memory_vectors(args.memory_dir) if args.memory_dir else _synthetic(args.n, args.dim, seed=args.seed)
+    if len(base) == 0:
+        ap.error("memoria vacia")
+    report = run_benchmark(
+        base,
+        nq=args.nq,
+        k=min(args.k, len(base)),
+        thresholds=[float(x) for x in args.thresholds.split(",") if x.strip()],
+        load_repeats=args.load_repeats,
+        seed=args.seed,
+    )
+    report["source"] = args.memory_dir or "synthetic"
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.out_json:
+        os.makedirs(os.path.dirname(args.out_json) or ".", exist_ok=True)
+        with open(args.out_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Benchmark del mapper por perfil de valores (schema_mapper.build_profile_mapping) sobre backend_b:
+- static: por episodio, confidence del perfil y campos mal asignados contra BACKEND_B_ALIASES_FULL
+  (los alias reales de to_backend_b_event); escalaria al LLM si confidence < --min-confidence.
+- agent: el Blue Agent en modo dynamic con y sin --schema-profile-mapper sobre los mismos
+  episodios: episodios con llamada al LLM, fuentes del mapping, duracion de normalize_schema y
+  decisiones que difieren.
+
+    python -m src.eval.bench_schema_profile --logs-dir data/<exp>/logs_backend_b \\
+        --gt-dir data/<exp>/ground_truth --episodes 8 --llm-provider ollama
+
+Cada corrida del agente usa un cwd temporal propio, asi el cache compartido de mappings
+(data/experiments/_shared_schema_cache) no se reusa entre configuraciones.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+from src.blue.blue_agent_graph import BACKEND_B_ALIASES_FULL, BACKEND_B_ALIASES_MINIMAL
+from src.blue.schema_mapper import CANONICAL_FIELDS, build_profile_mapping
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _read_jsonl(path: str, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                rows.append(json.loads(line))
+            if limit is not None and len(rows) >= limit:
+                break
+    return rows
+
+
+def _episode_path(logs_dir: str, episode_id: int) -> str:
+    return os.path.join(logs_dir, f"episode_{episode_id:03d}.jsonl")
+
+
+def _static_profile(logs_dir: str, episodes: List[int], *, min_confidence: float, hints: Dict[str, str]) -> Dict[str, Any]:
+    rows: List[Dict[str, Any]] = []
+    for episode_id in episodes:
+        sample = _read_jsonl(_episode_path(logs_dir, episode_id), limit=8)
+        profiled = build_profile_mapping(sample, hints=hints)
+        wrong = {
+            field: source
+            for field, source in profiled.mapping.items()
+            if source != BACKEND_B_ALIASES_FULL[field] and source not in BACKEND_B_ALIASES_FULL[field].split("|")
+        }
+        rows.append(
+            {
+                "episode_id": episode_id,
+                "confidence": profiled.confidence,
+                "escalates": profiled.confidence < min_confidence,
+                "fields": len(profiled.mapping),
+                "wrong": wrong,
+            }
+        )
+    return {
+        "episodes": len(rows),
+        "escalations": sum(1 for r in rows if r["escalates"]),
+        "wrong_fields": sum(len(r["wrong"]) for r in rows),
+        "canonical_fields": len(CANONICAL_FIELDS),
+        "per_episode": rows,
+    }
+
+
+def _run_agent(
+    python_exe: str,
+    *,
+    logs_dir: str,
+    gt_dir: str,
+    episodes: List[int],
+    profile_mapper: bool,
+    agent_args: List[str],
+) -> List[Dict[str, Any]]:
+    workdir = tempfile.mkdtemp(prefix="bench_schema_profile_")
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(p for p in (REPO_ROOT, env.get("PYTHONPATH")) if p)
+    env["CYBER_RANGE_RUNS_DIR"] = os.path.join(workdir, "runs")
+    cmd = [
+        python_exe,
+        "-m",
+        "src.blue.run_blue_agent",
+        "--episode-start",
+        str(episodes[0]),
+        "--episode-end",
+        str(episodes[-1]),
+        "--run-id",
+        "bench",
+        "--logs-dir",
+        logs_dir,
+        "--backend",
+        "backend_b",
+        "--gt-dir",
+        gt_dir,
+        "--schema-mapper-mode",
+        "dynamic",
+        "--delay",
+        "0",
+        "--non-interactive",
+        "--no-trace",
+        "--schema-profile-mapper" if profile_mapper else "--no-schema-profile-mapper",
+        *agent_args,
+    ]
+    try:
+        subprocess.run(cmd, cwd=workdir, env=env, check=True, capture_output=True, text=True)
+        rows: List[Dict[str, Any]] = []
+        for row in _read_jsonl(os.path.join(workdir, "runs", "bench", "decisions.jsonl")):
+            evidence = row.get("evidence") or {}
+            mapping = evidence.get("schema_mapping") or {}
+            stage = ((evidence.get("timing") or {}).get("stages") or {}).get("normalize_schema") or {}
+            rows.append(
+                {
+                    "episode_id": int(row["episode_id"]),
+                    "decision": row.get("decision"),
+                    "source": str(mapping.get("source") or "none"),
+                    "llm_called": bool(mapping.get("llm_called", False)),
+                    "normalize_schema_ms": float(stage.get("duration_ms") or 0.0),
+                }
+            )
+        return rows
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def _summarize_agent(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
+    durations = [r["normalize_schema_ms"] for r in rows]
+    return {
+        "episodes": len(rows),
+        "llm_called_episodes": sum(1 for r in rows if r["llm_called"]),
+        "sources": dict(Counter(r["source"] for r in rows)),
+        "normalize_schema_ms_mean": round(statistics.mean(durations), 3) if durations else None,
+        "normalize_schema_ms_p50": round(statistics.median(durations), 3) if durations else None,
+        "normalize_schema_ms_total": round(sum(durations), 3),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--logs-dir", type=str, required=True, help="logs_backend_b (idealmente drift hard4).")
+    ap.add_argument("--gt-dir", type=str, required=True)
+    ap.add_argument("--episodes", type=int, default=8)
+    ap.add_argument("--min-confidence", type=float, default=0.75)
+    ap.add_argument("--backend-b-alias-mode", type=str, default="minimal", choices=["full", "minimal"])
+    ap.add_argument("--schema-adapt-mode", type=str, default="llm_first", choices=["contract_first", "llm_first"])
+    ap.add_argument("--llm-provider", type=str, default="ollama", choices=["gemini", "ollama"])
+    ap.add_argument("--ollama-url", type=str, default="http://127.0.0.1:11434")
+    ap.add_argument("--ollama-model", type=str, default="qwen3:8b")
+    ap.add_argument("--llm-timeout-sec", type=float, default=8.0)
+    ap.add_argument("--agent", dest="agent", action="store_true")
+    ap.add_argument("--no-agent", dest="agent", action="store_false", help="solo la parte estatica, sin LLM.")
+    ap.add_argument("--memory", dest="memory", action="store_true")
+    ap.add_argument("--no-memory", dest="memory", action="store_false")
+    ap.add_argument("--out-json", type=str, default=None)
+    ap.set_defaults(agent=True)
+    ap.set_defaults(memory=False)
+    args = ap.parse_args()
+
+    logs_dir = os.path.abspath(args.logs_dir)
+    gt_dir = os.path.abspath(args.gt_dir)
+    episodes = [ep for ep in range(1, int(args.episodes) + 1) if os.path.exists(_episode_path(logs_dir, ep))]
+    if not episodes:
+        ap.error(f"sin episodios en {logs_dir}")
+    hints = BACKEND_B_ALIASES_MINIMAL if args.backend_b_alias_mode == "minimal" else BACKEND_B_ALIASES_FULL
+
+    report: Dict[str, Any] = {
+        "logs_dir": logs_dir,
+        "episodes": episodes,
+        "min_confidence": args.min_confidence,
+        "backend_b_alias_mode": args.backend_b_alias_mode,
+        "static_no_hints": _static_profile(logs_dir, episodes, min_confidence=args.min_confidence, hints={}),
+        "static_contract_hints": _static_profile(logs_dir, episodes, min_confidence=args.min_confidence, hints=hints),
+    }
+    if args.agent:
+        agent_args = [
+            "--schema-map-min-confidence",
+            str(args.min_confidence),
+            "--schema-adapt-mode",
+            args.schema_adapt_mode,
+            "--backend-b-alias-mode",
+            args.backend_b_alias_mode,
+            "--llm-provider",
+            args.llm_provider,
+            "--ollama-url",
+            args.ollama_url,
+            "--ollama-model",
+            args.ollama_model,
+            "--llm-timeout-sec",
+            str(args.llm_timeout_sec),
+            "--memory" if args.memory else "--no-memory",
+        ]
+        runs = {
+            label: _run_agent(
+                sys.executable,
+                logs_dir=logs_dir,
+                gt_dir=gt_dir,
+                episodes=episodes,
+                profile_mapper=profile_mapper,
+                agent_args=agent_args,
+            )
+            for label, profile_mapper in (("llm_only", False), ("value_profile", True))
+        }
+        report["agent"] = {label: _summarize_agent(rows) for label, rows in runs.items()}
+        before = {r["episode_id"]: r["decision"] for r in runs["llm_only"]}
+        report["agent"]["decision_mismatches"] = [
+            r["episode_id"] for r in runs["value_profile"] if before.get(r["episode_id"]) != r["decision"]
+        ]
+        llm_before = report["agent"]["llm_only"]["llm_called_episodes"]
+        llm_after = report["agent"]["value_profile"]["llm_called_episodes"]
+        report["agent"]["llm_calls_avoided"] = llm_before - llm_after
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.out_json:
+        os.makedirs(os.path.dirname(args.out_json) or ".", exist_ok=True)
+        with open(args.out_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
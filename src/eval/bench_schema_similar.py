@@ -0,0 +1,152 @@
+"""
+Benchmark del reuso por firma cercana del DynamicSchemaMapper (Jaccard sobre claves observadas).
+Recorre los logs de backend_b en ventanas de --window eventos (como las muestras filtradas que
+ve normalize_schema) y mapea cada ventana con un mapper nuevo con y sin --similar-reuse:
+firmas distintas, llamadas al LLM, reusos por similitud y campos mal asignados o faltantes
+contra BACKEND_B_ALIASES_FULL. v4_sparse agrega usr_ref/proc_meta por evento, asi que
+ventanas chicas generan firmas nuevas para el mismo esquema.
+
+    python -m src.eval.bench_schema_similar --logs-dir data/<exp>/logs_backend_b --episodes 8 \\
+        --llm-provider ollama --window 3
+
+Por defecto el mapper por perfil de valores queda apagado para que toda firma nueva sin
+reuso llegue al LLM (--profile-mapper para medir la combinacion).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List
+
+from src.blue.blue_agent_graph import BACKEND_B_ALIASES_FULL, BACKEND_B_ALIASES_MINIMAL
+from src.blue.schema_mapper import DEFAULT_SIMILAR_MIN_JACCARD, DynamicSchemaMapper, _collect_keys
+
+
+def _read_jsonl(path: str) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def _field_errors(mapping: Dict[str, str], window: List[Dict[str, Any]]) -> Dict[str, int]:
+    keys = _collect_keys(window)
+    wrong = 0
+    missing = 0
+    for canonical, spec in BACKEND_B_ALIASES_FULL.items():
+        aliases = spec.split("|")
+        source = mapping.get(canonical)
+        if source is None:
+            missing += int(any(alias in keys for alias in aliases))
+        elif source != spec and source not in aliases:
+            wrong += 1
+    return {"wrong": wrong, "missing": missing}
+
+
+def _replay(
+    windows: List[List[Dict[str, Any]]],
+    *,
+    similar_reuse: bool,
+    mapper_options: Dict[str, Any],
+    hints: Dict[str, str],
+) -> Dict[str, Any]:
+    workdir = tempfile.mkdtemp(prefix="bench_schema_similar_")
+    try:
+        mapper = DynamicSchemaMapper(
+            enabled=True,
+            cache_path=os.path.join(workdir, "schema_map_cache.json"),
+            similar_reuse=similar_reuse,
+            **mapper_options,
+        )
+        sources: Counter[str] = Counter()
+        signatures = set()
+        llm_calls = 0
+        wrong = 0
+        missing = 0
+        t0 = time.perf_counter()
+        for window in windows:
+            result = mapper.infer_mapping(backend="backend_b", sample_events=window, contract_hints=hints)
+            signatures.add(result.signature)
+            sources[result.source] += 1
+            llm_calls += int(result.llm_called)
+            errors = _field_errors(result.mapping, window)
+            wrong += errors["wrong"]
+            missing += errors["missing"]
+        wall_ms = (time.perf_counter() - t0) * 1000.0
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+    return {
+        "samples": len(windows),
+        "signatures": len(signatures),
+        "llm_calls": llm_calls,
+        "similar_reuses": sum(n for source, n in sources.items() if source.endswith("_cache_similar")),
+        "wrong_fields": wrong,
+        "missing_fields": missing,
+        "wall_ms": round(wall_ms, 1),
+        "sources": dict(sources),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--logs-dir", type=str, required=True, help="logs_backend_b (idealmente drift hard4).")
+    ap.add_argument("--episodes", type=int, default=8)
+    ap.add_argument("--window", type=int, default=3)
+    ap.add_argument("--min-jaccard", type=float, default=DEFAULT_SIMILAR_MIN_JACCARD)
+    ap.add_argument("--min-confidence", type=float, default=0.75)
+    ap.add_argument("--backend-b-alias-mode", type=str, default="minimal", choices=["full", "minimal"])
+    ap.add_argument("--profile-mapper", dest="profile_mapper", action="store_true")
+    ap.add_argument("--no-profile-mapper", dest="profile_mapper", action="store_false")
+    ap.add_argument("--llm-provider", type=str, default="ollama", choices=["gemini", "ollama"])
+    ap.add_argument("--gemini-model", type=str, default="gemini-1.5-flash")
+    ap.add_argument("--ollama-url", type=str, default="http://127.0.0.1:11434")
+    ap.add_argument("--ollama-model", type=str, default="qwen3:8b")
+    ap.add_argument("--llm-timeout-sec", type=float, default=8.0)
+    ap.add_argument("--out-json", type=str, default=None)
+    ap.set_defaults(profile_mapper=False)
+    args = ap.parse_args()
+
+    window = max(1, int(args.window))
+    windows: List[List[Dict[str, Any]]] = []
+    for episode_id in range(1, int(args.episodes) + 1):
+        path = os.path.join(args.logs_dir, f"episode_{episode_id:03d}.jsonl")
+        if not os.path.exists(path):
+            continue
+        events = _read_jsonl(path)
+        windows.extend(events[i : i + window] for i in range(0, len(events), window))
+    if not windows:
+        ap.error(f"sin episodios en {args.logs_dir}")
+
+    mapper_options = {
+        "api_key": os.getenv("GEMINI_API_KEY") or None,
+        "provider": args.llm_provider,
+        "model": args.gemini_model,
+        "ollama_url": args.ollama_url,
+        "ollama_model": args.ollama_model,
+        "min_confidence": args.min_confidence,
+        "llm_timeout_sec": args.llm_timeout_sec,
+        "profile_mapper": args.profile_mapper,
+        "similar_min_jaccard": args.min_jaccard,
+    }
+    hints = BACKEND_B_ALIASES_MINIMAL if args.backend_b_alias_mode == "minimal" else BACKEND_B_ALIASES_FULL
+    report: Dict[str, Any] = {
+        "logs_dir": args.logs_dir,
+        "window": window,
+        "min_jaccard": args.min_jaccard,
+        "profile_mapper": args.profile_mapper,
+        "exact_only": _replay(windows, similar_reuse=False, mapper_options=mapper_options, hints=hints),
+        "similar_reuse": _replay(windows, similar_reuse=True, mapper_options=mapper_options, hints=hints),
+    }
+    report["llm_calls_avoided"] = report["exact_only"]["llm_calls"] - report["similar_reuse"]["llm_calls"]
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.out_json:
+        os.makedirs(os.path.dirname(args.out_json) or ".", exist_ok=True)
+        with open(args.out_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
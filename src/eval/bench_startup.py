@@ -0,0 +1,177 @@
+"""
+Benchmark de arranque del Blue Agent (proceso nuevo en cada medicion):
+- import_ms: tiempo de `import src.blue.blue_agent_graph` y modulos pesados que quedaron cargados.
+- first_episode_ms: lanzar `src.blue.run_blue_agent` para 1 episodio hasta que el proceso termina.
+Con --max-import-ms / --max-first-episode-ms sale con codigo 1 si la mediana supera el presupuesto,
+para usarlo como gate en CI o antes de una bateria larga. tests/test_startup.py corre la parte
+de import dentro de pytest.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from src.core.run_manager import new_run_id, run_paths
+
+HEAVY_MODULES = ["torch", "sentence_transformers", "faiss", "src.memory.faiss_store"]
+
+_IMPORT_PROBE = """
+import json, sys, time
+t0 = time.perf_counter()
+import src.blue.blue_agent_graph
+dt = (time.perf_counter() - t0) * 1000.0
+print(json.dumps({"import_ms": dt, "heavy_loaded": [m for m in %r if m in sys.modules]}))
+"""
+
+
+def _median(values: List[float]) -> Optional[float]:
+    return round(statistics.median(values), 3) if values else None
+
+
+def measure_import(python_exe: str, *, cwd: str) -> Dict[str, Any]:
+    """Importa blue_agent_graph en un proceso nuevo: {"import_ms", "heavy_loaded"} (tests/test_startup.py)."""
+    out = subprocess.run(
+        [python_exe, "-c", _IMPORT_PROBE % (HEAVY_MODULES,)],
+        cwd=cwd,
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def _measure_first_episode(
+    python_exe: str,
+    *,
+    cwd: str,
+    episode_id: int,
+    logs_dir: str,
+    gt_dir: str,
+    backend: str,
+    memory: bool,
+) -> Dict[str, Any]:
+    run_id = new_run_id("bench_startup")
+    cmd = [
+        python_exe,
+        "-m",
+        "src.blue.run_blue_agent",
+        "--episode-id",
+        str(episode_id),
+        "--run-id",
+        run_id,
+        "--logs-dir",
+        logs_dir,
+        "--gt-dir",
+        gt_dir,
+        "--backend",
+        backend,
+        "--delay",
+        "0",
+        "--non-interactive",
+        "--no-trace",
+        "--memory" if memory else "--no-memory",
+    ]
+    t0 = time.perf_counter()
+    subprocess.run(cmd, cwd=cwd, check=True, capture_output=True, text=True)
+    wall_ms = (time.perf_counter() - t0) * 1000.0
+
+    paths = run_paths(run_id)
+    pipeline_ms: Optional[float] = None
+    if os.path.exists(paths["decisions"]):
+        with open(paths["decisions"], "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    timing = ((json.loads(line).get("evidence") or {}).get("timing") or {})
+                    pipeline_ms = timing.get("pipeline_duration_ms")
+    shutil.rmtree(paths["base"], ignore_errors=True)
+    return {"first_episode_ms": wall_ms, "pipeline_ms": pipeline_ms}
+
+
+def run_benchmark(
+    *,
+    python_exe: str,
+    cwd: str,
+    repeats: int,
+    episode_id: int,
+    logs_dir: str,
+    gt_dir: str,
+    backend: str,
+) -> Dict[str, Any]:
+    imports = [measure_import(python_exe, cwd=cwd) for _ in range(repeats)]
+    report: Dict[str, Any] = {
+        "python_executable": python_exe,
+        "repeats": repeats,
+        "import_ms_median": _median([r["import_ms"] for r in imports]),
+        "heavy_loaded_on_import": sorted({m for r in imports for m in r["heavy_loaded"]}),
+        "configs": {},
+    }
+    for label, memory in (("static_no_memory", False), ("static_memory", True)):
+        samples = [
+            _measure_first_episode(
+                python_exe,
+                cwd=cwd,
+                episode_id=episode_id,
+                logs_dir=logs_dir,
+                gt_dir=gt_dir,
+                backend=backend,
+                memory=memory,
+            )
+            for _ in range(repeats)
+        ]
+        report["configs"][label] = {
+            "first_episode_ms_median": _median([s["first_episode_ms"] for s in samples]),
+            "pipeline_ms_median": _median([float(s["pipeline_ms"]) for s in samples if s["pipeline_ms"] is not None]),
+        }
+    return report
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--repeats", type=int, default=3)
+    ap.add_argument("--episode-id", type=int, default=1)
+    ap.add_argument("--logs-dir", type=str, default="data/logs_backend_a")
+    ap.add_argument("--gt-dir", type=str, default="data/ground_truth")
+    ap.add_argument("--backend", type=str, default="backend_a", choices=["backend_a", "backend_b"])
+    ap.add_argument("--out-json", type=str, default=None)
+    ap.add_argument("--max-import-ms", type=float, default=None)
+    ap.add_argument("--max-first-episode-ms", type=float, default=None)
+    args = ap.parse_args()
+
+    report = run_benchmark(
+        python_exe=sys.executable,
+        cwd=os.getcwd(),
+        repeats=max(1, int(args.repeats)),
+        episode_id=args.episode_id,
+        logs_dir=args.logs_dir,
+        gt_dir=args.gt_dir,
+        backend=args.backend,
+    )
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.out_json:
+        os.makedirs(os.path.dirname(args.out_json) or ".", exist_ok=True)
+        with open(args.out_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+    failures: List[str] = []
+    if report["heavy_loaded_on_import"]:
+        failures.append(f"import eager de modulos pesados: {report['heavy_loaded_on_import']}")
+    if args.max_import_ms is not None and (report["import_ms_median"] or 0.0) > args.max_import_ms:
+        failures.append(f"import_ms_median={report['import_ms_median']} > {args.max_import_ms}")
+    no_mem_ms = report["configs"]["static_no_memory"]["first_episode_ms_median"]
+    if args.max_first_episode_ms is not None and (no_mem_ms or 0.0) > args.max_first_episode_ms:
+        failures.append(f"static_no_memory first_episode_ms_median={no_mem_ms} > {args.max_first_episode_ms}")
+    for msg in failures:
+        print("BENCH FAIL:", msg, file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
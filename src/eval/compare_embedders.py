@@ -0,0 +1,234 @@
+"""
+Compara embedders de la memoria (src/memory/embedders.py) sobre un dataset generado:
+corre el Blue Agent una vez por embedder (mismo dataset, memoria propia por run) y
+reporta contra el primero (referencia, normalmente minilm):
+- decision_agreement y la lista de episodios donde la decision cambia.
+- memoria: hit_presence_agreement (ambos con/sin hits), top1_agreement y Jaccard medio
+  de los hits (identificados por el texto del caso, igual entre embedders).
+- confusion (tp/fp/tn/fn, precision, recall, fpr) de cada embedder contra el ground truth.
+- wall_s del proceso y retrieve_memory_ms medio (el proceso incluye cargar el modelo).
+Con --train-logs-dir/--train-gt-dir cada run aprende primero sobre ese dataset (como
+fase1 de run_experiments) y solo se comparan las decisiones de evaluacion.
+
+    python -m src.eval.compare_embedders --logs-dir data/logs_backend_a --gt-dir data/ground_truth
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from src.core.evidence_store import read_decisions
+from src.core.ground_truth import is_attack, list_ground_truth_episode_ids, load_ground_truth
+from src.core.run_manager import new_run_id, run_paths
+from src.judge.judge_confusion import Confusion
+from src.memory.embedders import parse_embedder_spec
+
+
+def _run_agent(
+    python_exe: str,
+    *,
+    run_id: str,
+    embedder: str,
+    logs_dir: str,
+    gt_dir: str,
+    backend: str,
+    episode_start: int,
+    episode_end: int,
+) -> float:
+    cmd = [
+        python_exe,
+        "-m",
+        "src.blue.run_blue_agent",
+        "--episode-start",
+        str(episode_start),
+        "--episode-end",
+        str(episode_end),
+        "--run-id",
+        run_id,
+        "--logs-dir",
+        logs_dir,
+        "--gt-dir",
+        gt_dir,
+        "--backend",
+        backend,
+        "--delay",
+        "0",
+        "--non-interactive",
+        "--no-trace",
+        "--memory-embedder",
+        embedder,
+    ]
+    print("RUN:", " ".join(cmd), file=sys.stderr)
+    t0 = time.perf_counter()
+    subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+    return time.perf_counter() - t0
+
+
+def _episode_range(gt_dir: str, start: Optional[int], end: Optional[int]) -> List[int]:
+    ids = list_ground_truth_episode_ids(gt_dir)
+    if not ids and (start is None or end is None):
+        raise SystemExit(f"sin ground truth en {gt_dir}: usa --episode-start/--episode-end")
+    return [start if start is not None else min(ids), end if end is not None else max(ids)]
+
+
+def _hit_key(hit: Dict[str, Any]) -> str:
+    text = str((hit.get("case") or {}).get("text") or "")
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()[:16]
+
+
+def _summarize_run(records: List[Dict[str, Any]], gt_dir: str) -> Dict[str, Any]:
+    by_ep: Dict[int, Dict[str, Any]] = {}
+    for r in records:
+        by_ep[int(r["episode_id"])] = r
+    conf = Confusion()
+    retrieve_ms: List[float] = []
+    episodes: Dict[int, Dict[str, Any]] = {}
+    for ep, r in sorted(by_ep.items()):
+        evidence = r.get("evidence") or {}
+        attack = is_attack(load_ground_truth(gt_dir, ep))
+        decision = r.get("decision") or "missing"
+        if attack is not None:
+            conf.add(attack, decision == "block_ip")
+        stage = ((evidence.get("timing") or {}).get("stages") or {}).get("retrieve_memory") or {}
+        if stage.get("duration_ms") is not None:
+            retrieve_ms.append(float(stage["duration_ms"]))
+        episodes[ep] = {
+            "decision": decision,
+            "attack_present": attack,
+            "hits": [_hit_key(h) for h in (evidence.get("memory_hits") or [])],
+        }
+    return {
+        "episodes": episodes,
+        "confusion": {
+            "tp": conf.tp,
+            "fp": conf.fp,
+            "tn": conf.tn,
+            "fn": conf.fn,
+            "precision": conf.precision(),
+            "recall": conf.recall(),
+            "fpr": conf.fpr(),
+        },
+        "retrieve_memory_ms_mean": round(statistics.mean(retrieve_ms), 3) if retrieve_ms else None,
+    }
+
+
+def _compare(ref: Dict[int, Dict[str, Any]], other: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
+    common = sorted(set(ref) & set(other))
+    same_decision = 0
+    same_presence = 0
+    top1_total = top1_same = 0
+    jaccards: List[float] = []
+    changed: List[Dict[str, Any]] = []
+    for ep in common:
+        a, b = ref[ep], other[ep]
+        if a["decision"] == b["decision"]:
+            same_decision += 1
+        else:
+            changed.append(
+                {"episode_id": ep, "attack_present": a["attack_present"], "reference": a["decision"], "other": b["decision"]}
+            )
+        if bool(a["hits"]) == bool(b["hits"]):
+            same_presence += 1
+        if a["hits"] and b["hits"]:
+            top1_total += 1
+            top1_same += int(a["hits"][0] == b["hits"][0])
+        if a["hits"] or b["hits"]:
+            sa, sb = set(a["hits"]), set(b["hits"])
+            jaccards.append(len(sa & sb) / len(sa | sb))
+    n = len(common)
+    return {
+        "episodes": n,
+        "decision_agreement": round(same_decision / n, 4) if n else None,
+        "hit_presence_agreement": round(same_presence / n, 4) if n else None,
+        "top1_agreement": round(top1_same / top1_total, 4) if top1_total else None,
+        "hit_jaccard_mean": round(statistics.mean(jaccards), 4) if jaccards else None,
+        "decision_changes": changed,
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--embedders", type=str, default="minilm,hashing",
+                    help="Comma-separated; el primero es la referencia.")
+    ap.add_argument("--logs-dir", type=str, default="data/logs_backend_a")
+    ap.add_argument("--gt-dir", type=str, default="data/ground_truth")
+    ap.add_argument("--backend", type=str, default="backend_a", choices=["backend_a", "backend_b"])
+    ap.add_argument("--episode-start", type=int, default=None)
+    ap.add_argument("--episode-end", type=int, default=None)
+    ap.add_argument("--train-logs-dir", type=str, default=None)
+    ap.add_argument("--train-gt-dir", type=str, default=None)
+    ap.add_argument("--keep-runs", action="store_true")
+    ap.add_argument("--out-json", type=str, default=None)
+    args = ap.parse_args()
+
+    embedders = [parse_embedder_spec(x.strip()) for x in args.embedders.split(",") if x.strip()]
+    if len(embedders) < 2:
+        ap.error("--embedders necesita al menos dos embedders")
+    if bool(args.train_logs_dir) != bool(args.train_gt_dir):
+        ap.error("--train-logs-dir y --train-gt-dir van juntos")
+    start, end = _episode_range(args.gt_dir, args.episode_start, args.episode_end)
+
+    runs: Dict[str, Dict[str, Any]] = {}
+    for embedder in embedders:
+        run_id = new_run_id(f"cmp_embed_{embedder.split(':', 1)[0]}")
+        paths = run_paths(run_id)
+        wall_s = 0.0
+        n_train = 0
+        if args.train_logs_dir:
+            t_start, t_end = _episode_range(args.train_gt_dir, None, None)
+            wall_s += _run_agent(
+                sys.executable,
+                run_id=run_id,
+                embedder=embedder,
+                logs_dir=args.train_logs_dir,
+                gt_dir=args.train_gt_dir,
+                backend=args.backend,
+                episode_start=t_start,
+                episode_end=t_end,
+            )
+            n_train = len(read_decisions(paths["decisions"]))
+        wall_s += _run_agent(
+            sys.executable,
+            run_id=run_id,
+            embedder=embedder,
+            logs_dir=args.logs_dir,
+            gt_dir=args.gt_dir,
+            backend=args.backend,
+            episode_start=start,
+            episode_end=end,
+        )
+        summary = _summarize_run(read_decisions(paths["decisions"])[n_train:], args.gt_dir)
+        summary["run_id"] = run_id
+        summary["wall_s"] = round(wall_s, 3)
+        runs[embedder] = summary
+        if not args.keep_runs:
+            shutil.rmtree(paths["base"], ignore_errors=True)
+
+    reference = embedders[0]
+    report: Dict[str, Any] = {
+        "dataset": {"logs_dir": args.logs_dir, "gt_dir": args.gt_dir, "episode_start": start, "episode_end": end},
+        "reference": reference,
+        "embedders": {
+            name: {k: v for k, v in run.items() if k != "episodes"} for name, run in runs.items()
+        },
+        "vs_reference": {
+            name: _compare(runs[reference]["episodes"], runs[name]["episodes"]) for name in embedders[1:]
+        },
+    }
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.out_json:
+        os.makedirs(os.path.dirname(args.out_json) or ".", exist_ok=True)
+        with open(args.out_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
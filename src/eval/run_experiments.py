@@ -6,11 +6,13 @@ import os
 import shutil
 import subprocess
 import sys
+import time
 from urllib import error as url_error
 from urllib import request
 from dataclasses import dataclass, asdict
-from typing import Dict, List
+from typing import Dict, List, Optional
 
+from src.blue.schema_mapper import DEFAULT_BREAKER_COOLDOWN_SEC, DEFAULT_BREAKER_THRESHOLD, DEFAULT_NEGATIVE_TTL_SEC
 from src.core.run_manager import prepare_run, run_paths
 from src.judge.judge_mtd_mttr import judge_mttd_mttr
 
@@ -28,6 +30,8 @@ class RepRecord:
     blue_schema_mapper: str
     schema_cache_scope: str
     schema_adapt_mode: str
+    schema_profile_mapper: bool
+    schema_similar_reuse: bool
     backend_b_alias_mode: str
     mcp_enabled: bool
     mcp_tool: str
@@ -55,6 +59,90 @@ def _run(cmd: List[str], *, cwd: str) -> None:
     subprocess.run(cmd, cwd=cwd, check=True)
 
 
+class _AgentWorkerClient:
+    """Cliente de src.blue.agent_worker: un solo proceso Blue reutilizado entre fases y repeticiones."""
+
+    def __init__(self, *, python_exe: str, cwd: str) -> None:
+        self._proc = subprocess.Popen(
+            [python_exe, "-m", "src.blue.agent_worker"],
+            cwd=cwd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            text=True,
+            encoding="utf-8",
+            bufsize=1,
+        )
+        self._next_id = 0
+
+    def _request(self, payload: Dict[str, object]) -> Dict[str, object]:
+        if self._proc.poll() is not None:
+            raise RuntimeError(f"agent_worker termino (exit={self._proc.returncode})")
+        self._next_id += 1
+        payload = {"id": self._next_id, **payload}
+        assert self._proc.stdin is not None and self._proc.stdout is not None
+        self._proc.stdin.write(json.dumps(payload, ensure_ascii=False) + "\n")
+        self._proc.stdin.flush()
+        while True:
+            line = self._proc.stdout.readline()
+            if not line:
+                raise RuntimeError(f"agent_worker cerro stdout (exit={self._proc.wait()})")
+            try:
+                resp = json.loads(line)
+            except ValueError:
+                resp = None
+            # Lineas sueltas que no son del protocolo o respuestas viejas: se saltean.
+            if isinstance(resp, dict) and resp.get("id") == self._next_id:
+                return resp
+            print(f"agent_worker: linea ignorada: {line.rstrip()[:200]}", file=sys.stderr)
+
+    def run(self, cmd: List[str]) -> Dict[str, object]:
+        # cmd viene de _build_blue_cmd: [python, -m, src.blue.run_blue_agent, *argv]
+        print("RUN (worker):", " ".join(cmd))
+        resp = self._request({"op": "run", "argv": cmd[3:]})
+        if not resp.get("ok"):
+            raise RuntimeError(f"agent_worker fallo: {resp.get('error')}")
+        return resp
+
+    def close(self) -> None:
+        if self._proc.poll() is None:
+            try:
+                self._request({"op": "shutdown"})
+            except Exception:
+                pass
+            try:
+                self._proc.wait(timeout=30)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+
+
+def _start_embed_server(*, python_exe: str, cwd: str, socket_path: str, timeout_sec: float = 300.0) -> Optional[subprocess.Popen]:
+    """
+    Levanta src.memory.embed_server si no hay uno vivo en socket_path. Devuelve el proceso
+    solo si lo levanto este driver (otro run_experiments en paralelo reusa el mismo).
+    """
+    from src.memory.embed_server import socket_alive
+
+    if socket_alive(socket_path):
+        print(f"EMBED_SERVER: reuse {socket_path}")
+        return None
+    proc = subprocess.Popen([python_exe, "-m", "src.memory.embed_server", "--socket", socket_path], cwd=cwd)
+    deadline = time.monotonic() + timeout_sec
+    while not socket_alive(socket_path):
+        if proc.poll() is not None or time.monotonic() > deadline:
+            proc.kill()
+            raise RuntimeError(f"embed_server no arranco en {socket_path}")
+        time.sleep(0.2)
+    print(f"EMBED_SERVER: started {socket_path} (pid={proc.pid})")
+    return proc
+
+
+def _run_blue(cmd: List[str], *, cwd: str, worker: Optional[_AgentWorkerClient]) -> None:
+    if worker is None:
+        _run(cmd, cwd=cwd)
+    else:
+        worker.run(cmd)
+
+
 def _ensure_dir(path: str) -> None:
     os.makedirs(path, exist_ok=True)
 
@@ -63,7 +151,7 @@ def _copy_memory_seed(seed_dir: str, dst_dir: str) -> None:
     if not seed_dir or not os.path.exists(seed_dir):
         return
     _ensure_dir(dst_dir)
-    for name in ("cases.jsonl", "index.faiss"):
+    for name in ("cases.jsonl", "index.faiss", "index.wal", "case_stats.json", "merged_keys.bin", "case_hwm.json"):
         src = os.path.join(seed_dir, name)
         if os.path.exists(src):
             shutil.copy2(src, os.path.join(dst_dir, name))
@@ -147,6 +235,8 @@ def _build_blue_cmd(
     schema_map_min_confidence: float,
     schema_cache_scope: str,
     schema_adapt_mode: str,
+    schema_profile_mapper: bool,
+    schema_similar_reuse: bool,
     backend_b_alias_mode: str,
     mcp_tool: str,
     llm_provider: str,
@@ -154,8 +244,14 @@ def _build_blue_cmd(
     ollama_url: str,
     ollama_model: str,
     llm_timeout_sec: float,
+    llm_breaker_threshold: int,
+    llm_breaker_cooldown_sec: float,
+    llm_negative_ttl_sec: float,
     delay: int,
     mcp_enabled: bool,
+    compact_evidence: bool = False,
+    memory_seed_dir: Optional[str] = None,
+    memory_embed_server: Optional[str] = None,
 ) -> List[str]:
     cmd = [
         python_exe,
@@ -195,12 +291,28 @@ def _build_blue_cmd(
         ollama_model,
         "--llm-timeout-sec",
         str(llm_timeout_sec),
+        "--schema-llm-breaker-threshold",
+        str(llm_breaker_threshold),
+        "--schema-llm-breaker-cooldown-sec",
+        str(llm_breaker_cooldown_sec),
+        "--schema-llm-negative-ttl-sec",
+        str(llm_negative_ttl_sec),
         "--delay",
         str(delay),
         "--non-interactive",
     ]
     if not bool(mcp_enabled):
         cmd.append("--no-mcp")
+    if not bool(schema_profile_mapper):
+        cmd.append("--no-schema-profile-mapper")
+    if not bool(schema_similar_reuse):
+        cmd.append("--no-schema-similar-reuse")
+    if bool(compact_evidence):
+        cmd.append("--compact-evidence")
+    if memory_seed_dir:
+        cmd.extend(["--memory-seed-dir", memory_seed_dir])
+    if memory_embed_server:
+        cmd.extend(["--memory-embed-server", memory_embed_server])
     return cmd
 
 
@@ -218,6 +330,7 @@ def main() -> None:
     ap.add_argument("--backend-b-drift-profile", type=str, default="classic", choices=["classic", "hard4"])
     ap.add_argument("--delay", type=int, default=30)
     ap.add_argument("--memory-seed-dir", default="data/memory")
+    ap.add_argument("--memory-seed-mode", type=str, default="overlay", choices=["overlay", "copy"])
     ap.add_argument("--out-dir", default="data/experiments")
     ap.add_argument("--blue-backend", type=str, default="backend_a", choices=["backend_a", "backend_b"])
     ap.add_argument("--swap-episode", type=int, default=0)
@@ -227,6 +340,10 @@ def main() -> None:
     ap.add_argument("--schema-map-min-confidence", type=float, default=0.75)
     ap.add_argument("--schema-cache-scope", type=str, default="run", choices=["run", "persistent"])
     ap.add_argument("--schema-adapt-mode", type=str, default="contract_first", choices=["contract_first", "llm_first"])
+    ap.add_argument("--schema-profile-mapper", dest="schema_profile_mapper", action="store_true")
+    ap.add_argument("--no-schema-profile-mapper", dest="schema_profile_mapper", action="store_false")
+    ap.add_argument("--schema-similar-reuse", dest="schema_similar_reuse", action="store_true")
+    ap.add_argument("--no-schema-similar-reuse", dest="schema_similar_reuse", action="store_false")
     ap.add_argument("--backend-b-alias-mode", type=str, default="full", choices=["full", "minimal"])
     ap.add_argument("--mcp-enabled", dest="mcp_enabled", action="store_true")
     ap.add_argument("--no-mcp", dest="mcp_enabled", action="store_false")
@@ -236,9 +353,25 @@ def main() -> None:
     ap.add_argument("--ollama-url", type=str, default="http://127.0.0.1:11434")
     ap.add_argument("--ollama-model", type=str, default="qwen3:8b")
     ap.add_argument("--llm-timeout-sec", type=float, default=8.0)
+    ap.add_argument("--llm-breaker-threshold", type=int, default=DEFAULT_BREAKER_THRESHOLD)
+    ap.add_argument("--llm-breaker-cooldown-sec", type=float, default=DEFAULT_BREAKER_COOLDOWN_SEC)
+    ap.add_argument("--llm-negative-ttl-sec", type=float, default=DEFAULT_NEGATIVE_TTL_SEC)
     ap.add_argument("--llm-prewarm", dest="llm_prewarm", action="store_true")
     ap.add_argument("--no-llm-prewarm", dest="llm_prewarm", action="store_false")
+    ap.add_argument("--agent-worker", dest="agent_worker", action="store_true")
+    ap.add_argument("--no-agent-worker", dest="agent_worker", action="store_false")
     ap.set_defaults(mcp_enabled=True)
+    ap.set_defaults(schema_profile_mapper=True)
+    ap.set_defaults(schema_similar_reuse=True)
+    ap.add_argument("--compact-evidence", dest="compact_evidence", action="store_true")
+    ap.add_argument("--no-compact-evidence", dest="compact_evidence", action="store_false")
+    # Un solo modelo de embeddings para todos los procesos del Blue Agent (src.memory.embed_server).
+    ap.add_argument("--embed-server", dest="embed_server", action="store_true")
+    ap.add_argument("--no-embed-server", dest="embed_server", action="store_false")
+    ap.add_argument("--embed-server-socket", type=str, default=None, help="Default: <tmp>/cyber_range_embed.sock.")
+    ap.set_defaults(agent_worker=False)
+    ap.set_defaults(embed_server=False)
+    ap.set_defaults(compact_evidence=False)
     ap.set_defaults(llm_prewarm=True)
     args = ap.parse_args()
     swap_enabled = int(args.swap_episode) > 0
@@ -265,6 +398,7 @@ def main() -> None:
         "backend_b_drift_profile": args.backend_b_drift_profile,
         "delay": args.delay,
         "memory_seed_dir": args.memory_seed_dir,
+        "memory_seed_mode": args.memory_seed_mode,
         "blue_backend": args.blue_backend,
         "swap_enabled": swap_enabled,
         "swap_episode": args.swap_episode,
@@ -274,6 +408,8 @@ def main() -> None:
         "schema_map_min_confidence": args.schema_map_min_confidence,
         "schema_cache_scope": args.schema_cache_scope,
         "schema_adapt_mode": args.schema_adapt_mode,
+        "schema_profile_mapper": args.schema_profile_mapper,
+        "schema_similar_reuse": args.schema_similar_reuse,
         "backend_b_alias_mode": args.backend_b_alias_mode,
         "mcp_enabled": args.mcp_enabled,
         "mcp_tool": args.mcp_tool,
@@ -282,7 +418,13 @@ def main() -> None:
         "ollama_url": args.ollama_url,
         "ollama_model": args.ollama_model,
         "llm_timeout_sec": args.llm_timeout_sec,
+        "llm_breaker_threshold": args.llm_breaker_threshold,
+        "llm_breaker_cooldown_sec": args.llm_breaker_cooldown_sec,
+        "llm_negative_ttl_sec": args.llm_negative_ttl_sec,
         "llm_prewarm": args.llm_prewarm,
+        "agent_worker": args.agent_worker,
+        "compact_evidence": args.compact_evidence,
+        "embed_server": args.embed_server,
         "repetitions_data": [],
     }
 
@@ -292,236 +434,297 @@ def main() -> None:
         print(f"OLLAMA_PREWARM: {'ok' if ok else 'failed'}")
 
     records: List[RepRecord] = []
-    for rep in range(args.repetitions):
-        seed = args.base_seed + (rep * args.seed_step)
-        rep_name = f"rep_{rep + 1:02d}"
-        rep_dir = os.path.join(experiment_dir, rep_name)
-        dataset_dir = os.path.join(rep_dir, "dataset")
-        logs_dir_a = os.path.join(dataset_dir, "logs_backend_a")
-        logs_dir_b = os.path.join(dataset_dir, "logs_backend_b")
-        baseline_logs_dir = logs_dir_a
-        blue_logs_dir = logs_dir_b if args.blue_backend == "backend_b" else logs_dir_a
-        gt_dir = os.path.join(dataset_dir, "ground_truth")
-        baseline_dir = os.path.join(rep_dir, "baseline")
-        blue_run_id = f"blue_mem_{experiment_id}_{rep_name}"
-        blue_dir = run_paths(blue_run_id)["base"]
-
-        _ensure_dir(rep_dir)
-        _ensure_dir(baseline_dir)
-
-        _run(
-            [
-                python_exe,
-                "src/generate_episodes.py",
-                "--out",
-                dataset_dir,
-                "--episodes",
-                str(args.episodes),
-                "--base-seed",
-                str(seed),
-                "--noise-per-episode",
-                str(args.noise_per_episode),
-                "--benign-rate",
-                str(args.benign_rate),
-                "--recurrent-benign-rate",
-                str(args.recurrent_benign_rate),
-                "--recurrent-benign-profiles",
-                str(args.recurrent_benign_profiles),
-                "--backend-b-drift-profile",
-                str(args.backend_b_drift_profile),
-            ],
-            cwd=repo_root,
-        )
-
-        baseline_decisions = os.path.join(baseline_dir, "decisions.jsonl")
-        baseline_actions = os.path.join(baseline_dir, "enforcement_actions.jsonl")
-        baseline_phase2 = os.path.join(baseline_dir, "results_phase2.csv")
-        baseline_confusion_containment = os.path.join(baseline_dir, "results_confusion_containment.csv")
-        baseline_confusion_detection = os.path.join(baseline_dir, "results_confusion_detection.csv")
-
-        _run(
-            [
-                python_exe,
-                "-m",
-                "src.run_phase_2_baseline",
-                "--logs-dir",
-                baseline_logs_dir,
-                "--gt-dir",
-                gt_dir,
-                "--decisions-path",
-                baseline_decisions,
-                "--actions-path",
-                baseline_actions,
-                "--out-csv",
-                baseline_phase2,
-            ],
-            cwd=repo_root,
-        )
-        _run_confusion(
-            python_exe=python_exe,
-            cwd=repo_root,
-            gt_dir=gt_dir,
-            decisions_path=baseline_decisions,
-            out_csv=baseline_confusion_containment,
-            positive_decisions="block_ip",
-        )
-        _run_confusion(
-            python_exe=python_exe,
-            cwd=repo_root,
-            gt_dir=gt_dir,
-            decisions_path=baseline_decisions,
-            out_csv=baseline_confusion_detection,
-            positive_decisions="block_ip,escalate",
-        )
+    embed_socket: Optional[str] = None
+    if args.embed_server:
+        # diferido: embed_server usa Unix sockets, que no existen en Windows
+        from src.memory import embed_server
 
-        blue_paths = prepare_run(blue_run_id, clean=True, meta={"component": "blue_agent", "experiment_id": experiment_id})
-        blue_memory_dir = os.path.join(blue_paths["base"], "memory")
-        resolved_memory_seed_dir = _resolve_memory_seed_dir(args.memory_seed_dir, rep_name)
-        _copy_memory_seed(resolved_memory_seed_dir, blue_memory_dir)
-
-        if swap_enabled:
-            phase1_end = int(args.swap_episode)
-            phase2_start = phase1_end + 1
-            phase1_backend = args.swap_phase1_backend
-            phase2_backend = args.swap_phase2_backend
+        if embed_server.HAS_UNIX_SOCKETS:
+            embed_socket = args.embed_server_socket or embed_server.DEFAULT_SOCKET_PATH
+        else:
+            print("EMBED_SERVER: sin Unix sockets en esta plataforma; embeddings en proceso")
+            manifest["embed_server"] = False
+    # Con --agent-worker los runs Blue comparten un proceso (modelo, FAISS y mappers quedan cargados).
+    blue_worker: Optional[_AgentWorkerClient] = None
+    embed_server_proc: Optional[subprocess.Popen] = None
+    try:
+        blue_worker = _AgentWorkerClient(python_exe=python_exe, cwd=repo_root) if args.agent_worker else None
+        if embed_socket:
+            embed_server_proc = _start_embed_server(python_exe=python_exe, cwd=repo_root, socket_path=embed_socket)
+        for rep in range(args.repetitions):
+            seed = args.base_seed + (rep * args.seed_step)
+            rep_name = f"rep_{rep + 1:02d}"
+            rep_dir = os.path.join(experiment_dir, rep_name)
+            dataset_dir = os.path.join(rep_dir, "dataset")
+            logs_dir_a = os.path.join(dataset_dir, "logs_backend_a")
+            logs_dir_b = os.path.join(dataset_dir, "logs_backend_b")
+            baseline_logs_dir = logs_dir_a
+            blue_logs_dir = logs_dir_b if args.blue_backend == "backend_b" else logs_dir_a
+            gt_dir = os.path.join(dataset_dir, "ground_truth")
+            baseline_dir = os.path.join(rep_dir, "baseline")
+            blue_run_id = f"blue_mem_{experiment_id}_{rep_name}"
+            blue_dir = run_paths(blue_run_id)["base"]
+
+            _ensure_dir(rep_dir)
+            _ensure_dir(baseline_dir)
+
+            _run(
+                [
+                    python_exe,
+                    "src/generate_episodes.py",
+                    "--out",
+                    dataset_dir,
+                    "--episodes",
+                    str(args.episodes),
+                    "--base-seed",
+                    str(seed),
+                    "--noise-per-episode",
+                    str(args.noise_per_episode),
+                    "--benign-rate",
+                    str(args.benign_rate),
+                    "--recurrent-benign-rate",
+                    str(args.recurrent_benign_rate),
+                    "--recurrent-benign-profiles",
+                    str(args.recurrent_benign_profiles),
+                    "--backend-b-drift-profile",
+                    str(args.backend_b_drift_profile),
+                ],
+                cwd=repo_root,
+            )
 
-            phase1_cmd = _build_blue_cmd(
+            baseline_decisions = os.path.join(baseline_dir, "decisions.jsonl")
+            baseline_actions = os.path.join(baseline_dir, "enforcement_actions.jsonl")
+            baseline_phase2 = os.path.join(baseline_dir, "results_phase2.csv")
+            baseline_confusion_containment = os.path.join(baseline_dir, "results_confusion_containment.csv")
+            baseline_confusion_detection = os.path.join(baseline_dir, "results_confusion_detection.csv")
+
+            _run(
+                [
+                    python_exe,
+                    "-m",
+                    "src.run_phase_2_baseline",
+                    "--logs-dir",
+                    baseline_logs_dir,
+                    "--gt-dir",
+                    gt_dir,
+                    "--decisions-path",
+                    baseline_decisions,
+                    "--actions-path",
+                    baseline_actions,
+                    "--out-csv",
+                    baseline_phase2,
+                ],
+                cwd=repo_root,
+            )
+            _run_confusion(
                 python_exe=python_exe,
-                run_id=blue_run_id,
-                logs_dir=_blue_logs_dir_for_backend(dataset_dir=dataset_dir, backend=phase1_backend),
-                backend=phase1_backend,
+                cwd=repo_root,
                 gt_dir=gt_dir,
-                episode_start=1,
-                episode_end=phase1_end,
-                schema_mapper_mode=args.blue_schema_mapper,
-                schema_map_min_confidence=args.schema_map_min_confidence,
-                schema_cache_scope=args.schema_cache_scope,
-                schema_adapt_mode=args.schema_adapt_mode,
-                backend_b_alias_mode=args.backend_b_alias_mode,
-                mcp_tool=args.mcp_tool,
-                llm_provider=args.llm_provider,
-                gemini_model=args.gemini_model,
-                ollama_url=args.ollama_url,
-                ollama_model=args.ollama_model,
-                llm_timeout_sec=args.llm_timeout_sec,
-                delay=args.delay,
-                mcp_enabled=bool(args.mcp_enabled),
+                decisions_path=baseline_decisions,
+                out_csv=baseline_confusion_containment,
+                positive_decisions="block_ip",
             )
-            _run(phase1_cmd, cwd=repo_root)
-
-            phase2_cmd = _build_blue_cmd(
+            _run_confusion(
                 python_exe=python_exe,
-                run_id=blue_run_id,
-                logs_dir=_blue_logs_dir_for_backend(dataset_dir=dataset_dir, backend=phase2_backend),
-                backend=phase2_backend,
+                cwd=repo_root,
                 gt_dir=gt_dir,
-                episode_start=phase2_start,
-                episode_end=int(args.episodes),
-                schema_mapper_mode=args.blue_schema_mapper,
-                schema_map_min_confidence=args.schema_map_min_confidence,
-                schema_cache_scope=args.schema_cache_scope,
-                schema_adapt_mode=args.schema_adapt_mode,
-                backend_b_alias_mode=args.backend_b_alias_mode,
-                mcp_tool=args.mcp_tool,
-                llm_provider=args.llm_provider,
-                gemini_model=args.gemini_model,
-                ollama_url=args.ollama_url,
-                ollama_model=args.ollama_model,
-                llm_timeout_sec=args.llm_timeout_sec,
-                delay=args.delay,
-                mcp_enabled=bool(args.mcp_enabled),
+                decisions_path=baseline_decisions,
+                out_csv=baseline_confusion_detection,
+                positive_decisions="block_ip,escalate",
             )
-            _run(phase2_cmd, cwd=repo_root)
 
-            blue_backend_str = f"{phase1_backend}->{phase2_backend}"
-            blue_logs_dir = f"{_blue_logs_dir_for_backend(dataset_dir=dataset_dir, backend=phase1_backend)} -> {_blue_logs_dir_for_backend(dataset_dir=dataset_dir, backend=phase2_backend)}"
-        else:
-            blue_cmd = _build_blue_cmd(
+            blue_paths = prepare_run(blue_run_id, clean=True, meta={"component": "blue_agent", "experiment_id": experiment_id})
+            blue_memory_dir = os.path.join(blue_paths["base"], "memory")
+            resolved_memory_seed_dir = _resolve_memory_seed_dir(args.memory_seed_dir, rep_name)
+            # overlay: la semilla se abre read-only desde cada run (sin copiar index.faiss por repeticion).
+            overlay_seed_dir: Optional[str] = None
+            if args.memory_seed_mode == "copy":
+                _copy_memory_seed(resolved_memory_seed_dir, blue_memory_dir)
+            elif resolved_memory_seed_dir and os.path.isdir(resolved_memory_seed_dir):
+                overlay_seed_dir = os.path.abspath(resolved_memory_seed_dir)
+
+            if swap_enabled:
+                phase1_end = int(args.swap_episode)
+                phase2_start = phase1_end + 1
+                phase1_backend = args.swap_phase1_backend
+                phase2_backend = args.swap_phase2_backend
+
+                phase1_cmd = _build_blue_cmd(
+                    python_exe=python_exe,
+                    run_id=blue_run_id,
+                    logs_dir=_blue_logs_dir_for_backend(dataset_dir=dataset_dir, backend=phase1_backend),
+                    backend=phase1_backend,
+                    gt_dir=gt_dir,
+                    episode_start=1,
+                    episode_end=phase1_end,
+                    schema_mapper_mode=args.blue_schema_mapper,
+                    schema_map_min_confidence=args.schema_map_min_confidence,
+                    schema_cache_scope=args.schema_cache_scope,
+                    schema_adapt_mode=args.schema_adapt_mode,
+                    schema_profile_mapper=bool(args.schema_profile_mapper),
+                    schema_similar_reuse=bool(args.schema_similar_reuse),
+                    backend_b_alias_mode=args.backend_b_alias_mode,
+                    mcp_tool=args.mcp_tool,
+                    llm_provider=args.llm_provider,
+                    gemini_model=args.gemini_model,
+                    ollama_url=args.ollama_url,
+                    ollama_model=args.ollama_model,
+                    llm_timeout_sec=args.llm_timeout_sec,
+                    llm_breaker_threshold=args.llm_breaker_threshold,
+                    llm_breaker_cooldown_sec=args.llm_breaker_cooldown_sec,
+                    llm_negative_ttl_sec=args.llm_negative_ttl_sec,
+                    delay=args.delay,
+                    mcp_enabled=bool(args.mcp_enabled),
+                    compact_evidence=bool(args.compact_evidence),
+                    memory_seed_dir=overlay_seed_dir,
+                    memory_embed_server=embed_socket,
+                )
+                _run_blue(phase1_cmd, cwd=repo_root, worker=blue_worker)
+
+                phase2_cmd = _build_blue_cmd(
+                    python_exe=python_exe,
+                    run_id=blue_run_id,
+                    logs_dir=_blue_logs_dir_for_backend(dataset_dir=dataset_dir, backend=phase2_backend),
+                    backend=phase2_backend,
+                    gt_dir=gt_dir,
+                    episode_start=phase2_start,
+                    episode_end=int(args.episodes),
+                    schema_mapper_mode=args.blue_schema_mapper,
+                    schema_map_min_confidence=args.schema_map_min_confidence,
+                    schema_cache_scope=args.schema_cache_scope,
+                    schema_adapt_mode=args.schema_adapt_mode,
+                    schema_profile_mapper=bool(args.schema_profile_mapper),
+                    schema_similar_reuse=bool(args.schema_similar_reuse),
+                    backend_b_alias_mode=args.backend_b_alias_mode,
+                    mcp_tool=args.mcp_tool,
+                    llm_provider=args.llm_provider,
+                    gemini_model=args.gemini_model,
+                    ollama_url=args.ollama_url,
+                    ollama_model=args.ollama_model,
+                    llm_timeout_sec=args.llm_timeout_sec,
+                    llm_breaker_threshold=args.llm_breaker_threshold,
+                    llm_breaker_cooldown_sec=args.llm_breaker_cooldown_sec,
+                    llm_negative_ttl_sec=args.llm_negative_ttl_sec,
+                    delay=args.delay,
+                    mcp_enabled=bool(args.mcp_enabled),
+                    compact_evidence=bool(args.compact_evidence),
+                    memory_seed_dir=overlay_seed_dir,
+                    memory_embed_server=embed_socket,
+                )
+                _run_blue(phase2_cmd, cwd=repo_root, worker=blue_worker)
+
+                blue_backend_str = f"{phase1_backend}->{phase2_backend}"
+                blue_logs_dir = f"{_blue_logs_dir_for_backend(dataset_dir=dataset_dir, backend=phase1_backend)} -> {_blue_logs_dir_for_backend(dataset_dir=dataset_dir, backend=phase2_backend)}"
+            else:
+                blue_cmd = _build_blue_cmd(
+                    python_exe=python_exe,
+                    run_id=blue_run_id,
+                    logs_dir=blue_logs_dir,
+                    backend=args.blue_backend,
+                    gt_dir=gt_dir,
+                    episode_start=1,
+                    episode_end=int(args.episodes),
+                    schema_mapper_mode=args.blue_schema_mapper,
+                    schema_map_min_confidence=args.schema_map_min_confidence,
+                    schema_cache_scope=args.schema_cache_scope,
+                    schema_adapt_mode=args.schema_adapt_mode,
+                    schema_profile_mapper=bool(args.schema_profile_mapper),
+                    schema_similar_reuse=bool(args.schema_similar_reuse),
+                    backend_b_alias_mode=args.backend_b_alias_mode,
+                    mcp_tool=args.mcp_tool,
+                    llm_provider=args.llm_provider,
+                    gemini_model=args.gemini_model,
+                    ollama_url=args.ollama_url,
+                    ollama_model=args.ollama_model,
+                    llm_timeout_sec=args.llm_timeout_sec,
+                    llm_breaker_threshold=args.llm_breaker_threshold,
+                    llm_breaker_cooldown_sec=args.llm_breaker_cooldown_sec,
+                    llm_negative_ttl_sec=args.llm_negative_ttl_sec,
+                    delay=args.delay,
+                    mcp_enabled=bool(args.mcp_enabled),
+                    compact_evidence=bool(args.compact_evidence),
+                    memory_seed_dir=overlay_seed_dir,
+                    memory_embed_server=embed_socket,
+                )
+                _run_blue(blue_cmd, cwd=repo_root, worker=blue_worker)
+                blue_backend_str = args.blue_backend
+
+            blue_phase2 = os.path.join(blue_dir, "results_phase2.csv")
+            blue_confusion_containment = os.path.join(blue_dir, "results_confusion_containment.csv")
+            blue_confusion_detection = os.path.join(blue_dir, "results_confusion_detection.csv")
+
+            judge_mttd_mttr(
+                gt_dir=gt_dir,
+                decisions_path=blue_paths["decisions"],
+                actions_path=blue_paths["actions"],
+                out_csv=blue_phase2,
+            )
+            _run_confusion(
+                python_exe=python_exe,
+                cwd=repo_root,
+                gt_dir=gt_dir,
+                decisions_path=blue_paths["decisions"],
+                out_csv=blue_confusion_containment,
+                positive_decisions="block_ip",
+            )
+            _run_confusion(
                 python_exe=python_exe,
-                run_id=blue_run_id,
-                logs_dir=blue_logs_dir,
-                backend=args.blue_backend,
+                cwd=repo_root,
                 gt_dir=gt_dir,
-                episode_start=1,
-                episode_end=int(args.episodes),
-                schema_mapper_mode=args.blue_schema_mapper,
-                schema_map_min_confidence=args.schema_map_min_confidence,
+                decisions_path=blue_paths["decisions"],
+                out_csv=blue_confusion_detection,
+                positive_decisions="block_ip,escalate",
+            )
+
+            record = RepRecord(
+                repetition=rep + 1,
+                seed=seed,
+                memory_seed_dir_resolved=resolved_memory_seed_dir,
+                dataset_dir=dataset_dir,
+                logs_dir=baseline_logs_dir,
+                baseline_logs_dir=baseline_logs_dir,
+                blue_logs_dir=blue_logs_dir,
+                blue_backend=blue_backend_str,
+                blue_schema_mapper=args.blue_schema_mapper,
                 schema_cache_scope=args.schema_cache_scope,
                 schema_adapt_mode=args.schema_adapt_mode,
+                schema_profile_mapper=bool(args.schema_profile_mapper),
+                schema_similar_reuse=bool(args.schema_similar_reuse),
                 backend_b_alias_mode=args.backend_b_alias_mode,
+                mcp_enabled=bool(args.mcp_enabled),
                 mcp_tool=args.mcp_tool,
                 llm_provider=args.llm_provider,
-                gemini_model=args.gemini_model,
-                ollama_url=args.ollama_url,
                 ollama_model=args.ollama_model,
-                llm_timeout_sec=args.llm_timeout_sec,
-                delay=args.delay,
-                mcp_enabled=bool(args.mcp_enabled),
+                backend_b_drift_profile=args.backend_b_drift_profile,
+                gt_dir=gt_dir,
+                baseline_dir=baseline_dir,
+                baseline_confusion_containment=baseline_confusion_containment,
+                baseline_confusion_detection=baseline_confusion_detection,
+                baseline_phase2=baseline_phase2,
+                blue_run_id=blue_run_id,
+                blue_dir=blue_dir,
+                blue_confusion_containment=blue_confusion_containment,
+                blue_confusion_detection=blue_confusion_detection,
+                blue_phase2=blue_phase2,
+                blue_swap_enabled=swap_enabled,
+                blue_swap_episode=int(args.swap_episode) if swap_enabled else 0,
+                blue_phase1_backend=args.swap_phase1_backend if swap_enabled else args.blue_backend,
+                blue_phase2_backend=args.swap_phase2_backend if swap_enabled else "",
             )
-            _run(blue_cmd, cwd=repo_root)
-            blue_backend_str = args.blue_backend
-
-        blue_phase2 = os.path.join(blue_dir, "results_phase2.csv")
-        blue_confusion_containment = os.path.join(blue_dir, "results_confusion_containment.csv")
-        blue_confusion_detection = os.path.join(blue_dir, "results_confusion_detection.csv")
-
-        judge_mttd_mttr(
-            gt_dir=gt_dir,
-            decisions_path=blue_paths["decisions"],
-            actions_path=blue_paths["actions"],
-            out_csv=blue_phase2,
-        )
-        _run_confusion(
-            python_exe=python_exe,
-            cwd=repo_root,
-            gt_dir=gt_dir,
-            decisions_path=blue_paths["decisions"],
-            out_csv=blue_confusion_containment,
-            positive_decisions="block_ip",
-        )
-        _run_confusion(
-            python_exe=python_exe,
-            cwd=repo_root,
-            gt_dir=gt_dir,
-            decisions_path=blue_paths["decisions"],
-            out_csv=blue_confusion_detection,
-            positive_decisions="block_ip,escalate",
-        )
-
-        record = RepRecord(
-            repetition=rep + 1,
-            seed=seed,
-            memory_seed_dir_resolved=resolved_memory_seed_dir,
-            dataset_dir=dataset_dir,
-            logs_dir=baseline_logs_dir,
-            baseline_logs_dir=baseline_logs_dir,
-            blue_logs_dir=blue_logs_dir,
-            blue_backend=blue_backend_str,
-            blue_schema_mapper=args.blue_schema_mapper,
-            schema_cache_scope=args.schema_cache_scope,
-            schema_adapt_mode=args.schema_adapt_mode,
-            backend_b_alias_mode=args.backend_b_alias_mode,
-            mcp_enabled=bool(args.mcp_enabled),
-            mcp_tool=args.mcp_tool,
-            llm_provider=args.llm_provider,
-            ollama_model=args.ollama_model,
-            backend_b_drift_profile=args.backend_b_drift_profile,
-            gt_dir=gt_dir,
-            baseline_dir=baseline_dir,
-            baseline_confusion_containment=baseline_confusion_containment,
-            baseline_confusion_detection=baseline_confusion_detection,
-            baseline_phase2=baseline_phase2,
-            blue_run_id=blue_run_id,
-            blue_dir=blue_dir,
-            blue_confusion_containment=blue_confusion_containment,
-            blue_confusion_detection=blue_confusion_detection,
-            blue_phase2=blue_phase2,
-            blue_swap_enabled=swap_enabled,
-            blue_swap_episode=int(args.swap_episode) if swap_enabled else 0,
-            blue_phase1_backend=args.swap_phase1_backend if swap_enabled else args.blue_backend,
-            blue_phase2_backend=args.swap_phase2_backend if swap_enabled else "",
-        )
-        records.append(record)
+            records.append(record)
+    finally:
+        # Tambien si una repeticion falla: ni el worker ni el servidor (con el modelo en RAM) quedan
+        # vivos para que el proximo driver los reuse. Si el driver muere, el worker ve EOF y termina.
+        if blue_worker is not None:
+            blue_worker.close()
+        if embed_socket and embed_server.socket_alive(embed_socket):
+            try:
+                manifest["embed_server_stats"] = embed_server.request_stats(embed_socket)
+            except (OSError, ValueError):
+                pass
+        if embed_server_proc is not None:
+            embed_server_proc.terminate()
+            embed_server_proc.wait(timeout=30)
 
     manifest["repetitions_data"] = [asdict(r) for r in records]
     manifest_path = os.path.join(experiment_dir, "manifest.json")
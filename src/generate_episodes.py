@@ -10,6 +10,7 @@ from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional, Tuple
 
 from core.config import ASSETS, USERS
+from core.ground_truth import write_ground_truth_index
 from core.models import Event, GroundTruth
 from core.scenarios import SCENARIOS
 
@@ -527,6 +528,7 @@ def main() -> None:
     base_start = datetime(2026, 2, 19, 10, 0, 0, tzinfo=timezone.utc)
 
     drift_map: Dict[str, str] = {}
+    gt_index: Dict[int, Dict[str, Any]] = {}
     recurrent_benign_counter = 0
     profile_count = max(1, min(int(args.recurrent_benign_profiles), len(RECURRENT_BENIGN_PROFILES)))
 
@@ -610,9 +612,14 @@ def main() -> None:
         gt_payload["benign_pattern_profile"] = recurrent_profile["name"] if recurrent_profile else None
         with open(gt_path, "w", encoding="utf-8") as f:
             json.dump(gt_payload, f, ensure_ascii=False, indent=2)
+        gt_index[ep] = gt_payload
 
         print(f"[OK] episodio {ep:03d} -> {log_path} | {log_backend_b_path} | {gt_path}")
 
+    # Indice consolidado: los lectores cargan un solo archivo por dataset.
+    gt_index_path = write_ground_truth_index(gt_dir, gt_index)
+    print(f"[OK] ground truth index -> {gt_index_path}")
+
     drift_map_path = os.path.join(args.out, "backend_b_drift_map.json")
     with open(drift_map_path, "w", encoding="utf-8") as f:
         json.dump(
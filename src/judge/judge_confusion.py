@@ -3,55 +3,20 @@ from __future__ import annotations
 import argparse
 import csv
 import glob
-import json
 import os
 from dataclasses import dataclass
 from typing import Any, Dict, Iterable, List, Optional, Tuple
 
-
-def _read_jsonl(path: str) -> List[Dict[str, Any]]:
-    if not os.path.exists(path):
-        return []
-    out: List[Dict[str, Any]] = []
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if line:
-                out.append(json.loads(line))
-    return out
+from src.core.evidence_store import read_decisions
+from src.core.ground_truth import is_attack, list_ground_truth_episode_ids, load_ground_truth
 
 
 def _load_gt(gt_dir: str, episode_id: int) -> Optional[Dict[str, Any]]:
-    candidates = [
-        os.path.join(gt_dir, f"episode_{episode_id:03d}.json"),
-        os.path.join(gt_dir, f"episode_{episode_id}.json"),
-    ]
-    for c in candidates:
-        if os.path.exists(c):
-            with open(c, "r", encoding="utf-8") as f:
-                return json.load(f)
-    return None
+    return load_ground_truth(gt_dir, episode_id)
 
 
 def _list_gt_episode_ids(gt_dir: str) -> List[int]:
-    ids: List[int] = []
-    if not os.path.exists(gt_dir):
-        return ids
-    for name in os.listdir(gt_dir):
-        if name.startswith("episode_") and name.endswith(".json"):
-            stem = name[len("episode_"):-len(".json")]
-            if stem.isdigit():
-                ids.append(int(stem))
-    return sorted(set(ids))
-
-
-def _is_attack(gt: Optional[Dict[str, Any]]) -> Optional[bool]:
-    if gt is None:
-        return None
-    if "attack_present" in gt:
-        return bool(gt["attack_present"])
-    # compat: si no existe el campo, asumimos que si hay scenario/techniques hay ataque
-    return (gt.get("scenario_name") not in (None, "", "benign")) and bool(gt.get("technique_ids"))
+    return list_ground_truth_episode_ids(gt_dir)
 
 
 def _decision_positive(decision: str, positive_decisions: List[str]) -> bool:
@@ -107,7 +72,7 @@ def main() -> None:
 
     positive_decisions = [x.strip() for x in args.positive_decisions.split(",") if x.strip()]
 
-    decisions = _read_jsonl(args.decisions)
+    decisions = read_decisions(args.decisions)
     by_ep = _latest_by_episode(decisions)
 
     os.makedirs(os.path.dirname(args.out_csv), exist_ok=True)
@@ -121,7 +86,7 @@ def main() -> None:
     for ep in episode_ids:
         d = by_ep.get(ep, {})
         gt = _load_gt(args.gt_dir, ep)
-        attack = _is_attack(gt)
+        attack = is_attack(gt)
         decision = d.get("decision") or "missing"
         pred_pos = _decision_positive(decision, positive_decisions)
 
@@ -3,6 +3,8 @@ import csv, glob, json, os
 from datetime import datetime, timezone
 from typing import Any, Dict, Optional, List
 
+from src.core.ground_truth import load_ground_truth
+
 def _parse_iso_z(ts: str) -> datetime:
     if ts.endswith("Z"):
         ts = ts[:-1] + "+00:00"
@@ -29,16 +31,8 @@ def _read_jsonl(path: str) -> List[Dict[str, Any]]:
     return out
 
 def _load_ground_truth(gt_dir: str, episode_id: int) -> Optional[Dict[str, Any]]:
-    # soporta varios nombres
-    candidates = [
-        os.path.join(gt_dir, f"episode_{episode_id:03d}.json"),
-        os.path.join(gt_dir, f"episode_{episode_id}.json"),
-    ]
-    for c in candidates:
-        if os.path.exists(c):
-            with open(c, "r", encoding="utf-8") as f:
-                return json.load(f)
-    return None
+    # indice del dataset (cacheado por proceso); soporta episode_001.json / episode_1.json
+    return load_ground_truth(gt_dir, episode_id)
 
 def _get_injection_start(gt: Dict[str, Any]) -> Optional[str]:
     # Si el episodio es benigno, no tiene sentido medir MTTD/MTTR contra inyeccion.
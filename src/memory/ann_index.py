@@ -0,0 +1,128 @@
+"""
+Backends de indice para FaissMemory: flat exacto (IndexFlatIP) y ANN (HNSW, IVF-Flat, IVF-PQ).
+
+La memoria arranca en flat y se promueve al backend ANN cuando supera ann_threshold
+casos. faiss se importa dentro de las funciones: run_blue_agent lee INDEX_TYPES para
+sus flags sin cargar faiss (con --no-memory no se carga nunca).
+"""
+from __future__ import annotations
+
+from typing import Any, Optional
+
+import numpy as np
+
+from src.core.profiler import get_profiler
+
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+DEFAULT_ANN_THRESHOLD = 50_000
+# Almacenamiento de los vectores en flat/hnsw/ivf_flat (ivf_pq ya comprime con PQ).
+STORAGE_TYPES = ("float32", "fp16", "sq8")
+_SQ_FACTORY = {"fp16": "SQfp16", "sq8": "SQ8"}
+
+
+def index_kind(index: Any) -> str:
+    import faiss
+
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def index_storage(index: Any) -> str:
+    import faiss
+
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "pq"
+    base = faiss.downcast_index(index.storage) if isinstance(index, faiss.IndexHNSW) else index
+    sq = getattr(base, "sq", None)
+    if sq is None:
+        return "float32"
+    return {faiss.ScalarQuantizer.QT_fp16: "fp16", faiss.ScalarQuantizer.QT_8bit: "sq8"}.get(sq.qtype, "float32")
+
+
+def storage_matches(index: Any, storage: str) -> bool:
+    return index_kind(index) == "ivf_pq" or index_storage(index) == storage
+
+
+def ivf_nlist_for(n: int) -> int:
+    return int(min(65536, max(16, 4 * int(np.sqrt(max(1, n))))))
+
+
+def ivf_min_train(kind: str, nlist: int) -> int:
+    # faiss pide ~39 puntos por centroide (IVF y codebooks PQ de 8 bits)
+    return 39 * (max(nlist, 256) if kind == "ivf_pq" else nlist)
+
+
+def resolve_index_kind(index_type: str, n: int, ann_threshold: int) -> str:
+    """Flat hasta ann_threshold casos; despues el backend ANN pedido (IVF solo si alcanza para entrenar)."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"index_type invalido: {index_type} (usa {', '.join(INDEX_TYPES)})")
+    if index_type == "flat" or n < max(1, int(ann_threshold)):
+        return "flat"
+    if index_type in ("ivf_flat", "ivf_pq") and n < ivf_min_train(index_type, ivf_nlist_for(n)):
+        return "flat"
+    return index_type
+
+
+def build_index(
+    kind: str,
+    dim: int,
+    vectors: np.ndarray,
+    *,
+    storage: str = "float32",
+    hnsw_m: int = 32,
+    pq_m: Optional[int] = None,
+    seed: int = 1337,
+) -> Any:
+    """Crea el indice de `kind` (metrica inner product), entrena si hace falta y agrega vectors."""
+    import faiss
+
+    if storage not in STORAGE_TYPES:
+        raise ValueError(f"storage invalido: {storage} (usa {', '.join(STORAGE_TYPES)})")
+    vectors = np.ascontiguousarray(vectors, dtype="float32")
+    n = len(vectors)
+    sq = _SQ_FACTORY.get(storage)
+    if kind in ("flat", "hnsw"):
+        if kind == "flat":
+            index = faiss.IndexFlatIP(dim) if sq is None else faiss.index_factory(dim, sq, faiss.METRIC_INNER_PRODUCT)
+        else:
+            spec = f"HNSW{int(hnsw_m)}" + ("" if sq is None else f",{sq}")
+            index = faiss.index_factory(dim, spec, faiss.METRIC_INNER_PRODUCT)
+            index.hnsw.efConstruction = max(40, 2 * int(hnsw_m))
+        if not index.is_trained:
+            # Embeddings L2-normalizados: cada componente cae en [-1, 1]. Con ese rango fijo
+            # SQ8 no depende de los casos vistos y los add_case posteriores nunca se recortan.
+            index.train(np.stack([np.full(dim, -1.0, dtype="float32"), np.full(dim, 1.0, dtype="float32")]))
+    elif kind in ("ivf_flat", "ivf_pq"):
+        nlist = ivf_nlist_for(n)
+        if kind == "ivf_flat":
+            spec = f"IVF{nlist}," + ("Flat" if sq is None else sq)
+        else:
+            m = int(pq_m or next(c for c in (dim // 8, dim // 4, dim // 2, dim) if c > 0 and dim % c == 0))
+            spec = f"IVF{nlist},PQ{m}"
+        index = faiss.index_factory(dim, spec, faiss.METRIC_INNER_PRODUCT)
+        # 64 puntos por centroide alcanzan (faiss pide >= 39); mas solo alarga el k-means de PQ
+        max_train = 64 * max(nlist, 256)
+        train = vectors
+        if n > max_train:
+            rng = np.random.default_rng(seed)
+            train = vectors[rng.choice(n, size=max_train, replace=False)]
+        with get_profiler().span("train_index", cat="faiss", kind=kind, nlist=nlist, n_train=len(train)):
+            index.train(train)
+    else:
+        raise ValueError(f"index kind invalido: {kind}")
+    if n:
+        index.add(vectors)
+    return index
+
+
+def set_search_params(index: Any, *, ef_search: int = 64, nprobe: int = 16) -> None:
+    kind = index_kind(index)
+    if kind == "hnsw":
+        index.hnsw.efSearch = int(ef_search)
+    elif kind in ("ivf_flat", "ivf_pq"):
+        index.nprobe = int(min(nprobe, index.nlist))
@@ -0,0 +1,157 @@
+"""
+Construye una memoria FAISS en lote a partir de decisiones ya registradas, sin re-correr
+el agente: lee uno o mas decisions.jsonl (o run dirs) + el ground truth y reconstruye cada
+caso con build_memory_case, la misma funcion que usa log (texto caso+patron, label,
+decision/razon/tags aprendidos, source). Despues FaissMemory.add_cases deduplica (dedup_key,
+tambien contra lo que ya hay en --out-dir), embebe todo en un batch y escribe cases.jsonl,
+cases.idx.npz e index.faiss una sola vez.
+
+    python -m src.memory.build --decisions data/runs/<run>/decisions.jsonl \\
+        --gt-dir data/ground_truth --out-dir data/memory_seeds/base --reset
+
+Los casos se agregan en el orden de las decisiones (archivo por archivo), como lo hubiera
+hecho log. confidence sale de evidence.confidence; decisiones viejas sin ese campo quedan
+con confidence=None.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+from src.blue.blue_agent_graph import build_memory_case
+from src.core.evidence_store import read_decisions
+from src.core.ground_truth import load_ground_truth
+from src.memory.ann_index import DEFAULT_ANN_THRESHOLD, INDEX_TYPES, STORAGE_TYPES
+from src.memory.embedders import parse_embedder_spec
+
+
+def _decisions_path(path: str) -> str:
+    return os.path.join(path, "decisions.jsonl") if os.path.isdir(path) else path
+
+
+def collect_cases(decisions_paths: List[str], gt_dir: str) -> Dict[str, Any]:
+    """Casos (kwargs de add_cases) reconstruidos de las decisiones + conteos de lo descartado."""
+    cases: List[Dict[str, Any]] = []
+    counts = {"decisions": 0, "no_detection_event": 0, "no_feedback": 0, "missing_confidence": 0}
+    for path in decisions_paths:
+        for row in read_decisions(_decisions_path(path)):
+            counts["decisions"] += 1
+            evidence = row.get("evidence") or {}
+            detection_event = evidence.get("detection_event")
+            if not detection_event:
+                counts["no_detection_event"] += 1
+                continue
+            episode_id = int(row["episode_id"])
+            gating = evidence.get("gating") or {}
+            case = build_memory_case(
+                episode_id=episode_id,
+                run_id=row.get("run_id") or evidence.get("run_id"),
+                detection_event=detection_event,
+                asset_context=evidence.get("asset_context") or {},
+                correlation=evidence.get("correlation") or {},
+                gating=gating,
+                approved=bool(gating.get("approved", evidence.get("approved", True))),
+                final_decision=str(evidence.get("final_decision") or row.get("decision") or "no_block"),
+                confidence=evidence.get("confidence"),
+                gt=load_ground_truth(gt_dir, episode_id),
+            )
+            if case is None:
+                counts["no_feedback"] += 1
+                continue
+            if "confidence" not in evidence:
+                counts["missing_confidence"] += 1
+            case["created_at"] = row.get("timestamp")
+            cases.append(case)
+    return {"cases": cases, "counts": counts}
+
+
+def build_memory(
+    decisions_paths: List[str],
+    *,
+    gt_dir: str,
+    out_dir: str,
+    reset: bool = False,
+    memory_options: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    from src.memory.faiss_store import FaissMemory
+
+    t0 = time.perf_counter()
+    collected = collect_cases(decisions_paths, gt_dir)
+    t_collect = time.perf_counter()
+    mem = FaissMemory(out_dir, **(memory_options or {}))
+    if reset:
+        mem.reset()
+    before = len(mem.cases)
+    added = mem.add_cases(collected["cases"])
+    t_write = time.perf_counter()
+    return {
+        "out_dir": out_dir,
+        "embedder": mem.model_name,
+        **collected["counts"],
+        "candidates": len(collected["cases"]),
+        "duplicates": len(collected["cases"]) - len(added),
+        "cases_before": before,
+        "added": len(added),
+        "cases_total": len(mem.cases),
+        "labels": {label: sum(1 for c in added if c["label"] == label) for label in sorted({c["label"] for c in added})},
+        "collect_ms": round((t_collect - t0) * 1000.0, 1),
+        "open_embed_write_ms": round((t_write - t_collect) * 1000.0, 1),
+    }
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--decisions", type=str, nargs="+", required=True, help="decisions.jsonl o run dirs, en orden.")
+    ap.add_argument("--gt-dir", type=str, default="data/ground_truth")
+    ap.add_argument("--out-dir", type=str, required=True)
+    # sin --reset se agrega sobre la memoria existente (deduplicando contra ella)
+    ap.add_argument("--reset", dest="reset", action="store_true")
+    ap.add_argument("--no-reset", dest="reset", action="store_false")
+    # mismas opciones que run_blue_agent: la memoria tiene que abrirse igual en el agente
+    ap.add_argument("--memory-index", type=str, default="hnsw", choices=list(INDEX_TYPES))
+    ap.add_argument("--memory-ann-threshold", type=int, default=DEFAULT_ANN_THRESHOLD)
+    ap.add_argument("--memory-storage", type=str, default="float32", choices=list(STORAGE_TYPES))
+    ap.add_argument("--memory-embedder", type=parse_embedder_spec, default="minilm")
+    ap.add_argument("--memory-embed-cpu", dest="memory_embed_cpu", action="store_true")
+    ap.add_argument("--no-memory-embed-cpu", dest="memory_embed_cpu", action="store_false")
+    ap.add_argument("--memory-embed-threads", type=int, default=None)
+    ap.add_argument("--memory-embed-max-seq-len", type=int, default=None)
+    ap.add_argument("--memory-embed-server", type=str, default=None)
+    ap.add_argument("--out-json", type=str, default=None)
+    ap.set_defaults(reset=False)
+    ap.set_defaults(memory_embed_cpu=False)
+    args = ap.parse_args()
+
+    missing = [p for p in args.decisions if not os.path.exists(_decisions_path(p))]
+    if missing:
+        ap.error(f"no existe: {', '.join(missing)}")
+    report = build_memory(
+        args.decisions,
+        gt_dir=args.gt_dir,
+        out_dir=args.out_dir,
+        reset=args.reset,
+        memory_options={
+            "index_type": args.memory_index,
+            "ann_threshold": args.memory_ann_threshold,
+            "storage": args.memory_storage,
+            "embedder": args.memory_embedder,
+            "embed_cpu": args.memory_embed_cpu,
+            "embed_threads": args.memory_embed_threads,
+            "embed_max_seq_length": args.memory_embed_max_seq_len,
+            "embed_server": args.memory_embed_server,
+        },
+    )
+    print(f"[memory.build] {report['added']} casos nuevos ({report['duplicates']} duplicados) -> {args.out_dir}", file=sys.stderr)
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+    if args.out_json:
+        os.makedirs(os.path.dirname(args.out_json) or ".", exist_ok=True)
+        with open(args.out_json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,412 @@
+"""
+Store de casos de FaissMemory sobre cases.jsonl (sigue siendo la fuente de verdad, append-only).
+
+En RAM no quedan los casos completos, solo:
+- offset/largo de cada linea (posicion = id FAISS -> bytes en cases.jsonl) y case_id;
+- metadata compacta en arrays numpy: label/decision/source.pattern_key/event_type como
+  codigos de vocabulario, tags como pares (posicion, codigo), confidence (nan = None);
+- el hash de dedup de cada caso (has_case).
+El cuerpo (text, reason, source, ...) se decodifica al pedirlo (store[pos]); los ultimos
+HOT_CASES decodificados quedan en un LRU.
+cases.idx.npz guarda todo lo anterior hasta un tamano de cases.jsonl: al abrir solo se
+parsea la cola agregada despues (o todo si el sidecar no corresponde al archivo).
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import zipfile
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+FILTER_FIELDS = ("label", "decision", "tags", "source.pattern_key", "event_type")
+# Campos multi-valor: pares (posicion, codigo). El resto: un codigo por caso (-1 = sin valor).
+MULTI_FIELDS = ("tags",)
+HOT_CASES = 1024
+INDEX_VERSION = 1
+_EVENT_TYPE_RE = re.compile(r"event_type=(\S+)")
+
+
+def _case_field(case: Dict[str, Any], field: str) -> Any:
+    value: Any = case
+    for part in field.split("."):
+        value = value.get(part) if isinstance(value, dict) else None
+    return value
+
+
+def _case_filter_values(case: Dict[str, Any], field: str) -> List[str]:
+    if field == "tags":
+        return [str(t).strip().lower() for t in (case.get("tags") or []) if str(t).strip()]
+    if field == "event_type":
+        value = (case.get("source") or {}).get("event_type")
+        if value is None:
+            # casos viejos: build_case_text empieza con "event_type=<x> "
+            m = _EVENT_TYPE_RE.search(str(case.get("text") or ""))
+            value = m.group(1) if m else None
+    else:
+        value = _case_field(case, field)
+    return [] if value is None else [str(value)]
+
+
+class _Column:
+    """Array numpy con append amortizado (crece por duplicacion)."""
+
+    def __init__(self, dtype: str, values: Optional[np.ndarray] = None) -> None:
+        self._buf = np.array(values, dtype=dtype) if values is not None else np.zeros(0, dtype=dtype)
+        self._n = len(self._buf)
+
+    def __len__(self) -> int:
+        return self._n
+
+    def append(self, value: Any) -> None:
+        if self._n == len(self._buf):
+            grown = np.zeros(max(64, 2 * self._n), dtype=self._buf.dtype)
+            grown[: self._n] = self._buf[: self._n]
+            self._buf = grown
+        self._buf[self._n] = value
+        self._n += 1
+
+    @property
+    def values(self) -> np.ndarray:
+        return self._buf[: self._n]
+
+
+class CaseStore:
+    """
+    Secuencia de casos de cases.jsonl: len(), store[pos] (dict) y store[a:b] (lista).
+    Con base (memoria seed) las posiciones son globales: primero los casos de base y
+    despues los de este archivo; solo este archivo se escribe.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        *,
+        case_hash: Callable[[Dict[str, Any]], bytes],
+        dedup_key: Sequence[str],
+        base: Optional["CaseStore"] = None,
+        read_only: bool = False,
+        hot_cases: int = HOT_CASES,
+    ) -> None:
+        self.path = path
+        self.index_path = (path[: -len(".jsonl")] if path.endswith(".jsonl") else path) + ".idx.npz"
+        self.base = base
+        self.read_only = read_only
+        self.hot_cases = max(0, int(hot_cases))
+        self._case_hash = case_hash
+        self._dedup_key = list(dedup_key)
+        self._fh: Any = None
+        self._open()
+
+    # ---- estado en RAM ----
+
+    def _reset_columns(self) -> None:
+        self._offsets = _Column("int64")
+        self._lengths = _Column("int32")
+        self._case_ids = _Column("int64")
+        self._confidence = _Column("float32")
+        self._hashes = _Column("V16")
+        self._codes: Dict[str, _Column] = {f: _Column("int32") for f in FILTER_FIELDS if f not in MULTI_FIELDS}
+        self._pairs: Dict[str, Tuple[_Column, _Column]] = {f: (_Column("int64"), _Column("int32")) for f in MULTI_FIELDS}
+        self._vocab: Dict[str, Dict[str, int]] = {f: {} for f in FILTER_FIELDS}
+        self._hot: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()
+        self._size = 0
+        self.dirty = False
+
+    def _code(self, field: str, value: str) -> int:
+        vocab = self._vocab[field]
+        code = vocab.get(value)
+        if code is None:
+            code = vocab[value] = len(vocab)
+        return code
+
+    def _add_meta(self, case: Dict[str, Any], offset: int, length: int) -> None:
+        pos = len(self._offsets)
+        self._offsets.append(offset)
+        self._lengths.append(length)
+        self._case_ids.append(int(case.get("case_id") or 0))
+        confidence = case.get("confidence")
+        self._confidence.append(float(confidence) if isinstance(confidence, (int, float)) else np.nan)
+        self._hashes.append(self._case_hash(case))
+        for field in FILTER_FIELDS:
+            values = _case_filter_values(case, field)
+            if field in MULTI_FIELDS:
+                pos_col, code_col = self._pairs[field]
+                for value in values:
+                    pos_col.append(pos)
+                    code_col.append(self._code(field, value))
+            else:
+                self._codes[field].append(self._code(field, values[0]) if values else -1)
+        self.dirty = True
+
+    # ---- apertura ----
+
+    def _open(self) -> None:
+        self._reset_columns()
+        if not os.path.exists(self.path):
+            return
+        if not self.read_only:
+            self._fix_torn_tail()
+        start = self._load_index()
+        if start < os.path.getsize(self.path):
+            self._scan(start)
+
+    def _fix_torn_tail(self) -> None:
+        with open(self.path, "rb+") as fb:
+            fb.seek(0, os.SEEK_END)
+            if fb.tell() > 0:
+                fb.seek(-1, os.SEEK_END)
+                if fb.read(1) != b"\n":
+                    fb.write(b"\n")  # el proximo append no se pega a la linea cortada
+
+    def _scan(self, start: int) -> None:
+        offset = start
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            for line in f:
+                raw = line.strip()
+                if raw:
+                    try:
+                        case = json.loads(raw)
+                    except (json.JSONDecodeError, UnicodeDecodeError):
+                        case = None  # linea cortada por un crash a mitad de append
+                    if isinstance(case, dict):
+                        self._add_meta(case, offset, len(line))
+                offset += len(line)
+        self._size = offset
+
+    def _line_digest(self, pos: int) -> str:
+        return hashlib.blake2b(self._read(pos), digest_size=16).hexdigest()
+
+    def _load_index(self) -> int:
+        """Carga cases.idx.npz si corresponde a cases.jsonl; devuelve los bytes ya cubiertos."""
+        if not os.path.exists(self.index_path):
+            return 0
+        try:
+            with np.load(self.index_path, allow_pickle=False) as z:
+                meta = json.loads(str(z["meta"]))
+                if (
+                    meta.get("version") != INDEX_VERSION
+                    or meta.get("dedup_key") != self._dedup_key
+                    or meta.get("fields") != list(FILTER_FIELDS)
+                    or int(meta["size"]) > os.path.getsize(self.path)
+                ):
+                    return 0
+                self._offsets = _Column("int64", z["offsets"])
+                self._lengths = _Column("int32", z["lengths"])
+                self._case_ids = _Column("int64", z["case_ids"])
+                self._confidence = _Column("float32", z["confidence"])
+                self._hashes = _Column("V16", z["hashes"])
+                for field in self._codes:
+                    self._codes[field] = _Column("int32", z[f"code:{field}"])
+                for field in MULTI_FIELDS:
+                    self._pairs[field] = (_Column("int64", z[f"pos:{field}"]), _Column("int32", z[f"code:{field}"]))
+                for field in FILTER_FIELDS:
+                    self._vocab[field] = {str(v): i for i, v in enumerate(z[f"vocab:{field}"].tolist())}
+            n = len(self._offsets)
+            # mismo archivo: primera y ultima linea cubiertas iguales (compact() reescribe cases.jsonl)
+            if n != int(meta["n"]) or (n and [self._line_digest(0), self._line_digest(n - 1)] != meta["digests"]):
+                raise ValueError("cases.idx.npz no corresponde a cases.jsonl")
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+            self._reset_columns()
+            return 0
+        self._size = int(meta["size"])
+        return self._size
+
+    def save_index(self) -> None:
+        if self.read_only or not self.dirty:
+            return
+        n = len(self._offsets)
+        meta = {
+            "version": INDEX_VERSION,
+            "dedup_key": self._dedup_key,
+            "fields": list(FILTER_FIELDS),
+            "size": self._size,
+            "n": n,
+            "digests": [self._line_digest(0), self._line_digest(n - 1)] if n else [],
+        }
+        arrays: Dict[str, np.ndarray] = {
+            "meta": np.array(json.dumps(meta)),
+            "offsets": self._offsets.values,
+            "lengths": self._lengths.values,
+            "case_ids": self._case_ids.values,
+            "confidence": self._confidence.values,
+            "hashes": self._hashes.values,
+        }
+        for field, col in self._codes.items():
+            arrays[f"code:{field}"] = col.values
+        for field, (pos_col, code_col) in self._pairs.items():
+            arrays[f"pos:{field}"] = pos_col.values
+            arrays[f"code:{field}"] = code_col.values
+        for field, vocab in self._vocab.items():
+            arrays[f"vocab:{field}"] = np.array(list(vocab), dtype=str) if vocab else np.zeros(0, dtype="U1")
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, self.index_path)
+        self.dirty = False
+
+    # ---- lectura ----
+
+    @property
+    def base_len(self) -> int:
+        return len(self.base) if self.base is not None else 0
+
+    def __len__(self) -> int:
+        return self.base_len + len(self._offsets)
+
+    def __bool__(self) -> bool:
+        return len(self) > 0
+
+    def _read(self, pos: int) -> bytes:
+        if self._fh is None:
+            self._fh = open(self.path, "rb")
+        self._fh.seek(int(self._offsets.values[pos]))
+        return self._fh.read(int(self._lengths.values[pos]))
+
+    def _get(self, pos: int) -> Dict[str, Any]:
+        case = self._hot.get(pos)
+        if case is not None:
+            self._hot.move_to_end(pos)
+            return case
+        case = json.loads(self._read(pos))
+        if self.hot_cases:
+            self._hot[pos] = case
+            if len(self._hot) > self.hot_cases:
+                self._hot.popitem(last=False)
+        return case
+
+    def _read_range(self, lo: int, hi: int) -> List[Dict[str, Any]]:
+        # rebuild/compactacion: un solo read del tramo, sin pasar por el LRU
+        if lo >= hi:
+            return []
+        offsets = self._offsets.values
+        lengths = self._lengths.values
+        start = int(offsets[lo])
+        if self._fh is None:
+            self._fh = open(self.path, "rb")
+        self._fh.seek(start)
+        blob = self._fh.read(int(offsets[hi - 1]) + int(lengths[hi - 1]) - start)
+        return [
+            json.loads(blob[int(o) - start : int(o) - start + int(n)])
+            for o, n in zip(offsets[lo:hi], lengths[lo:hi])
+        ]
+
+    def __getitem__(self, key: Union[int, slice]) -> Any:
+        n_base = self.base_len
+        if isinstance(key, slice):
+            lo, hi, step = key.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(lo, hi, step)]
+            out = self.base[lo : min(hi, n_base)] if self.base is not None and lo < n_base else []
+            return out + self._read_range(max(lo, n_base) - n_base, max(hi, n_base) - n_base)
+        pos = int(key)
+        if pos < 0:
+            pos += len(self)
+        if not 0 <= pos < len(self):
+            raise IndexError(key)
+        if pos < n_base:
+            return self.base[pos]
+        return self._get(pos - n_base)
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def last_case_id(self) -> int:
+        if len(self._case_ids):
+            return int(self._case_ids.values[-1])
+        return self.base.last_case_id() if self.base is not None else 0
+
+    @property
+    def case_ids(self) -> np.ndarray:
+        """case_id de este archivo (sin base)."""
+        return self._case_ids.values
+
+    @property
+    def confidence(self) -> np.ndarray:
+        return self._confidence.values
+
+    def hashes(self) -> List[bytes]:
+        own = self._hashes.values.tolist()
+        return (self.base.hashes() + own) if self.base is not None else own
+
+    def positions(self, field: str, keys: Sequence[str]) -> np.ndarray:
+        """Posiciones globales (ordenadas, unicas) con algun valor de keys en field."""
+        vocab = self._vocab[field]
+        codes = [vocab[k] for k in keys if k in vocab]
+        if not codes:
+            own = np.zeros(0, dtype="int64")
+        else:
+            # tabla codigo -> bool (la ultima entrada cubre el -1 de "sin valor")
+            wanted = np.zeros(len(vocab) + 1, dtype=bool)
+            wanted[codes] = True
+            if field in MULTI_FIELDS:
+                pos_col, code_col = self._pairs[field]
+                # pares en orden de posicion: dedup de posiciones consecutivas
+                own = pos_col.values[wanted[code_col.values]]
+                own = own[np.concatenate(([True], own[1:] != own[:-1]))] if len(own) else own
+            else:
+                own = np.flatnonzero(wanted[self._codes[field].values]).astype("int64")
+        if self.base is None:
+            return own
+        return np.concatenate([self.base.positions(field, keys), own + self.base_len])
+
+    # ---- escritura (solo este archivo) ----
+
+    def _check_writable(self) -> None:
+        if self.read_only:
+            raise RuntimeError(f"{self.path} es de solo lectura")
+
+    def append(self, case: Dict[str, Any]) -> None:
+        self.extend([case])
+
+    def extend(self, cases: Sequence[Dict[str, Any]]) -> None:
+        """Agrega los casos al final de cases.jsonl con una sola escritura."""
+        self._check_writable()
+        lines = [(json.dumps(case, ensure_ascii=False) + "\n").encode("utf-8") for case in cases]
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            f.write(b"".join(lines))
+        for case, line in zip(cases, lines):
+            self._add_meta(case, offset, len(line))
+            offset += len(line)
+            if self.hot_cases:
+                self._hot[len(self._offsets) - 1] = case
+                if len(self._hot) > self.hot_cases:
+                    self._hot.popitem(last=False)
+        self._size = offset
+
+    def rewrite(self, cases: List[Dict[str, Any]]) -> None:
+        """Reemplaza cases.jsonl atomicamente (tmp + os.replace) y reindexa sin re-parsear."""
+        self._check_writable()
+        self.close()
+        self._reset_columns()
+        tmp_path = f"{self.path}.tmp"
+        offset = 0
+        with open(tmp_path, "wb") as f:
+            for case in cases:
+                line = (json.dumps(case, ensure_ascii=False) + "\n").encode("utf-8")
+                f.write(line)
+                self._add_meta(case, offset, len(line))
+                offset += len(line)
+        os.replace(tmp_path, self.path)
+        self._size = offset
+        self.dirty = True
+        self.save_index()
+
+    def truncate(self) -> None:
+        self._check_writable()
+        self.close()
+        open(self.path, "w", encoding="utf-8").close()
+        self._reset_columns()
+        if os.path.exists(self.index_path):
+            os.remove(self.index_path)
+
+    def close(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
@@ -0,0 +1,204 @@
+"""
+Politica de capacidad y consolidacion de FaissMemory.
+
+plan_compaction() decide, sin tocar disco, que casos quedan:
+1. expira casos sin actividad (creacion o ultimo hit) en max_age_days;
+2. consolida casi-duplicados: casos con mismo label y decision cuya similitud con el
+   lider del grupo es >= merge_threshold pasan a un solo caso centroide con "count";
+3. recorta a max_cases por LRU (ultimo hit) u oldest (created_at).
+FaissMemory.compact() aplica el plan reescribiendo cases.jsonl y el indice una sola vez.
+
+    python -m src.memory.compaction --memory-dir data/memory --merge-threshold 0.97 --max-cases 20000
+"""
+from __future__ import annotations
+
+import argparse
+import json
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+EVICTION_POLICIES = ("lru", "oldest")
+# vecinos por caso al buscar casi-duplicados (el resto cae en pasadas posteriores)
+MERGE_NEIGHBORS = 32
+
+
+@dataclass
+class CompactionPlan:
+    cases: List[Dict[str, Any]]
+    vectors: np.ndarray
+    stats: Dict[int, List[float]]
+    # hashes de dedup de los casos absorbidos por un centroide (has_case los sigue viendo)
+    merged_hashes: List[bytes] = field(default_factory=list)
+    report: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def changed(self) -> bool:
+        return self.report.get("after", 0) != self.report.get("before", 0)
+
+
+def _iso_ts(value: Any) -> float:
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return 0.0
+
+
+def _iso(ts: float) -> str:
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def _last_active(case: Dict[str, Any], stats: Dict[int, List[float]]) -> float:
+    hit = stats.get(int(case.get("case_id") or 0))
+    return max(_iso_ts(case.get("created_at")), hit[0] if hit else 0.0)
+
+
+def _clusters(cases: List[Dict[str, Any]], vectors: np.ndarray, threshold: float) -> List[List[int]]:
+    """Clusters por lider (posiciones ordenadas): cada miembro esta a >= threshold de su lider."""
+    import faiss  # diferido: run_blue_agent importa EVICTION_POLICIES sin cargar faiss
+
+    groups: Dict[Tuple[str, str], List[int]] = {}
+    for pos, case in enumerate(cases):
+        groups.setdefault((str(case.get("label")), str(case.get("decision"))), []).append(pos)
+    out: List[List[int]] = []
+    for positions in groups.values():
+        idxs = np.asarray(positions, dtype="int64")
+        sub = np.ascontiguousarray(vectors[idxs], dtype="float32")
+        index = faiss.IndexFlatIP(sub.shape[1])
+        index.add(sub)
+        sims, nbrs = index.search(sub, min(MERGE_NEIGHBORS, len(idxs)))
+        taken = np.zeros(len(idxs), dtype=bool)
+        for i in range(len(idxs)):
+            if taken[i]:
+                continue
+            members = [i] + [
+                int(j) for s, j in zip(sims[i], nbrs[i]) if j >= 0 and j != i and not taken[j] and s >= threshold
+            ]
+            taken[members] = True
+            out.append(sorted(int(idxs[m]) for m in members))
+    out.sort(key=lambda members: members[0])
+    return out
+
+
+def _centroid_case(
+    members: List[Dict[str, Any]],
+    member_vecs: np.ndarray,
+    centroid: np.ndarray,
+    *,
+    now: float,
+) -> Dict[str, Any]:
+    # texto/razon/source del miembro mas cercano al centroide; id y created_at del lider
+    rep = members[int(np.argmax(member_vecs @ centroid))]
+    case = dict(rep)
+    case["case_id"] = members[0]["case_id"]
+    case["created_at"] = min((m.get("created_at") or "" for m in members), default=rep.get("created_at"))
+    case["tags"] = sorted({str(t) for m in members for t in (m.get("tags") or [])})
+    confidences = [float(m["confidence"]) for m in members if isinstance(m.get("confidence"), (int, float))]
+    case["confidence"] = round(sum(confidences) / len(confidences), 4) if confidences else rep.get("confidence")
+    case["count"] = sum(int(m.get("count") or 1) for m in members)
+    case["consolidated_at"] = _iso(now)
+    return case
+
+
+def plan_compaction(
+    cases: List[Dict[str, Any]],
+    vectors: np.ndarray,
+    *,
+    stats: Dict[int, List[float]],
+    case_hash: Callable[[Dict[str, Any]], bytes],
+    now: float,
+    max_cases: Optional[int] = None,
+    max_age_days: Optional[float] = None,
+    eviction: str = "lru",
+    merge_threshold: Optional[float] = None,
+) -> CompactionPlan:
+    if eviction not in EVICTION_POLICIES:
+        raise ValueError(f"eviction invalida: {eviction} (usa {', '.join(EVICTION_POLICIES)})")
+    report = {"before": len(cases), "expired": 0, "merged": 0, "evicted": 0}
+    keep = list(range(len(cases)))
+
+    if max_age_days is not None:
+        cutoff = now - float(max_age_days) * 86400.0
+        alive = [p for p in keep if _last_active(cases[p], stats) >= cutoff]
+        report["expired"] = len(keep) - len(alive)
+        keep = alive
+
+    out_cases = [cases[p] for p in keep]
+    out_vecs = vectors[keep] if keep else np.zeros((0, vectors.shape[1]), dtype="float32")
+    out_stats = {int(c["case_id"]): list(stats[int(c["case_id"])]) for c in out_cases if int(c["case_id"]) in stats}
+    merged_hashes: List[bytes] = []
+
+    if merge_threshold is not None and len(out_cases) > 1:
+        merged_cases: List[Dict[str, Any]] = []
+        merged_vecs: List[np.ndarray] = []
+        for positions in _clusters(out_cases, out_vecs, float(merge_threshold)):
+            if len(positions) == 1:
+                merged_cases.append(out_cases[positions[0]])
+                merged_vecs.append(out_vecs[positions[0]])
+                continue
+            members = [out_cases[p] for p in positions]
+            member_vecs = out_vecs[positions]
+            centroid = member_vecs.mean(axis=0)
+            centroid /= np.linalg.norm(centroid) + 1e-12
+            case = _centroid_case(members, member_vecs, centroid, now=now)
+            member_stats = [out_stats.pop(int(m["case_id"]), None) for m in members]
+            hits = [s for s in member_stats if s]
+            if hits:
+                out_stats[int(case["case_id"])] = [max(s[0] for s in hits), sum(s[1] for s in hits)]
+            merged_hashes.extend(case_hash(m) for m in members)
+            merged_cases.append(case)
+            merged_vecs.append(centroid.astype("float32"))
+            report["merged"] += len(members) - 1
+        out_cases = merged_cases
+        out_vecs = np.stack(merged_vecs) if merged_vecs else out_vecs[:0]
+
+    if max_cases is not None and len(out_cases) > int(max_cases):
+        if eviction == "lru":
+            age_key = [_last_active(c, out_stats) for c in out_cases]
+        else:
+            age_key = [_iso_ts(c.get("created_at")) for c in out_cases]
+        drop = set(np.argsort(np.asarray(age_key), kind="stable")[: len(out_cases) - int(max_cases)].tolist())
+        report["evicted"] = len(drop)
+        kept = [p for p in range(len(out_cases)) if p not in drop]
+        for p in drop:
+            out_stats.pop(int(out_cases[p]["case_id"]), None)
+        out_cases = [out_cases[p] for p in kept]
+        out_vecs = out_vecs[kept]
+
+    report["after"] = len(out_cases)
+    return CompactionPlan(
+        cases=out_cases,
+        vectors=np.ascontiguousarray(out_vecs, dtype="float32"),
+        stats=out_stats,
+        merged_hashes=merged_hashes,
+        report=report,
+    )
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--memory-dir", type=str, required=True)
+    ap.add_argument("--embedder", type=str, default="minilm")
+    ap.add_argument("--max-cases", type=int, default=None)
+    ap.add_argument("--max-age-days", type=float, default=None)
+    ap.add_argument("--eviction", type=str, default="lru", choices=list(EVICTION_POLICIES))
+    ap.add_argument("--merge-threshold", type=float, default=None)
+    args = ap.parse_args()
+
+    from src.memory.faiss_store import FaissMemory
+
+    mem = FaissMemory(
+        dir_path=args.memory_dir,
+        embedder=args.embedder,
+        max_cases=args.max_cases,
+        max_age_days=args.max_age_days,
+        eviction=args.eviction,
+        merge_threshold=args.merge_threshold,
+    )
+    print(json.dumps(mem.compact(), ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""
+Servidor local de embeddings (Unix socket) compartido por procesos del Blue Agent.
+
+Un solo proceso carga el modelo (get_embedder con las mismas opciones que FaissMemory) y
+atiende a varios clientes: cada conexion corre en su hilo y todos encodean a traves de un
+MicroBatcher, asi los requests que llegan juntos de procesos distintos salen en un forward.
+
+Protocolo por conexion (una linea JSON por request; la respuesta de embed agrega
+n*dim*4 bytes float32 despues de su linea JSON):
+  {"op": "info", "config": {...}}  -> {"ok": true, "name": ..., "dim": ..., "cacheable": ...}
+                                      (ok=false si config no es la del servidor)
+  {"op": "embed", "texts": [...]}  -> {"ok": true, "n": N, "dim": D, "queue_ms": ..., "batch_texts": ..., "batch_requests": ...} + bytes
+  {"op": "stats"}                  -> {"ok": true, "requests": ..., "batches": ..., "queue_ms_p50": ..., ...}
+  {"op": "shutdown"}               -> {"ok": true}
+
+    python -m src.memory.embed_server --socket /tmp/cyber_range_embed.sock --cpu
+    python -m src.blue.run_blue_agent ... --memory-embed-server /tmp/cyber_range_embed.sock
+
+Sin AF_UNIX (Windows) el servidor no esta disponible y los clientes encodean en proceso.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from typing import Any, BinaryIO, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.core.profiler import get_profiler
+from src.memory.embedders import DEFAULT_MODEL_NAME, Embedder, MicroBatcher, embedder_config, get_embedder, parse_embedder_spec
+
+DEFAULT_SOCKET_PATH = os.path.join(tempfile.gettempdir(), "cyber_range_embed.sock")
+CONNECT_TIMEOUT_SEC = 2.0
+REQUEST_TIMEOUT_SEC = 120.0
+# ventana de queue_ms/batch_texts para percentiles de "stats"
+_STATS_WINDOW = 4096
+HAS_UNIX_SOCKETS = hasattr(socket, "AF_UNIX") and hasattr(socketserver, "UnixStreamServer")
+
+
+def _send(wfile: BinaryIO, header: Dict[str, Any], payload: bytes = b"") -> None:
+    wfile.write(json.dumps(header, ensure_ascii=False).encode("utf-8") + b"\n" + payload)
+    wfile.flush()
+
+
+def _recv(rfile: BinaryIO) -> Tuple[Optional[Dict[str, Any]], bytes]:
+    line = rfile.readline()
+    if not line:
+        return None, b""
+    header = json.loads(line)
+    nbytes = int(header.get("nbytes") or 0)
+    payload = rfile.read(nbytes) if nbytes else b""
+    if len(payload) != nbytes:
+        raise ConnectionError("respuesta cortada")
+    return header, payload
+
+
+# ---- servidor ----
+
+
+class _ServerState:
+    def __init__(self, embedder: MicroBatcher, config: Dict[str, Any]) -> None:
+        self.embedder = embedder
+        self.config = config
+        self.started = time.time()
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.clients = 0
+        self.queue_ms: List[float] = []
+        self.batch_texts: List[int] = []
+
+    def record(self, stats: Dict[str, Any]) -> None:
+        with self._lock:
+            self.requests += 1
+            self.queue_ms.append(float(stats["queue_ms"]))
+            self.batch_texts.append(int(stats["batch_texts"]))
+            if len(self.queue_ms) > _STATS_WINDOW:
+                del self.queue_ms[: -_STATS_WINDOW]
+                del self.batch_texts[: -_STATS_WINDOW]
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            queue = np.asarray(self.queue_ms or [0.0])
+            batch = np.asarray(self.batch_texts or [0])
+            batcher = dict(self.embedder.stats)
+            return {
+                "name": self.embedder.name,
+                "uptime_s": round(time.time() - self.started, 1),
+                "clients": self.clients,
+                "requests": self.requests,
+                "batches": batcher["batches"],
+                "texts": batcher["texts"],
+                "mean_batch_texts": round(batcher["texts"] / max(1, batcher["batches"]), 2),
+                "queue_ms_p50": round(float(np.percentile(queue, 50)), 3),
+                "queue_ms_p99": round(float(np.percentile(queue, 99)), 3),
+                "batch_texts_p50": int(np.percentile(batch, 50)),
+                "batch_texts_max": int(batch.max()),
+            }
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    server: "_EmbedServer"
+
+    def handle(self) -> None:
+        state = self.server.state
+        while True:
+            try:
+                req, _ = _recv(self.rfile)
+            except (OSError, ValueError):
+                return
+            if req is None:
+                return
+            op = str(req.get("op") or "")
+            try:
+                if op == "embed":
+                    texts = [str(t) for t in req.get("texts") or []]
+                    embs, stats = state.embedder.encode_with_stats(texts)
+                    state.record(stats)
+                    payload = np.ascontiguousarray(embs, dtype="<f4").tobytes()
+                    _send(self.wfile, {"ok": True, "n": len(texts), "dim": state.embedder.dim, "nbytes": len(payload), **stats}, payload)
+                elif op == "info":
+                    if req.get("config") != state.config:
+                        _send(self.wfile, {"ok": False, "error": "config distinta", "config": state.config})
+                    else:
+                        with state._lock:
+                            state.clients += 1
+                        e = state.embedder
+                        _send(self.wfile, {"ok": True, "name": e.name, "dim": e.dim, "cacheable": e.cacheable, "pid": os.getpid()})
+                elif op == "stats":
+                    _send(self.wfile, {"ok": True, **state.summary()})
+                elif op == "shutdown":
+                    _send(self.wfile, {"ok": True})
+                    threading.Thread(target=self.server.shutdown, daemon=True).start()
+                    return
+                else:
+                    _send(self.wfile, {"ok": False, "error": f"unknown op: {op}"})
+            except OSError:
+                return
+            except Exception as e:
+                _send(self.wfile, {"ok": False, "error": f"{type(e).__name__}: {e}"})
+
+
+if HAS_UNIX_SOCKETS:
+
+    class _EmbedServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+        daemon_threads = True
+
+        def __init__(self, path: str, state: _ServerState) -> None:
+            self.state = state
+            super().__init__(path, _Handler)
+
+
+def socket_alive(path: str) -> bool:
+    if not HAS_UNIX_SOCKETS:
+        return False
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT_SEC)
+    try:
+        sock.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+def serve(path: str, embedder: Embedder, config: Dict[str, Any], *, max_batch: int = 64) -> Dict[str, Any]:
+    if not HAS_UNIX_SOCKETS:
+        raise RuntimeError("embed_server necesita Unix sockets (AF_UNIX)")
+    if os.path.exists(path):
+        if socket_alive(path):
+            raise RuntimeError(f"ya hay un servidor de embeddings en {path}")
+        os.remove(path)  # socket huerfano de un servidor que murio
+    batcher = embedder if isinstance(embedder, MicroBatcher) else MicroBatcher(embedder, max_batch=max_batch)
+    state = _ServerState(batcher, config)
+    server = _EmbedServer(path, state)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown, daemon=True).start())
+    print(f"embed_server: ready {path} ({batcher.name}, pid={os.getpid()})", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(path):
+            os.remove(path)
+    return state.summary()
+
+
+# ---- cliente ----
+
+
+class EmbedServerError(ConnectionError):
+    """Respuesta ok=false del servidor: el cliente la trata como caida y encodea en proceso."""
+
+
+class RemoteEmbedder(Embedder):
+    """
+    Embedder que encodea en el servidor. Si la conexion se cae a mitad del run pasa a
+    fallback() (el mismo embedder cargado en proceso, mismo name y vectores).
+    """
+
+    def __init__(self, path: str, config: Dict[str, Any], *, fallback: Callable[[], Embedder]) -> None:
+        self.path = path
+        self._fallback = fallback
+        self._local: Optional[Embedder] = None
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._rfile: Any = None
+        self._wfile: Any = None
+        self._connect()
+        info, _ = self._request({"op": "info", "config": config})
+        if not info.get("ok"):
+            self.close()
+            raise ConnectionError(f"embed_server en {path}: {info.get('error')} ({info.get('config')})")
+        self.name = str(info["name"])
+        self.dim = int(info["dim"])
+        self.cacheable = bool(info["cacheable"])
+        self.server_pid = info.get("pid")
+        # por request: espera en la cola del servidor y tamano del batch que lo sirvio
+        self.stats = {"requests": 0, "texts": 0, "queue_ms": 0.0, "batch_texts": 0, "fallback": False}
+
+    def _connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(CONNECT_TIMEOUT_SEC)
+        sock.connect(self.path)
+        sock.settimeout(REQUEST_TIMEOUT_SEC)
+        self._sock = sock
+        self._rfile = sock.makefile("rb")
+        self._wfile = sock.makefile("wb")
+
+    def _request(self, req: Dict[str, Any]) -> Tuple[Dict[str, Any], bytes]:
+        with self._lock:
+            _send(self._wfile, req)
+            header, payload = _recv(self._rfile)
+        if header is None:
+            raise ConnectionError("embed_server cerro la conexion")
+        return header, payload
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        if self._local is None:
+            try:
+                with get_profiler().span("embed_server", cat="embed", n=len(texts)) as span:
+                    header, payload = self._request({"op": "embed", "texts": list(texts)})
+                    if not header.get("ok"):
+                        raise EmbedServerError(f"embed_server: {header.get('error')}")
+                    span.args.update(queue_ms=header["queue_ms"], batch_texts=header["batch_texts"])
+                self.stats["requests"] += 1
+                self.stats["texts"] += len(texts)
+                self.stats["queue_ms"] += float(header["queue_ms"])
+                self.stats["batch_texts"] += int(header["batch_texts"])
+                return np.frombuffer(payload, dtype="<f4").reshape(int(header["n"]), int(header["dim"])).copy()
+            except (OSError, ValueError) as e:
+                print(f"embed_server: {self.path} no responde ({e}); embeddings en proceso", file=sys.stderr)
+                self.close()
+                self.stats["fallback"] = True
+                self._local = self._fallback()
+        return self._local.encode(texts)
+
+    def close(self) -> None:
+        for f in (self._rfile, self._wfile, self._sock):
+            if f is not None:
+                try:
+                    f.close()
+                except OSError:
+                    pass
+        self._sock = self._rfile = self._wfile = None
+
+
+def connect_embedder(path: str, config: Dict[str, Any], *, fallback: Callable[[], Embedder]) -> Optional[RemoteEmbedder]:
+    """RemoteEmbedder si hay servidor en path con la misma config; None para cargar en proceso."""
+    if not HAS_UNIX_SOCKETS or not os.path.exists(path):
+        return None
+    try:
+        return RemoteEmbedder(path, config, fallback=fallback)
+    except (OSError, ValueError) as e:
+        print(f"embed_server: no disponible en {path} ({e}); embeddings en proceso", file=sys.stderr)
+        return None
+
+
+def request_stats(path: str) -> Dict[str, Any]:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(CONNECT_TIMEOUT_SEC)
+    sock.connect(path)
+    with sock, sock.makefile("rb") as rfile, sock.makefile("wb") as wfile:
+        _send(wfile, {"op": "stats"})
+        header, _ = _recv(rfile)
+    return header or {}
+
+
+def main() -> None:
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--socket", type=str, default=DEFAULT_SOCKET_PATH)
+    ap.add_argument("--embedder", type=parse_embedder_spec, default="minilm")
+    ap.add_argument("--model-name", type=str, default=DEFAULT_MODEL_NAME)
+    ap.add_argument("--cpu", dest="cpu", action="store_true")
+    ap.add_argument("--no-cpu", dest="cpu", action="store_false")
+    ap.add_argument("--threads", type=int, default=None)
+    ap.add_argument("--max-seq-len", type=int, default=None)
+    ap.add_argument("--max-batch", type=int, default=64)
+    ap.add_argument("--stats", action="store_true", help="Imprime las stats de un servidor corriendo y sale.")
+    ap.set_defaults(cpu=False)
+    args = ap.parse_args()
+
+    if not HAS_UNIX_SOCKETS:
+        ap.error("embed_server necesita Unix sockets (AF_UNIX); sin servidor cada proceso carga su modelo.")
+    if args.stats:
+        print(json.dumps(request_stats(args.socket), ensure_ascii=False, indent=2))
+        return
+    config = embedder_config(args.embedder, model_name=args.model_name, cpu=args.cpu, max_seq_length=args.max_seq_len)
+    embedder = get_embedder(
+        args.embedder,
+        model_name=args.model_name,
+        cpu=args.cpu,
+        threads=args.threads,
+        max_seq_length=args.max_seq_len,
+    )
+    summary = serve(args.socket, embedder, config, max_batch=args.max_batch)
+    print(json.dumps(summary, ensure_ascii=False), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
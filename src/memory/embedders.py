@@ -0,0 +1,294 @@
+"""
+Embedders para FaissMemory.
+
+Un embedder expone name (clave del cache de embeddings y de la memoria), dim y
+encode(texts) -> float32 [n, dim]; FaissMemory normaliza L2 despues.
+- "minilm" (default): sentence-transformers/all-MiniLM-L6-v2 (torch).
+- "hashing[:n_features]": HashingVectorizer de scikit-learn sobre los tokens key=value de
+  build_case_text/build_pattern_text. Sin torch ni modelo que descargar, sin estado:
+  el mismo texto da siempre el mismo vector, asi la memoria crece sin reentrenar nada.
+Los umbrales de retrieve/decide estan calibrados con MiniLM; src.eval.compare_embedders
+mide cuanto cambian decisiones y hits con otro embedder.
+
+Modo CPU de minilm (cpu=True, --memory-embed-cpu): Linear cuantizados a int8 dinamico,
+presupuesto fijo de hilos intra-op de torch, tope de secuencia (DEFAULT_CPU_MAX_SEQ_LENGTH)
+y MicroBatcher para juntar encodes concurrentes en un solo forward. Los vectores cambian un
+poco respecto del modelo float: el name lleva "+int8"/"+seqN" (cache de embeddings aparte) y
+src.eval.bench_embedder_cpu mide latencia y drift de coseno.
+"""
+from __future__ import annotations
+
+import copy
+import json
+import os
+import threading
+import time
+import warnings
+from abc import ABC, abstractmethod
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from sentence_transformers import SentenceTransformer
+
+EMBEDDER_TYPES = ("minilm", "hashing")
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_HASHING_FEATURES = 1024
+# build_case_text da ~100 tokens basicos (~130 wordpieces con [CLS]/[SEP]); 160 deja margen
+# y evita pagar 256 posiciones por textos largos raros.
+DEFAULT_CPU_MAX_SEQ_LENGTH = 160
+# Mas hilos no ayudan con batches de 1-8 textos cortos; el resto queda para el agente/MCP.
+DEFAULT_CPU_THREADS = 4
+
+_MODEL_BY_NAME: Dict[str, "SentenceTransformer"] = {}
+_EMBEDDERS: Dict[str, "Embedder"] = {}
+
+
+def _get_embedding_model(
+    model_name: str, *, quantize: bool = False, max_seq_length: Optional[int] = None
+) -> SentenceTransformer:
+    key = f"{model_name}|int8={int(quantize)}|seq={max_seq_length or 0}"
+    model = _MODEL_BY_NAME.get(key)
+    if model is None:
+        if quantize or max_seq_length:
+            # variante sobre una copia: el modelo float compartido queda intacto
+            model = copy.deepcopy(_get_embedding_model(model_name)).to("cpu")
+            if max_seq_length:
+                model.max_seq_length = int(max_seq_length)
+            if quantize:
+                import torch
+
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")  # aviso de deprecacion de torch.ao
+                    model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        else:
+            # Import diferido: sentence-transformers arrastra torch (varios segundos).
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(model_name)
+        _MODEL_BY_NAME[key] = model
+    return model
+
+
+def set_torch_threads(threads: int) -> None:
+    """Presupuesto de hilos intra-op de torch (global al proceso)."""
+    import torch
+
+    torch.set_num_threads(max(1, int(threads)))
+
+
+class Embedder(ABC):
+    name: str
+    dim: int
+    # False: encode es mas barato que el lookup sha256 del cache en disco.
+    cacheable: bool = True
+
+    @abstractmethod
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """float32 [n, dim] sin normalizar."""
+
+
+class SentenceTransformerEmbedder(Embedder):
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        *,
+        quantize: bool = False,
+        max_seq_length: Optional[int] = None,
+    ) -> None:
+        self.name = model_name + ("+int8" if quantize else "") + (f"+seq{int(max_seq_length)}" if max_seq_length else "")
+        self.model = _get_embedding_model(model_name, quantize=quantize, max_seq_length=max_seq_length)
+        self.dim = int(self.model.get_sentence_embedding_dimension())
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return np.asarray(self.model.encode(texts, convert_to_numpy=True, show_progress_bar=False), dtype="float32")
+
+
+class _EncodeRequest:
+    __slots__ = ("texts", "done", "result", "error", "t0", "queue_ms", "batch_texts", "batch_requests")
+
+    def __init__(self, texts: List[str]) -> None:
+        self.texts = texts
+        self.done = threading.Event()
+        self.result: Optional[np.ndarray] = None
+        self.error: Optional[BaseException] = None
+        self.t0 = time.perf_counter()
+        self.queue_ms = 0.0
+        self.batch_texts = 0
+        self.batch_requests = 0
+
+
+class MicroBatcher(Embedder):
+    """
+    Junta encodes concurrentes en un solo forward del embedder interno.
+    El primer hilo que llega hace de lider: encodea lo pendiente y vuelve a mirar la cola
+    hasta vaciarla; los que llegan mientras tanto esperan y salen en el proximo batch.
+    Sin concurrencia no agrega espera (no hay ventana de tiempo).
+    """
+
+    def __init__(self, inner: Embedder, *, max_batch: int = 64) -> None:
+        self.inner = inner
+        self.name = inner.name
+        self.dim = inner.dim
+        self.cacheable = inner.cacheable
+        self.max_batch = max(1, int(max_batch))
+        self._lock = threading.Lock()
+        self._pending: List[_EncodeRequest] = []
+        self._busy = False
+        self.stats = {"requests": 0, "batches": 0, "texts": 0}
+
+    def _take_batch(self) -> List[_EncodeRequest]:
+        batch: List[_EncodeRequest] = []
+        n_texts = 0
+        while self._pending and (not batch or n_texts + len(self._pending[0].texts) <= self.max_batch):
+            req = self._pending.pop(0)
+            batch.append(req)
+            n_texts += len(req.texts)
+        return batch
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.encode_with_stats(texts)[0]
+
+    def encode_with_stats(self, texts: List[str]) -> Tuple[np.ndarray, Dict[str, Any]]:
+        """encode + espera en cola (ms) y tamano del batch que sirvio el request."""
+        req = _EncodeRequest(list(texts))
+        with self._lock:
+            self._pending.append(req)
+            self.stats["requests"] += 1
+            leader = not self._busy
+            self._busy = True
+        if leader:
+            while True:
+                with self._lock:
+                    batch = self._take_batch()
+                    if not batch:
+                        self._busy = False
+                        break
+                    n_texts = sum(len(r.texts) for r in batch)
+                    self.stats["batches"] += 1
+                    self.stats["texts"] += n_texts
+                t_start = time.perf_counter()
+                for r in batch:
+                    r.queue_ms = (t_start - r.t0) * 1000.0
+                    r.batch_texts = n_texts
+                    r.batch_requests = len(batch)
+                try:
+                    embs = self.inner.encode([t for r in batch for t in r.texts])
+                    start = 0
+                    for r in batch:
+                        r.result = embs[start : start + len(r.texts)]
+                        start += len(r.texts)
+                except BaseException as e:  # el error le llega a cada hilo del batch
+                    for r in batch:
+                        r.error = e
+                for r in batch:
+                    r.done.set()
+        req.done.wait()
+        if req.error is not None:
+            raise req.error
+        assert req.result is not None
+        return req.result, {
+            "queue_ms": round(req.queue_ms, 3),
+            "batch_texts": req.batch_texts,
+            "batch_requests": req.batch_requests,
+        }
+
+
+class HashingEmbedder(Embedder):
+    cacheable = False
+
+    def __init__(self, n_features: int = DEFAULT_HASHING_FEATURES, ngram_range: Tuple[int, int] = (1, 2)) -> None:
+        from sklearn.feature_extraction.text import HashingVectorizer
+
+        self.dim = int(n_features)
+        self.name = f"hashing-{self.dim}-ng{ngram_range[0]}{ngram_range[1]}"
+        # Un token = un par key=value ("event_type=auth"); los bigramas agregan contexto entre campos.
+        self._vectorizer = HashingVectorizer(
+            n_features=self.dim,
+            ngram_range=ngram_range,
+            token_pattern=r"[^\s]+",
+            lowercase=True,
+            alternate_sign=False,
+            norm=None,
+        )
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self._vectorizer.transform(texts).toarray().astype("float32")
+
+
+def parse_embedder_spec(spec: str) -> str:
+    """Valida "minilm[:model_name]" / "hashing[:n_features]" sin cargar nada (type= de argparse)."""
+    kind, _, arg = str(spec).partition(":")
+    if kind not in EMBEDDER_TYPES:
+        raise ValueError(f"embedder invalido: {spec} (usa {', '.join(EMBEDDER_TYPES)})")
+    if kind == "hashing" and arg and (not arg.isdigit() or int(arg) <= 0):
+        raise ValueError(f"n_features invalido en {spec}")
+    return str(spec)
+
+
+def embedder_config(
+    spec: Optional[str] = None,
+    *,
+    model_name: str = DEFAULT_MODEL_NAME,
+    cpu: bool = False,
+    max_seq_length: Optional[int] = None,
+) -> Dict[str, Any]:
+    """Lo que define los vectores de un embedder (sin threads); cliente y servidor lo comparan."""
+    kind, _, arg = parse_embedder_spec(spec or "minilm").partition(":")
+    if kind == "hashing":
+        return {"kind": kind, "n_features": int(arg) if arg else DEFAULT_HASHING_FEATURES}
+    if cpu:
+        max_seq_length = max_seq_length or DEFAULT_CPU_MAX_SEQ_LENGTH
+    return {"kind": kind, "model_name": arg or model_name, "cpu": bool(cpu), "max_seq_length": max_seq_length or None}
+
+
+def get_embedder(
+    spec: Union[str, Embedder, None] = None,
+    *,
+    model_name: str = DEFAULT_MODEL_NAME,
+    cpu: bool = False,
+    threads: Optional[int] = None,
+    max_seq_length: Optional[int] = None,
+    server: Optional[str] = None,
+) -> Embedder:
+    """
+    cpu=True (solo minilm): int8 + MicroBatcher, threads=DEFAULT_CPU_THREADS y
+    max_seq_length=DEFAULT_CPU_MAX_SEQ_LENGTH salvo que se pasen. hashing ignora estas opciones.
+    server: socket de src.memory.embed_server; si no responde (o sirve otro embedder) se
+    carga el modelo en el proceso, igual que sin server.
+    """
+    if isinstance(spec, Embedder):
+        return spec
+    config = embedder_config(spec, model_name=model_name, cpu=cpu, max_seq_length=max_seq_length)
+    key = json.dumps(config, sort_keys=True)
+
+    def local() -> Embedder:
+        embedder = _EMBEDDERS.get(key)
+        if embedder is None:
+            if config["kind"] == "minilm":
+                budget = threads or (min(DEFAULT_CPU_THREADS, os.cpu_count() or 1) if cpu else None)
+                if budget:
+                    set_torch_threads(budget)
+                embedder = SentenceTransformerEmbedder(
+                    config["model_name"], quantize=config["cpu"], max_seq_length=config["max_seq_length"]
+                )
+                if config["cpu"]:
+                    embedder = MicroBatcher(embedder)
+            else:
+                embedder = HashingEmbedder(n_features=config["n_features"])
+            _EMBEDDERS[key] = embedder
+        return embedder
+
+    if server:
+        remote_key = f"{server}|{key}"
+        remote = _EMBEDDERS.get(remote_key)
+        if remote is None:
+            from src.memory.embed_server import connect_embedder
+
+            remote = connect_embedder(server, config, fallback=local)
+            if remote is None:
+                return local()
+            _EMBEDDERS[remote_key] = remote
+        return remote
+    return local()
@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.core.file_lock import exclusive_lock
+
+EMBED_CACHE_DIR_ENV = "CYBER_RANGE_EMBED_CACHE_DIR"
+DEFAULT_EMBED_CACHE_DIR = os.path.join("data", "embedding_cache")
+
+
+def text_key(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+def _model_slug(model_name: str) -> str:
+    return re.sub(r"[^A-Za-z0-9._-]+", "_", model_name).strip("_") or "model"
+
+
+class EmbeddingCache:
+    """
+    Cache en disco de embeddings (ya normalizados) por (model_name, sha256(text)).
+    Un archivo por modelo con registros de largo fijo [32 bytes sha256 | dim float32],
+    compartido entre memorias y procesos: append bajo lock exclusivo, lectura incremental.
+    Los vectores se leen por np.memmap (no se copian a RAM); en memoria solo quedan los
+    digests ordenados y su fila, asi el arranque no crece con la dimension ni con el historial.
+    """
+
+    def __init__(self, root_dir: str, *, model_name: str, dim: int) -> None:
+        self.model_name = model_name
+        self.dim = int(dim)
+        self.path = os.path.join(root_dir, f"{_model_slug(model_name)}__d{self.dim}.bin")
+        self._dtype = np.dtype([("key", "S32"), ("vec", "<f4", (self.dim,))])
+        self._mm: Optional[np.memmap] = None
+        # digests ordenados -> fila del archivo (busqueda con searchsorted)
+        self._keys = np.zeros(0, dtype="S32")
+        self._rows = np.zeros(0, dtype="int64")
+        self._n = 0
+        os.makedirs(root_dir, exist_ok=True)
+        self._refresh()
+
+    def __len__(self) -> int:
+        return self._n
+
+    def _refresh(self) -> None:
+        # Mapea de nuevo el archivo e indexa solo los registros que otros procesos agregaron.
+        if not os.path.exists(self.path):
+            return
+        n = os.path.getsize(self.path) // self._dtype.itemsize  # descarta un registro cortado
+        if n <= self._n:
+            return
+        self._mm = np.memmap(self.path, dtype=self._dtype, mode="r", shape=(n,))
+        new_keys = np.array(self._mm["key"][self._n : n])
+        order = np.argsort(new_keys, kind="stable")
+        new_keys = new_keys[order]
+        new_rows = order.astype("int64") + self._n
+        at = np.searchsorted(self._keys, new_keys)
+        self._keys = np.insert(self._keys, at, new_keys)
+        self._rows = np.insert(self._rows, at, new_rows)
+        self._n = n
+
+    def _lookup(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        if not self._n or not keys:
+            return {}
+        q = np.array(keys, dtype="S32")
+        at = np.minimum(np.searchsorted(self._keys, q), self._n - 1)
+        hit = self._keys[at] == q
+        if not hit.any():
+            return {}
+        vecs = np.array(self._mm["vec"][self._rows[at[hit]]], dtype="float32")
+        return dict(zip((k for k, h in zip(keys, hit) if h), vecs))
+
+    def get_many(self, keys: List[bytes]) -> Dict[bytes, np.ndarray]:
+        found = self._lookup(keys)
+        if len(found) < len(set(keys)):
+            self._refresh()
+            found = self._lookup(keys)
+        return found
+
+    def put_many(self, keys: List[bytes], vecs: np.ndarray) -> None:
+        known = self._lookup(keys)
+        new: Dict[bytes, np.ndarray] = {}
+        for k, v in zip(keys, vecs):
+            if k not in known:
+                new.setdefault(k, v)
+        if not new:
+            return
+        recs = np.empty(len(new), dtype=self._dtype)
+        recs["key"] = list(new.keys())
+        recs["vec"] = np.stack(list(new.values()))
+        rec = self._dtype.itemsize
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT | getattr(os, "O_BINARY", 0), 0o644)
+        try:
+            with exclusive_lock(fd):
+                size = os.lseek(fd, 0, os.SEEK_END)
+                if size % rec:
+                    # registro cortado por un crash: se descarta antes de agregar
+                    os.ftruncate(fd, size - size % rec)
+                    os.lseek(fd, 0, os.SEEK_END)
+                data = memoryview(recs.tobytes())
+                while data:
+                    written = os.write(fd, data)
+                    data = data[written:]
+        finally:
+            os.close(fd)
+        self._refresh()
+
+
+_CACHES: Dict[str, EmbeddingCache] = {}
+
+
+def get_embedding_cache(model_name: str, dim: int, root_dir: Optional[str] = None) -> Optional[EmbeddingCache]:
+    root = root_dir or os.getenv(EMBED_CACHE_DIR_ENV) or DEFAULT_EMBED_CACHE_DIR
+    key = f"{os.path.abspath(root)}|{model_name}|{int(dim)}"
+    cache = _CACHES.get(key)
+    if cache is None:
+        try:
+            cache = EmbeddingCache(root, model_name=model_name, dim=dim)
+        except OSError:
+            # directorio no escribible: se sigue sin cache
+            return None
+        _CACHES[key] = cache
+    return cache
@@ -1,33 +1,64 @@
 from __future__ import annotations
 
+import hashlib
 import json
 import os
+import time
 from dataclasses import dataclass
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 import numpy as np
 import faiss  # faiss-cpu
-from sentence_transformers import SentenceTransformer
 
-_MODEL_BY_NAME: Dict[str, SentenceTransformer] = {}
+from src.core.profiler import get_profiler
+from src.memory.ann_index import (
+    DEFAULT_ANN_THRESHOLD,
+    STORAGE_TYPES,
+    build_index,
+    index_kind,
+    index_storage,
+    ivf_nlist_for,
+    resolve_index_kind,
+    set_search_params,
+    storage_matches,
+)
+from src.memory.case_store import FILTER_FIELDS, CaseStore, _case_field
+from src.memory.compaction import EVICTION_POLICIES, plan_compaction
+from src.memory.embedders import DEFAULT_MODEL_NAME, Embedder, get_embedder
+from src.memory.embedding_cache import get_embedding_cache, text_key
 
 
 def _iso_now() -> str:
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
 
+# Campos que identifican un caso repetido: mismo texto, label y episodio de origen.
+DEFAULT_DEDUP_KEY = ("text", "label", "source.episode_id")
+# Hasta este tamano de subconjunto, HNSW filtrado se resuelve exacto sobre los vectores del subconjunto.
+FILTER_EXACT_MAX = 4096
+
+_WAL_MAGIC = b"FWAL"
+_WAL_HEADER = np.dtype([("magic", "S4"), ("dim", "<u4"), ("base", "<u8")])
+
+
 def _l2_normalize(v: np.ndarray) -> np.ndarray:
     n = np.linalg.norm(v, axis=1, keepdims=True) + 1e-12
     return v / n
 
 
-def _get_embedding_model(model_name: str) -> SentenceTransformer:
-    model = _MODEL_BY_NAME.get(model_name)
-    if model is None:
-        model = SentenceTransformer(model_name)
-        _MODEL_BY_NAME[model_name] = model
-    return model
+def _read_case_hwm(path: str) -> int:
+    if not os.path.exists(path):
+        return 0
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return int(json.load(f).get("last_case_id") or 0)
+    except (OSError, ValueError, TypeError, AttributeError):
+        return 0
+
+
+# Seed compartido: lectura mmap sin copiar codes a RAM, nunca se escribe.
+_SEED_IO_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", 0) | faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY
 
 
 @dataclass
@@ -40,86 +71,408 @@ class FaissMemory:
     """
     Memoria vectorial persistente:
     - data/memory/cases.jsonl  (casos legibles)
-    - data/memory/index.faiss  (índice FAISS)
+    - data/memory/index.faiss  (índice FAISS, checkpoint)
+    - data/memory/index.wal    (embeddings agregados despues del checkpoint, float32 crudo)
     Cosine similarity vía Inner Product con embeddings normalizados.
+    add_case solo agrega una fila al WAL; index.faiss se reescribe cada
+    checkpoint_every casos o con checkpoint().
+    - data/memory/case_stats.json / merged_keys.bin  (ultimo hit por caso y dedup de casos consolidados)
+    - data/memory/case_hwm.json  (mayor case_id asignado; compact() no libera ids para reusar)
+    - data/memory/cases.idx.npz  (offsets + metadata de cases.jsonl, ver case_store.py)
+    self.cases es un CaseStore: los casos se leen de cases.jsonl al pedirlos (LRU de casos calientes).
+    storage="fp16"/"sq8" guarda los vectores con scalar quantization (2x/4x menos bytes);
+    los scores pasan a ser aproximados.
+    seed_dir: memoria semilla compartida abierta read-only (index.faiss por mmap); sus casos
+    van primero en self.cases y dir_path queda como overlay con solo los casos nuevos.
     """
 
     def __init__(
         self,
         dir_path: str = "data/memory",
-        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        model_name: str = DEFAULT_MODEL_NAME,
+        checkpoint_every: int = 256,
+        embedding_cache: bool = True,
+        embedding_cache_dir: Optional[str] = None,
+        index_type: str = "hnsw",
+        ann_threshold: int = DEFAULT_ANN_THRESHOLD,
+        ef_search: int = 64,
+        nprobe: int = 16,
+        storage: str = "float32",
+        dedup_key: Sequence[str] = DEFAULT_DEDUP_KEY,
+        embedder: Union[str, Embedder, None] = None,
+        embed_cpu: bool = False,
+        embed_threads: Optional[int] = None,
+        embed_max_seq_length: Optional[int] = None,
+        embed_server: Optional[str] = None,
+        max_cases: Optional[int] = None,
+        max_age_days: Optional[float] = None,
+        eviction: str = "lru",
+        merge_threshold: Optional[float] = None,
+        compact_every: int = 256,
+        seed_dir: Optional[str] = None,
     ) -> None:
         self.dir_path = dir_path
         self.cases_path = os.path.join(dir_path, "cases.jsonl")
         self.index_path = os.path.join(dir_path, "index.faiss")
+        self.wal_path = os.path.join(dir_path, "index.wal")
+        self.stats_path = os.path.join(dir_path, "case_stats.json")
+        self.merged_keys_path = os.path.join(dir_path, "merged_keys.bin")
+        self.hwm_path = os.path.join(dir_path, "case_hwm.json")
+        self.checkpoint_every = max(1, int(checkpoint_every))
+        self._wal_rows = 0
+        # Backend ANN: flat (exacto) hasta ann_threshold casos, despues index_type.
+        resolve_index_kind(index_type, 0, ann_threshold)
+        self.index_type = index_type
+        if storage not in STORAGE_TYPES:
+            raise ValueError(f"storage invalido: {storage} (usa {', '.join(STORAGE_TYPES)})")
+        self.storage = storage
+        self.ann_threshold = int(ann_threshold)
+        self.ef_search = int(ef_search)
+        self.nprobe = int(nprobe)
+        # Politica de capacidad (ver compaction.py); compact() corre cada compact_every casos
+        # nuevos o al pasar max_cases con holgura, siempre con un solo rebuild.
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"eviction invalida: {eviction} (usa {', '.join(EVICTION_POLICIES)})")
+        self.max_cases = int(max_cases) if max_cases is not None else None
+        self.max_age_days = max_age_days
+        self.eviction = eviction
+        self.merge_threshold = merge_threshold
+        self.compact_every = max(1, int(compact_every))
+        self._adds_since_compact = 0
+        # case_id -> [ultimo hit (epoch s), hits]; fuera de los casos para no ensuciar la evidencia
+        self._hit_stats: Dict[int, List[float]] = {}
+        self._stats_dirty = False
+        self._merged_keys: set = set()
+        # mayor case_id asignado alguna vez; los ids nuevos salen de max(hwm, last_case_id()) + 1
+        self._case_hwm = 0
+        # Seed de solo lectura (mmap) + overlay en dir_path: self.cases = casos del seed + overlay;
+        # index/WAL/cases.jsonl de dir_path solo tienen el overlay (posicion - _base_n).
+        self.seed_dir = seed_dir
+        self._base_index: Any = None
+        self._base_n = 0
         os.makedirs(self.dir_path, exist_ok=True)
 
-        self.model = _get_embedding_model(model_name)
-        self.dim = self.model.get_sentence_embedding_dimension()
+        # embedder: "minilm" (model_name), "hashing[:n_features]" o una instancia de Embedder.
+        # embed_cpu: minilm int8 + micro-batching + tope de secuencia (ver embedders.py).
+        # embed_server: socket de src.memory.embed_server (modelo compartido entre procesos).
+        self.embedder = get_embedder(
+            embedder,
+            model_name=model_name,
+            cpu=embed_cpu,
+            threads=embed_threads,
+            max_seq_length=embed_max_seq_length,
+            server=embed_server,
+        )
+        self.model_name = self.embedder.name
+        self.dim = self.embedder.dim
+        # Cache compartido entre memorias/runs: rebuilds y queries de patron no llaman a encode.
+        # Solo textos de casos y de patron (pocos y repetidos); las queries por caso no se cachean.
+        use_cache = embedding_cache and self.embedder.cacheable
+        self.embedding_cache = get_embedding_cache(self.model_name, self.dim, embedding_cache_dir) if use_cache else None
 
-        self.cases: List[Dict[str, Any]] = []
         self.index = faiss.IndexFlatIP(self.dim)
+        # Indice hash de casos para has_case(): campos de dedup_key ("source.x" = case["source"]["x"]).
+        self.dedup_key = tuple(dedup_key)
+        self._case_keys: set = set()
+        # posicion (= id FAISS) -> caso; metadata filtrable en arrays (search(filters=...)), lo abre _load
+        self.cases: CaseStore
 
         self._load()
 
-    def _embed(self, texts: List[str]) -> np.ndarray:
-        embs = self.model.encode(texts, convert_to_numpy=True, show_progress_bar=False)
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        with get_profiler().span("embed", cat="embed", n=len(texts)):
+            embs = self.embedder.encode(texts)
         embs = embs.astype("float32")
         if embs.ndim == 1:
             embs = embs.reshape(1, -1)
         return _l2_normalize(embs)
 
+    def _embed(self, texts: List[str], cached: Optional[Sequence[bool]] = None) -> np.ndarray:
+        """cached marca que textos pasan por el cache (None = todos); el resto solo se codifica."""
+        cache = self.embedding_cache
+        if cache is None or not texts or (cached is not None and not any(cached)):
+            return self._encode(texts)
+        use = [True] * len(texts) if cached is None else [bool(c) for c in cached]
+        # sin cache la clave es el propio texto (str): solo dedup dentro del lote
+        keys: List[Any] = [text_key(t) if u else t for t, u in zip(texts, use)]
+        found: Dict[Any, np.ndarray] = dict(cache.get_many([k for k, u in zip(keys, use) if u]))
+        missing: Dict[Any, str] = {}
+        for k, t in zip(keys, texts):
+            if k not in found and k not in missing:
+                missing[k] = t
+        if missing:
+            miss_keys = list(missing.keys())
+            miss_embs = self._encode([missing[k] for k in miss_keys])
+            to_cache = {k for k, u in zip(keys, use) if u}
+            cache_rows = [i for i, k in enumerate(miss_keys) if k in to_cache]
+            if cache_rows:
+                cache.put_many([miss_keys[i] for i in cache_rows], miss_embs[cache_rows])
+            found.update(zip(miss_keys, miss_embs))
+        return np.stack([found[k] for k in keys]).astype("float32", copy=False)
+
     def reset(self) -> None:
         #borra casos e índice pero mantiene la carpeta y el índice vacío
         os.makedirs(self.dir_path, exist_ok=True)
-        open(self.cases_path, "w", encoding="utf-8").close()
-        self.cases = []
+        self._detach_seed()
+        self.cases.truncate()
+        self._drop_case_sidecars()
+        self._rebuild_case_indexes()
         self.index = faiss.IndexFlatIP(self.dim)
         self._persist_index()
         
+    def _detach_seed(self) -> None:
+        self.seed_dir = None
+        self._base_index = None
+        self._base_n = 0
+        if self.cases.base is not None:
+            self.cases.base.close()
+            self.cases.base = None
+
+    def _open_case_store(self, path: str, **kwargs: Any) -> CaseStore:
+        return CaseStore(path, case_hash=self._case_hash, dedup_key=self.dedup_key, **kwargs)
+
+    def _open_seed(self) -> Optional[CaseStore]:
+        """Abre el seed read-only (mmap); devuelve su CaseStore. Nunca escribe en seed_dir."""
+        self._base_index = None
+        self._base_n = 0
+        if not self.seed_dir:
+            return None
+        cases = self._open_case_store(os.path.join(self.seed_dir, "cases.jsonl"), read_only=True)
+        if not cases:
+            return None
+        index_path = os.path.join(self.seed_dir, "index.faiss")
+        idx = None
+        with get_profiler().span("open_seed", cat="io", cases=len(cases)):
+            if os.path.exists(index_path):
+                idx = faiss.read_index(index_path, _SEED_IO_FLAGS)
+            if (
+                idx is None
+                or getattr(idx, "d", None) != self.dim
+                or getattr(idx, "metric_type", None) != faiss.METRIC_INNER_PRODUCT
+                or idx.ntotal != len(cases)
+            ):
+                # seed sin checkpoint al dia (WAL pendiente) o de otro embedder: indice privado en RAM
+                embs = self._embed([c["text"] for c in cases[:]])
+                idx = build_index(resolve_index_kind(self.index_type, len(embs), self.ann_threshold), self.dim, embs, storage=self.storage)
+        set_search_params(idx, ef_search=self.ef_search, nprobe=self.nprobe)
+        merged_path = os.path.join(self.seed_dir, "merged_keys.bin")
+        if os.path.exists(merged_path):
+            with open(merged_path, "rb") as f:
+                raw = f.read()
+            self._merged_keys.update(raw[i : i + 16] for i in range(0, len(raw) - len(raw) % 16, 16))
+        self._case_hwm = max(self._case_hwm, _read_case_hwm(os.path.join(self.seed_dir, "case_hwm.json")))
+        self._base_index = idx
+        self._base_n = len(cases)
+        return cases
+
     def _load(self) -> None:
-    # carga casos
-        self.cases = []
-        if os.path.exists(self.cases_path):
-            with open(self.cases_path, "r", encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if line:
-                        self.cases.append(json.loads(line))
+    # carga casos (solo offsets y metadata; los cuerpos se leen al pedirlos)
+        self._load_case_sidecars()
+        self.cases = self._open_case_store(self.cases_path, base=self._open_seed())
+        self._rebuild_case_indexes()
+        n_overlay = len(self.cases) - self._base_n
 
-        # carga/reconstruye índice con sanity check
+        # carga checkpoint + replay del WAL, con sanity check (solo el overlay si hay seed)
         need_rebuild = True
-        if os.path.exists(self.index_path) and len(self.cases) > 0:
+        if os.path.exists(self.index_path) and n_overlay > 0:
             idx = faiss.read_index(self.index_path)
-            if getattr(idx, "d", None) == self.dim and idx.ntotal == len(self.cases):
+            if (
+                getattr(idx, "d", None) == self.dim
+                and getattr(idx, "metric_type", None) == faiss.METRIC_INNER_PRODUCT
+                and idx.ntotal <= n_overlay
+            ):
                 self.index = idx
-                need_rebuild = False
+                self._replay_wal()
+                missing = self.cases[self._base_n + self.index.ntotal :]
+                if missing:
+                    # crash entre cases.jsonl y el WAL (o seed copiado sin WAL): solo la cola
+                    self.index.add(self._embed([c["text"] for c in missing]))
+                    self._persist_index()
+                need_rebuild = self.index.ntotal != n_overlay
 
         if need_rebuild:
-            self.index = faiss.IndexFlatIP(self.dim)
-            if len(self.cases) > 0:
-                embs = self._embed([c["text"] for c in self.cases])
-                self.index.add(embs)
+            overlay = self.cases[self._base_n :]
+            embs = self._embed([c["text"] for c in overlay]) if overlay else np.zeros((0, self.dim), dtype="float32")
+            kind = resolve_index_kind(self.index_type, len(embs), self.ann_threshold)
+            self.index = build_index(kind, self.dim, embs, storage=self.storage)
             self._persist_index()
+        else:
+            self._maybe_reindex(retrain=True)
+        set_search_params(self.index, ef_search=self.ef_search, nprobe=self.nprobe)
+        # cola parseada en esta apertura: el proximo arranque ya no la re-lee
+        self.cases.save_index()
+
+    def _index_vectors(self) -> np.ndarray:
+        if index_kind(self.index) in ("flat", "hnsw") and index_storage(self.index) == "float32" and self.index.ntotal:
+            return self.index.reconstruct_n(0, self.index.ntotal)
+        # IVF y SQ no guardan los vectores originales exactos: se re-embebe via cache.
+        return self._embed([c["text"] for c in self.cases[self._base_n : self._base_n + self.index.ntotal]])
+
+    def _maybe_reindex(self, *, retrain: bool = False) -> bool:
+        """
+        Promueve flat -> ANN al cruzar el umbral. En _load tambien convierte el storage
+        (float32/fp16/sq8) si cambio y reentrena IVF si nlist quedo desfasado.
+        """
+        current = index_kind(self.index)
+        desired = resolve_index_kind(self.index_type, self.index.ntotal, self.ann_threshold)
+        stale_ivf = (
+            retrain
+            and current == desired
+            and current in ("ivf_flat", "ivf_pq")
+            and not (0.5 <= ivf_nlist_for(self.index.ntotal) / max(1, self.index.nlist) <= 2.0)
+        )
+        stale_storage = retrain and not storage_matches(self.index, self.storage)
+        if current == desired and not stale_ivf and not stale_storage:
+            return False
+        with get_profiler().span("reindex", cat="faiss", src=current, dst=desired, ntotal=self.index.ntotal):
+            self.index = build_index(desired, self.dim, self._index_vectors(), storage=self.storage)
+        set_search_params(self.index, ef_search=self.ef_search, nprobe=self.nprobe)
+        self._persist_index()
+        return True
+
+    def _read_wal(self) -> Tuple[int, np.ndarray]:
+        empty = np.zeros((0, self.dim), dtype="float32")
+        if not os.path.exists(self.wal_path):
+            return -1, empty
+        with open(self.wal_path, "rb") as f:
+            raw = f.read()
+        if len(raw) < _WAL_HEADER.itemsize:
+            return -1, empty
+        header = np.frombuffer(raw[:_WAL_HEADER.itemsize], dtype=_WAL_HEADER)[0]
+        if bytes(header["magic"]) != _WAL_MAGIC or int(header["dim"]) != self.dim:
+            return -1, empty
+        row_bytes = 4 * self.dim
+        body = raw[_WAL_HEADER.itemsize:]
+        n_rows = len(body) // row_bytes  # descarta una fila cortada al final
+        rows = np.frombuffer(body[: n_rows * row_bytes], dtype="<f4").reshape(n_rows, self.dim)
+        return int(header["base"]), rows
+
+    def _replay_wal(self) -> None:
+        base, all_rows = self._read_wal()
+        ntotal = self.index.ntotal
+        offset = ntotal - base
+        # base != ntotal: WAL de otro checkpoint (crash entre checkpoint y truncado).
+        if base < 0 or offset < 0 or offset > len(all_rows):
+            self._reset_wal()
+            return
+        rows = all_rows[offset : offset + (len(self.cases) - self._base_n - ntotal)]
+        with get_profiler().span("replay_wal", cat="io", rows=len(rows)):
+            if len(rows):
+                self.index.add(np.ascontiguousarray(rows, dtype="float32"))
+        clean_size = _WAL_HEADER.itemsize + len(all_rows) * 4 * self.dim
+        if offset or len(rows) != len(all_rows) or os.path.getsize(self.wal_path) != clean_size:
+            # reescribe el WAL alineado al checkpoint (sin filas sobrantes ni cortadas)
+            self._reset_wal(rows)
+        else:
+            self._wal_rows = len(rows)
+
+    def _reset_wal(self, rows: Optional[np.ndarray] = None) -> None:
+        header = np.array([(_WAL_MAGIC, self.dim, self.index.ntotal - (0 if rows is None else len(rows)))], dtype=_WAL_HEADER)
+        tmp_path = f"{self.wal_path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(header.tobytes())
+            if rows is not None and len(rows):
+                f.write(np.ascontiguousarray(rows, dtype="<f4").tobytes())
+        os.replace(tmp_path, self.wal_path)
+        self._wal_rows = 0 if rows is None else len(rows)
+
+    def _append_wal(self, embs: np.ndarray) -> None:
+        if not os.path.exists(self.wal_path):
+            self._reset_wal()
+        with get_profiler().span("append_wal", cat="io", rows=len(embs)):
+            with open(self.wal_path, "ab") as f:
+                f.write(np.ascontiguousarray(embs, dtype="<f4").tobytes())
+                f.flush()
+        self._wal_rows += len(embs)
 
     def _persist_index(self) -> None:
-        faiss.write_index(self.index, self.index_path)
+        # checkpoint atomico: index.faiss nunca queda a medio escribir
+        tmp_path = f"{self.index_path}.tmp"
+        with get_profiler().span("write_index", cat="io", ntotal=self.index.ntotal):
+            faiss.write_index(self.index, tmp_path)
+            os.replace(tmp_path, self.index_path)
+        self._reset_wal()
+        self._save_stats()
+        self.cases.save_index()
 
-    def add_case(
+    def checkpoint(self) -> None:
+        if self._wal_rows:
+            self._persist_index()
+        else:
+            self._save_stats()
+
+    def _load_case_sidecars(self) -> None:
+        self._hit_stats = {}
+        self._merged_keys = set()
+        self._case_hwm = _read_case_hwm(self.hwm_path)
+        if os.path.exists(self.stats_path):
+            try:
+                with open(self.stats_path, "r", encoding="utf-8") as f:
+                    self._hit_stats = {int(k): [float(v[0]), float(v[1])] for k, v in json.load(f).items()}
+            except (OSError, ValueError, TypeError, IndexError):
+                self._hit_stats = {}
+        if os.path.exists(self.merged_keys_path):
+            with open(self.merged_keys_path, "rb") as f:
+                raw = f.read()
+            self._merged_keys = {raw[i : i + 16] for i in range(0, len(raw) - len(raw) % 16, 16)}
+        self._stats_dirty = False
+
+    def _drop_case_sidecars(self) -> None:
+        self._hit_stats = {}
+        self._merged_keys = set()
+        self._case_hwm = 0
+        self._stats_dirty = False
+        for path in (self.stats_path, self.merged_keys_path, self.hwm_path):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _save_stats(self) -> None:
+        if not self._stats_dirty:
+            return
+        tmp_path = f"{self.stats_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({str(k): v for k, v in self._hit_stats.items()}, f)
+        os.replace(tmp_path, self.stats_path)
+        self._stats_dirty = False
+
+    def _save_case_hwm(self) -> None:
+        hwm = max(self._case_hwm, self.cases.last_case_id())
+        if hwm == _read_case_hwm(self.hwm_path):
+            return
+        tmp_path = f"{self.hwm_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"last_case_id": hwm}, f)
+        os.replace(tmp_path, self.hwm_path)
+        self._case_hwm = hwm
+
+    def _next_case_id(self) -> int:
+        return max(self._case_hwm, self.cases.last_case_id()) + 1
+
+    def _record_hits(self, hit_lists: List[List["MemoryHit"]]) -> None:
+        now = time.time()
+        for hits in hit_lists:
+            for hit in hits:
+                case_id = int(hit.case.get("case_id") or 0)
+                stat = self._hit_stats.get(case_id)
+                self._hit_stats[case_id] = [now, (stat[1] if stat else 0.0) + 1.0]
+                self._stats_dirty = True
+
+    def _new_case(
         self,
+        case_id: int,
         *,
         text: str,
-        label: str,        # "TP" | "FP" | "UNCERTAIN"
-        decision: str,     # "block_ip" | "no_block" | "escalate"
+        label: str,
+        decision: str,
         reason: str,
         tags: Optional[List[str]] = None,
         confidence: Optional[float] = None,
         source: Optional[Dict[str, Any]] = None,
+        created_at: Optional[str] = None,
     ) -> Dict[str, Any]:
-        case_id = (self.cases[-1]["case_id"] + 1) if self.cases else 1
-        case = {
+        return {
             "case_id": case_id,
-            "created_at": _iso_now(),
+            "created_at": created_at or _iso_now(),
             "text": text,
             "label": label,
             "decision": decision,
@@ -129,37 +482,312 @@ class FaissMemory:
             "source": source or {},
         }
 
-        with open(self.cases_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(case, ensure_ascii=False) + "\n")
+    def add_case(
+        self,
+        *,
+        text: str,
+        label: str,        # "TP" | "FP" | "UNCERTAIN"
+        decision: str,     # "block_ip" | "no_block" | "escalate"
+        reason: str,
+        tags: Optional[List[str]] = None,
+        confidence: Optional[float] = None,
+        source: Optional[Dict[str, Any]] = None,
+    ) -> Dict[str, Any]:
+        case = self._new_case(
+            self._next_case_id(),
+            text=text,
+            label=label,
+            decision=decision,
+            reason=reason,
+            tags=tags,
+            confidence=confidence,
+            source=source,
+        )
 
-        self.cases.append(case)
-        self.index.add(self._embed([text]))
-        self._persist_index()
+        emb = self._embed([text])
+        # orden: caso -> WAL -> indice en memoria; _load recupera cualquier corte intermedio
+        with get_profiler().span("append_case", cat="io"):
+            self.cases.append(case)
+        self._case_keys.add(self._case_hash(case))
+        self._append_wal(emb)
+        self.index.add(emb)
+        self._adds_since_compact += 1
+        if self._compaction_due():
+            self.compact()
+        elif not self._maybe_reindex() and self._wal_rows >= self.checkpoint_every:
+            self._persist_index()
         return case
+
+    def add_cases(self, cases: Sequence[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        add_case en lote (kwargs de add_case + created_at opcional): salta los que has_case
+        ya conoce (tambien repetidos dentro del lote), un encode batcheado, una escritura de
+        cases.jsonl y un checkpoint. Devuelve los casos agregados.
+        """
+        next_id = self._next_case_id()
+        new: List[Dict[str, Any]] = []
+        for kwargs in cases:
+            case = self._new_case(next_id, **kwargs)
+            key = self._case_hash(case)
+            if key in self._case_keys:
+                continue
+            self._case_keys.add(key)
+            new.append(case)
+            next_id += 1
+        if not new:
+            return []
+
+        embs = self._embed([c["text"] for c in new])
+        # orden: casos -> indice; si se corta antes del checkpoint, _load embebe la cola
+        with get_profiler().span("append_case", cat="io", n=len(new)):
+            self.cases.extend(new)
+        if self.index.ntotal == 0:
+            # indice vacio: se construye de una con el tipo que corresponde al tamano final
+            kind = resolve_index_kind(self.index_type, len(embs), self.ann_threshold)
+            self.index = build_index(kind, self.dim, embs, storage=self.storage)
+            set_search_params(self.index, ef_search=self.ef_search, nprobe=self.nprobe)
+        else:
+            self.index.add(embs)
+        self._adds_since_compact += len(new)
+        if self._compaction_due():
+            self.compact()
+        elif not self._maybe_reindex():
+            self._persist_index()
+        return new
+
+    def _compaction_due(self) -> bool:
+        if self.max_cases is not None and len(self.cases) - self._base_n > self.max_cases + max(1, self.max_cases // 10):
+            return True
+        policy = self.max_cases is not None or self.max_age_days is not None or self.merge_threshold is not None
+        return policy and self._adds_since_compact >= self.compact_every
+
+    def compact(self) -> Dict[str, int]:
+        """
+        Aplica max_age_days / merge_threshold / max_cases con un solo rebuild del indice.
+        Con seed solo compacta el overlay (el seed es de solo lectura).
+        """
+        self._adds_since_compact = 0
+        with get_profiler().span("compact", cat="faiss", ntotal=self.index.ntotal):
+            plan = plan_compaction(
+                self.cases[self._base_n :],
+                self._index_vectors(),
+                stats=self._hit_stats,
+                case_hash=self._case_hash,
+                now=time.time(),
+                max_cases=self.max_cases,
+                max_age_days=self.max_age_days,
+                eviction=self.eviction,
+                merge_threshold=self.merge_threshold,
+            )
+            if not plan.changed:
+                return plan.report
+            # hwm antes de reescribir: si compact saca el ultimo caso, su id no se vuelve a asignar
+            self._save_case_hwm()
+            # orden: cases.jsonl primero; si se corta antes del indice, _load ve ntotal > casos y reconstruye
+            self.cases.rewrite(plan.cases)
+            if plan.merged_hashes:
+                with open(self.merged_keys_path, "ab") as f:
+                    f.write(b"".join(plan.merged_hashes))
+                self._merged_keys.update(plan.merged_hashes)
+            base_ids = set(self.cases.base.case_ids.tolist()) if self.cases.base is not None else set()
+            # plan.stats solo trae el overlay; los hits de casos del seed se conservan
+            self._hit_stats = {k: v for k, v in self._hit_stats.items() if k in base_ids}
+            self._hit_stats.update(plan.stats)
+            self._stats_dirty = True
+            self._rebuild_case_indexes()
+            kind = resolve_index_kind(self.index_type, len(plan.vectors), self.ann_threshold)
+            self.index = build_index(kind, self.dim, plan.vectors, storage=self.storage)
+            set_search_params(self.index, ef_search=self.ef_search, nprobe=self.nprobe)
+            self._persist_index()
+        return plan.report
+
+    def _rebuild_case_indexes(self) -> None:
+        self._case_keys = set(self._merged_keys)
+        self._case_keys.update(self.cases.hashes())
+
+    def _case_hash(self, case: Dict[str, Any]) -> bytes:
+        values = [_case_field(case, field) for field in self.dedup_key]
+        raw = json.dumps(values, ensure_ascii=False, sort_keys=True, default=str)
+        return hashlib.blake2b(raw.encode("utf-8"), digest_size=16).digest()
+
+    def has_case(self, **case: Any) -> bool:
+        """True si ya hay un caso con los mismos campos de dedup_key (mismos kwargs que add_case)."""
+        return self._case_hash(case) in self._case_keys
+
     def clear(self) -> None:
         # borra casos e índice
-        self.cases = []
+        self._detach_seed()
+        self.cases.truncate()
+        self._drop_case_sidecars()
+        self._rebuild_case_indexes()
         self.index = faiss.IndexFlatIP(self.dim)
         if os.path.exists(self.cases_path):
             os.remove(self.cases_path)
         if os.path.exists(self.index_path):
             os.remove(self.index_path)
+        if os.path.exists(self.wal_path):
+            os.remove(self.wal_path)
         os.makedirs(self.dir_path, exist_ok=True)
         self._persist_index()
 
-    def search(self, *, text: str, k: int = 3, threshold: float = 0.75) -> List[MemoryHit]:
-        if not self.cases:
-            return []
+    def _filter_ids(self, filters: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        ids (ordenados) de los casos que cumplen filters, o None sin filtro.
+        Un valor lista/tupla/set es OR dentro del campo; campos distintos se combinan con AND.
+        """
+        if not filters:
+            return None
+        ids: Optional[np.ndarray] = None
+        for field, wanted in filters.items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"filtro invalido: {field} (usa {', '.join(FILTER_FIELDS)})")
+            values = list(wanted) if isinstance(wanted, (list, tuple, set, frozenset)) else [wanted]
+            keys = [str(v).strip().lower() if field == "tags" else str(v) for v in values]
+            selected = self.cases.positions(field, keys)
+            ids = selected if ids is None else np.intersect1d(ids, selected, assume_unique=True)
+            if len(ids) == 0:
+                break
+        assert ids is not None
+        return ids[ids < self._base_n + self.index.ntotal]
 
-        q = self._embed([text])
-        scores, idxs = self.index.search(q, k)
+    def _search_subset(self, index: Any, q: np.ndarray, k: int, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Busqueda restringida a ids: el costo escala con el subconjunto, no con la memoria."""
+        k = min(k, len(ids))
+        kind = index_kind(index)
+        if kind == "flat" or (kind == "hnsw" and len(ids) <= FILTER_EXACT_MAX):
+            sims = q @ index.reconstruct_batch(ids).T
+            top = np.argpartition(-sims, k - 1, axis=1)[:, :k] if k < len(ids) else np.tile(np.arange(len(ids)), (len(q), 1))
+            top_scores = np.take_along_axis(sims, top, axis=1)
+            # orden por score desc; empates por id asc (determinista)
+            order = np.lexsort((ids[top], -top_scores), axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            return np.take_along_axis(sims, top, axis=1), ids[top]
+        sel = faiss.IDSelectorBatch(ids)
+        if kind == "hnsw":
+            params: Any = faiss.SearchParametersHNSW(sel=sel, efSearch=max(self.ef_search, k))
+        else:
+            params = faiss.SearchParametersIVF(sel=sel, nprobe=min(self.nprobe, index.nlist))
+        return index.search(q, k, params=params)
 
-        hits: List[MemoryHit] = []
-        for score, idx in zip(scores[0], idxs[0]):
-            if idx < 0:
-                continue
-            s = float(score)
-            if s < threshold:
-                continue
-            hits.append(MemoryHit(score=s, case=self.cases[int(idx)]))
-        return hits
+    def _search_part(
+        self, index: Any, q: np.ndarray, k: int, ids: Optional[np.ndarray], offset: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if index is None or index.ntotal == 0 or (ids is not None and len(ids) == 0):
+            return np.zeros((len(q), 0), dtype="float32"), np.zeros((len(q), 0), dtype="int64")
+        scores, idxs = index.search(q, min(k, index.ntotal)) if ids is None else self._search_subset(index, q, k, ids)
+        return scores, np.where(idxs >= 0, idxs + offset, -1)
+
+    def _search_all(self, q: np.ndarray, k: int, ids: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray]:
+        if self._base_index is None:
+            return self._search_part(self.index, q, k, ids, 0)
+        # seed + overlay: top-k de cada uno y merge por score (posiciones globales)
+        base_ids = None if ids is None else ids[ids < self._base_n]
+        overlay_ids = None if ids is None else ids[ids >= self._base_n] - self._base_n
+        b_scores, b_idxs = self._search_part(self._base_index, q, k, base_ids, 0)
+        o_scores, o_idxs = self._search_part(self.index, q, k, overlay_ids, self._base_n)
+        scores = np.concatenate([b_scores, o_scores], axis=1)
+        idxs = np.concatenate([b_idxs, o_idxs], axis=1)
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(scores, order, axis=1), np.take_along_axis(idxs, order, axis=1)
+
+    def search(
+        self,
+        *,
+        text: str,
+        k: int = 3,
+        threshold: float = 0.75,
+        filters: Optional[Dict[str, Any]] = None,
+        cache_query: bool = False,
+    ) -> List[MemoryHit]:
+        return self.search_many([text], ks=k, thresholds=threshold, filters=filters, cache_queries=cache_query)[0]
+
+    def search_many(
+        self,
+        texts: Sequence[str],
+        ks: Union[int, Sequence[int]] = 3,
+        thresholds: Union[float, Sequence[float]] = 0.75,
+        filters: Optional[Dict[str, Any]] = None,
+        cache_queries: Union[bool, Sequence[bool]] = False,
+    ) -> List[List[MemoryHit]]:
+        """
+        Varias queries con un solo encode y un solo index.search sobre la matriz de queries.
+        ks/thresholds/cache_queries pueden ser un valor comun o uno por texto; cache_queries
+        solo conviene para textos que se repiten entre episodios (pattern_text).
+        filters (label, decision, tags, source.pattern_key, event_type) restringe todas las
+        queries al mismo subconjunto de casos.
+        """
+        n = len(texts)
+        k_list = [int(ks)] * n if isinstance(ks, int) else [int(k) for k in ks]
+        th_list = [float(thresholds)] * n if isinstance(thresholds, (int, float)) else [float(t) for t in thresholds]
+        cached = [bool(cache_queries)] * n if isinstance(cache_queries, bool) else [bool(c) for c in cache_queries]
+        if len(k_list) != n or len(th_list) != n or len(cached) != n:
+            raise ValueError("ks/thresholds/cache_queries deben tener el mismo largo que texts")
+        if not self.cases or n == 0:
+            return [[] for _ in range(n)]
+        ids = self._filter_ids(filters)
+        if ids is not None and len(ids) == 0:
+            return [[] for _ in range(n)]
+
+        q = self._embed(list(texts), cached)
+        k_max = max(k_list)
+        span_args: Dict[str, Any] = {"k": k_max, "nq": n, "ntotal": self.index.ntotal}
+        if self._base_n:
+            span_args["seed_ntotal"] = self._base_n
+        if ids is not None:
+            span_args["subset"] = len(ids)
+        with get_profiler().span("faiss_search", cat="faiss", **span_args):
+            scores, idxs = self._search_all(q, k_max, ids)
+
+        out: List[List[MemoryHit]] = []
+        for row, (k, threshold) in enumerate(zip(k_list, th_list)):
+            hits: List[MemoryHit] = []
+            # resultados ordenados por score: los primeros k equivalen a search(k)
+            for score, idx in zip(scores[row][:k], idxs[row][:k]):
+                if idx < 0:
+                    continue
+                s = float(score)
+                if s < threshold:
+                    continue
+                hits.append(MemoryHit(score=s, case=self.cases[int(idx)]))
+            out.append(hits)
+        self._record_hits(out)
+        return out
+
+    def search_episodes(
+        self,
+        groups: Sequence[Sequence[str]],
+        ks: Union[int, Sequence[int]] = 3,
+        thresholds: Union[float, Sequence[float]] = 0.75,
+        filters: Optional[Dict[str, Any]] = None,
+        cache_queries: Union[bool, Sequence[bool]] = False,
+    ) -> List[List[List[MemoryHit]]]:
+        """
+        Variante multi-episodio: groups[i] son las queries del episodio i (p.ej. case_text y
+        pattern_text); ks/thresholds/cache_queries se aplican por posicion dentro de cada grupo.
+        Todo el lote se embebe y se busca en una sola llamada.
+        """
+        flat_texts: List[str] = []
+        flat_ks: List[int] = []
+        flat_th: List[float] = []
+        flat_cached: List[bool] = []
+        for group in groups:
+            m = len(group)
+            g_ks = [int(ks)] * m if isinstance(ks, int) else [int(k) for k in ks][:m]
+            g_th = [float(thresholds)] * m if isinstance(thresholds, (int, float)) else [float(t) for t in thresholds][:m]
+            g_cached = [bool(cache_queries)] * m if isinstance(cache_queries, bool) else [bool(c) for c in cache_queries][:m]
+            if len(g_ks) != m or len(g_th) != m or len(g_cached) != m:
+                raise ValueError("ks/thresholds/cache_queries no cubren todas las queries del grupo")
+            flat_texts.extend(group)
+            flat_ks.extend(g_ks)
+            flat_th.extend(g_th)
+            flat_cached.extend(g_cached)
+
+        flat_hits = self.search_many(
+            flat_texts, ks=flat_ks, thresholds=flat_th, filters=filters, cache_queries=flat_cached
+        )
+        out: List[List[List[MemoryHit]]] = []
+        pos = 0
+        for group in groups:
+            out.append(flat_hits[pos : pos + len(group)])
+            pos += len(group)
+        return out
@@ -10,6 +10,7 @@ from src.backend_a.search_logs import search_logs
 from src.tools.asset_context import get_asset_context
 from src.tools.enforcement import block_ip
 from src.blue.decision_log import append_decision
+from src.core.jsonl_writer import flush_jsonl_writers
 from src.judge.judge_mtd_mttr import judge_mttd_mttr
 
 DEFAULT_LOGS_DIR = "data/logs_backend_a"
@@ -115,6 +116,7 @@ def main():
                 out_path=args.decisions_path,
             )
 
+    flush_jsonl_writers()
     out_csv = judge_mttd_mttr(
         gt_dir=args.gt_dir,
         decisions_path=args.decisions_path,
@@ -1,9 +1,10 @@
 from __future__ import annotations
-import json
 import os
 from datetime import datetime, timezone
 from typing import Any, Dict, Optional
 
+from src.core.jsonl_writer import get_jsonl_writer
+
 def _iso_now() -> str:
     return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
 
@@ -38,8 +39,7 @@ def block_ip(
         "status": "simulated",
     }
 
-    with open(out_path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(action, ensure_ascii=False) + "\n")
+    get_jsonl_writer(out_path).append(action)
 
     return {"ok": True, "recorded_to": out_path, "action": action}
 
@@ -0,0 +1,63 @@
+import json
+import os
+import subprocess
+import sys
+
+from src.eval.run_experiments import _AgentWorkerClient
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Worker con ruido en stdout a nivel fd (como faiss/torch) y en prints despues de tomar el protocolo.
+_NOISY_WORKER = """
+import os
+from src.blue import agent_worker
+proto = agent_worker._protocol_stdout()
+os.write(1, b"native noise\\n")
+print("python noise", flush=True)
+agent_worker.serve(stdout=proto)
+"""
+
+# Servidor falso que mete lineas no JSON y una respuesta con id viejo antes de la buena.
+_DESYNC_WORKER = """
+import json, sys
+for line in sys.stdin:
+    req = json.loads(line)
+    print("warning: not json", flush=True)
+    print(json.dumps({"id": req["id"] - 1, "ok": True, "stale": True}), flush=True)
+    print(json.dumps({"id": req["id"], "ok": True, "pong": req.get("op")}), flush=True)
+    if req.get("op") == "shutdown":
+        break
+"""
+
+
+def _spawn(code):
+    return subprocess.Popen(
+        [sys.executable, "-c", code],
+        cwd=REPO_ROOT,
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+        bufsize=1,
+    )
+
+
+def test_worker_stdout_only_carries_protocol_lines():
+    proc = _spawn(_NOISY_WORKER)
+    requests = [{"id": 1, "op": "ping"}, {"id": 2, "op": "shutdown"}]
+    out, err = proc.communicate("".join(json.dumps(r) + "\n" for r in requests), timeout=60)
+    lines = out.splitlines()
+    assert [json.loads(line)["id"] for line in lines] == [1, 2]
+    assert "native noise" in err and "python noise" in err
+
+
+def test_client_skips_stray_lines_and_stale_ids():
+    client = _AgentWorkerClient.__new__(_AgentWorkerClient)
+    client._proc = _spawn(_DESYNC_WORKER)
+    client._next_id = 0
+    try:
+        assert client._request({"op": "ping"}) == {"id": 1, "ok": True, "pong": "ping"}
+        assert client._request({"op": "ping"}) == {"id": 2, "ok": True, "pong": "ping"}
+    finally:
+        client.close()
@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+import threading
+
+import pytest
+
+from src.memory import embed_server
+from src.memory.embedders import Embedder, MicroBatcher, get_embedder
+
+pytestmark = pytest.mark.skipif(not embed_server.HAS_UNIX_SOCKETS, reason="embed_server necesita AF_UNIX")
+
+CONFIG = {"kind": "hashing", "n_features": 1024}
+
+
+class _FailingEmbedder(Embedder):
+    name = "failing"
+    dim = 1024
+    cacheable = False
+
+    def encode(self, texts):
+        raise ValueError("boom")
+
+
+@pytest.fixture
+def server():
+    def start(embedder):
+        # ruta corta: los Unix sockets tienen un limite de ~100 bytes
+        path = os.path.join(tempfile.mkdtemp(prefix="es_"), "embed.sock")
+        srv = embed_server._EmbedServer(path, embed_server._ServerState(MicroBatcher(embedder), CONFIG))
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        started.append((srv, os.path.dirname(path)))
+        return path
+
+    started = []
+    yield start
+    for srv, tmp_dir in started:
+        srv.shutdown()
+        srv.server_close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def test_remote_encode_matches_local(server):
+    local = get_embedder("hashing")
+    remote = embed_server.RemoteEmbedder(server(local), CONFIG, fallback=lambda: local)
+    texts = ["event_type=auth outcome=failure", "pattern event_type=dns"]
+    assert (remote.encode(texts) == local.encode(texts)).all()
+    assert remote.stats["requests"] == 1 and not remote.stats["fallback"]
+    remote.close()
+
+
+def test_server_error_reply_falls_back_to_local(server):
+    local = get_embedder("hashing")
+    remote = embed_server.RemoteEmbedder(server(_FailingEmbedder()), CONFIG, fallback=lambda: local)
+    out = remote.encode(["event_type=auth"])
+    assert out.shape == (1, local.dim)
+    assert remote.stats["fallback"]
@@ -0,0 +1,57 @@
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+from src.memory.embedding_cache import EmbeddingCache, text_key
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_WRITER = """
+import sys
+import numpy as np
+from src.memory.embedding_cache import EmbeddingCache, text_key
+root, worker = sys.argv[1], int(sys.argv[2])
+cache = EmbeddingCache(root, model_name="m", dim=8)
+cache.put_many([text_key(f"w{worker}-{i}") for i in range(50)], np.full((50, 8), worker, dtype="float32"))
+"""
+
+
+def test_get_many_returns_stored_vectors(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), model_name="m", dim=8)
+    keys = [text_key(f"t{i}") for i in range(100)]
+    vecs = np.random.default_rng(0).standard_normal((100, 8)).astype("float32")
+    cache.put_many(keys[:40], vecs[:40])
+    cache.put_many(keys, vecs)  # las primeras 40 ya estan: no se duplican en disco
+
+    assert len(cache) == 100
+    assert os.path.getsize(cache.path) == 100 * cache._dtype.itemsize
+    found = cache.get_many(keys[::9] + [text_key("missing")])
+    assert sorted(found) == sorted(keys[::9])
+    for i, key in zip(range(0, 100, 9), keys[::9]):
+        np.testing.assert_array_equal(found[key], vecs[i])
+
+
+def test_reader_picks_up_records_from_other_processes(tmp_path):
+    reader = EmbeddingCache(str(tmp_path), model_name="m", dim=8)
+    procs = [subprocess.Popen([sys.executable, "-c", _WRITER, str(tmp_path), str(w)], cwd=REPO_ROOT) for w in range(3)]
+    assert [p.wait(timeout=120) for p in procs] == [0, 0, 0]
+
+    found = reader.get_many([text_key("w2-49"), text_key("w0-0")])
+    assert float(found[text_key("w2-49")][0]) == 2.0
+    assert float(found[text_key("w0-0")][0]) == 0.0
+    assert len(reader) == 150
+
+
+def test_torn_record_is_ignored_and_dropped_on_append(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), model_name="m", dim=8)
+    cache.put_many([text_key("a")], np.ones((1, 8), dtype="float32"))
+    with open(cache.path, "ab") as f:
+        f.write(b"x" * 10)
+
+    reopened = EmbeddingCache(str(tmp_path), model_name="m", dim=8)
+    assert len(reopened) == 1
+    reopened.put_many([text_key("b")], np.zeros((1, 8), dtype="float32"))
+    assert os.path.getsize(reopened.path) == 2 * reopened._dtype.itemsize
+    assert set(reopened.get_many([text_key("a"), text_key("b")])) == {text_key("a"), text_key("b")}
@@ -0,0 +1,59 @@
+import json
+
+from src.core.evidence_store import (
+    COMPACT_ENCODING,
+    EVIDENCE_BLOBS_FILENAME,
+    compact_evidence,
+    read_decisions,
+    release_blob_tables,
+)
+from src.core.jsonl_writer import flush_jsonl_writers, get_jsonl_writer
+
+SCHEMA = {"source": "llm", "mapping": {"src_ip": "net.src"}}
+
+
+def _evidence(case, score=0.9):
+    return {
+        "schema_mapping": SCHEMA,
+        "asset_context": {"asset": {"host": "ws-01"}},
+        "memory_hits": [{"score": score, "case": case}],
+        "timing": {"pipeline_duration_ms": 1.0},
+    }
+
+
+def _write_run(run_dir, evidences):
+    blobs_path = str(run_dir / EVIDENCE_BLOBS_FILENAME)
+    decisions_path = str(run_dir / "decisions.jsonl")
+    for ep, evidence in enumerate(evidences, start=1):
+        row = {"episode_id": ep, "decision": "escalate", "evidence": compact_evidence(evidence, blobs_path=blobs_path)}
+        get_jsonl_writer(decisions_path).append(row)
+    flush_jsonl_writers()
+    release_blob_tables(str(run_dir))
+    return decisions_path, blobs_path
+
+
+def test_compact_evidence_round_trip(tmp_path):
+    case = {"case_id": 1, "text": "auth failure", "count": 1}
+    evidences = [_evidence(case), _evidence(case, score=0.8)]
+    decisions_path, blobs_path = _write_run(tmp_path, evidences)
+
+    with open(decisions_path, "r", encoding="utf-8") as f:
+        raw = [json.loads(line) for line in f]
+    assert raw[0]["evidence"]["encoding"] == COMPACT_ENCODING
+    assert "$ref" in raw[0]["evidence"]["schema_mapping"]
+    assert "case" not in raw[0]["evidence"]["memory_hits"][0]
+    # schema_mapping, asset_context y el caso: una fila cada uno aunque se repitan
+    with open(blobs_path, "r", encoding="utf-8") as f:
+        assert len(f.readlines()) == 3
+
+    assert [row["evidence"] for row in read_decisions(decisions_path)] == evidences
+
+
+def test_consolidated_case_with_same_id_is_not_expanded_to_old_content(tmp_path):
+    before = {"case_id": 1, "text": "auth failure", "count": 1, "tags": ["a"]}
+    # compact() convierte el caso 1 en centroide: mismo id, contenido distinto
+    after = {"case_id": 1, "text": "auth failure", "count": 3, "tags": ["a", "b"], "confidence": 0.8}
+    decisions_path, _ = _write_run(tmp_path, [_evidence(before), _evidence(after), _evidence(before)])
+
+    cases = [row["evidence"]["memory_hits"][0]["case"] for row in read_decisions(decisions_path)]
+    assert cases == [before, after, before]
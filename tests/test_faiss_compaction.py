@@ -0,0 +1,41 @@
+from src.memory.faiss_store import FaissMemory
+
+
+def _open(path):
+    return FaissMemory(
+        dir_path=str(path),
+        embedder="hashing",
+        embedding_cache=False,
+        merge_threshold=0.8,
+        compact_every=3,
+    )
+
+
+def _add(mem, text, label="TP", decision="block_ip"):
+    return mem.add_case(text=text, label=label, decision=decision, reason="r")
+
+
+def test_case_ids_are_not_reused_after_compaction(tmp_path):
+    mem = _open(tmp_path)
+    first = _add(mem, "ssh brute force from 10.0.0.5 many failed logins")
+    _add(mem, "dns lookup benign internal host", label="FP", decision="no_block")
+    # casi-duplicado del primero: el compact del tercer add lo absorbe en el caso 1
+    near_dup = _add(mem, "ssh brute force from 10.0.0.5 many failed logins again")
+    assert near_dup["case_id"] == 3
+    assert [c["case_id"] for c in mem.cases[:]] == [first["case_id"], 2]
+
+    unrelated = _add(mem, "http exfiltration to external host", decision="escalate")
+    assert unrelated["case_id"] == 4
+
+    reopened = _open(tmp_path)
+    batch = reopened.add_cases([dict(text="powershell encoded command", label="TP", decision="escalate", reason="r")])
+    assert batch[0]["case_id"] == 5
+
+
+def test_clear_restarts_case_ids(tmp_path):
+    mem = _open(tmp_path)
+    _add(mem, "ssh brute force from 10.0.0.5 many failed logins")
+    _add(mem, "ssh brute force from 10.0.0.5 many failed logins again")
+    _add(mem, "dns lookup benign internal host", label="FP", decision="no_block")
+    mem.clear()
+    assert _add(mem, "http exfiltration to external host")["case_id"] == 1
@@ -0,0 +1,78 @@
+import os
+
+import numpy as np
+
+from src.memory.faiss_store import _WAL_HEADER, FaissMemory
+
+TEXTS = [
+    "event_type=auth action=login outcome=failure src_ip=10.0.0.5 user=alice",
+    "event_type=dns action=query outcome=success src_ip=10.0.0.9 host=ws-02",
+    "event_type=http action=upload outcome=success src_ip=10.0.0.7 dest=external",
+]
+
+
+def _open(path):
+    # checkpoint_every alto: los casos quedan solo en cases.jsonl + index.wal
+    return FaissMemory(dir_path=str(path), embedder="hashing", checkpoint_every=1000, embedding_cache=False)
+
+
+def _fill(mem):
+    for i, text in enumerate(TEXTS):
+        mem.add_case(text=text, label="TP", decision="block_ip", reason=f"r{i}", source={"episode_id": i + 1})
+
+
+def _top_ids(mem):
+    return [mem.search(text=t, k=1, threshold=0.0)[0].case["case_id"] for t in TEXTS]
+
+
+def test_reopen_replays_wal_without_checkpoint(tmp_path):
+    mem = _open(tmp_path)
+    _fill(mem)
+    expected = _top_ids(mem)
+    assert mem._wal_rows == len(TEXTS)
+
+    reopened = _open(tmp_path)
+    assert reopened.index.ntotal == len(TEXTS)
+    assert _top_ids(reopened) == expected == [1, 2, 3]
+
+
+def test_torn_wal_tail_is_dropped_and_rewritten(tmp_path):
+    mem = _open(tmp_path)
+    _fill(mem)
+    wal_path = tmp_path / "index.wal"
+    clean_size = os.path.getsize(wal_path)
+    with open(wal_path, "ab") as f:
+        f.write(b"\x00" * (4 * mem.dim // 2))  # fila cortada a la mitad
+
+    reopened = _open(tmp_path)
+    assert reopened.index.ntotal == len(TEXTS)
+    assert _top_ids(reopened) == [1, 2, 3]
+    assert os.path.getsize(wal_path) == clean_size
+
+
+def test_case_without_wal_row_is_reembedded(tmp_path):
+    mem = _open(tmp_path)
+    _fill(mem)
+    wal_path = tmp_path / "index.wal"
+    # crash entre cases.jsonl y el WAL: falta la ultima fila
+    with open(wal_path, "r+b") as f:
+        f.truncate(os.path.getsize(wal_path) - 4 * mem.dim)
+
+    reopened = _open(tmp_path)
+    assert reopened.index.ntotal == len(TEXTS)
+    assert _top_ids(reopened) == [1, 2, 3]
+
+
+def test_wal_from_another_checkpoint_is_discarded(tmp_path):
+    mem = _open(tmp_path)
+    _fill(mem)
+    mem.checkpoint()
+    wal_path = tmp_path / "index.wal"
+    header = np.frombuffer(open(wal_path, "rb").read(_WAL_HEADER.itemsize), dtype=_WAL_HEADER).copy()
+    header["base"] = 99  # base que no coincide con el checkpoint
+    with open(wal_path, "r+b") as f:
+        f.write(header.tobytes())
+
+    reopened = _open(tmp_path)
+    assert reopened.index.ntotal == len(TEXTS)
+    assert _top_ids(reopened) == [1, 2, 3]
@@ -0,0 +1,26 @@
+import json
+
+from src.core.ground_truth import list_ground_truth_episode_ids, load_ground_truth, write_ground_truth_index
+
+
+def _write_episodes(gt_dir, ids):
+    episodes = {ep: {"episode_id": ep, "attack_present": ep % 2 == 0} for ep in ids}
+    for ep, gt in episodes.items():
+        (gt_dir / f"episode_{ep:03d}.json").write_text(json.dumps(gt), encoding="utf-8")
+    write_ground_truth_index(str(gt_dir), episodes)
+
+
+def test_regenerated_dataset_keeps_episode_files_outside_the_index(tmp_path):
+    _write_episodes(tmp_path, range(1, 7))
+    _write_episodes(tmp_path, range(1, 4))
+
+    assert list_ground_truth_episode_ids(str(tmp_path)) == [1, 2, 3, 4, 5, 6]
+    assert load_ground_truth(str(tmp_path), 4) == {"episode_id": 4, "attack_present": True}
+
+
+def test_listing_sees_files_added_after_the_index(tmp_path):
+    _write_episodes(tmp_path, range(1, 3))
+    assert list_ground_truth_episode_ids(str(tmp_path)) == [1, 2]
+
+    (tmp_path / "episode_003.json").write_text(json.dumps({"episode_id": 3}), encoding="utf-8")
+    assert list_ground_truth_episode_ids(str(tmp_path)) == [1, 2, 3]
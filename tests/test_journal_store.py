@@ -0,0 +1,61 @@
+import json
+import os
+import subprocess
+import sys
+
+from src.core.journal_store import JournalStore
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_WRITER = """
+import sys
+from src.core.journal_store import JournalStore
+path, worker, n = sys.argv[1], sys.argv[2], int(sys.argv[3])
+store = JournalStore(path, compact_every=7)
+for i in range(n):
+    store.set(f"{worker}:{i}", {"worker": worker, "i": i})
+"""
+
+
+def test_concurrent_appends_survive_compaction(tmp_path):
+    path = str(tmp_path / "cache.json")
+    workers, per_worker = 4, 40
+    procs = [
+        subprocess.Popen([sys.executable, "-c", _WRITER, path, f"w{w}", str(per_worker)], cwd=REPO_ROOT)
+        for w in range(workers)
+    ]
+    assert [p.wait(timeout=120) for p in procs] == [0] * workers
+
+    store = JournalStore(path)
+    assert len(store) == workers * per_worker
+    assert store.get("w3:39") == {"worker": "w3", "i": 39}
+    # compact_every=7 con 160 sets: el snapshot tiene que haber absorbido parte del journal
+    with open(path, "r", encoding="utf-8") as f:
+        assert len(json.load(f)) >= 7
+
+
+def test_reader_sees_other_writers_across_compaction(tmp_path):
+    path = str(tmp_path / "cache.json")
+    reader = JournalStore(path, compact_every=1000)
+    writer = JournalStore(path, compact_every=3)
+    writer.set("a", 1)
+    assert reader.get("a") == 1
+    for i in range(5):
+        writer.set(f"k{i}", i)  # rota el journal al menos una vez
+    assert reader.get("k4") == 4
+    assert reader.get("a") == 1
+    assert len(JournalStore(path)) == 6
+
+
+def test_torn_journal_tail_is_skipped(tmp_path):
+    path = str(tmp_path / "cache.json")
+    store = JournalStore(path)
+    store.set("a", 1)
+    with open(f"{path}.journal", "ab") as f:
+        f.write(b'{"key": "b", "val')  # append cortado por un crash
+    JournalStore(path).set("c", 3)
+
+    reloaded = JournalStore(path)
+    assert reloaded.get("a") == 1
+    assert reloaded.get("c") == 3
+    assert "b" not in reloaded
@@ -0,0 +1,14 @@
+import os
+import sys
+
+from src.eval.bench_startup import measure_import
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Presupuesto holgado: el import sin modulos pesados ronda los cientos de ms.
+IMPORT_BUDGET_MS = 5000.0
+
+
+def test_blue_agent_graph_import_is_light():
+    report = measure_import(sys.executable, cwd=REPO_ROOT)
+    assert not {"torch", "faiss", "sentence_transformers"} & set(report["heavy_loaded"])
+    assert report["import_ms"] < IMPORT_BUDGET_MS